@@ -1,24 +1,97 @@
 # main.py
 import os
-from fastapi import FastAPI
-from pydantic import BaseModel
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from fastapi import FastAPI, HTTPException
 
-from rag.chatbot import answer_question   # ta fonction qui interroge le RAG
-from rag.vector_pipe import rebuild_faiss # ta fonction qui reconstruit FAISS
+from rag.chatbot import service, RagNotReady   # service RAG (chargé à la demande)
+from rag.vector_pipe import rebuild_faiss, sync_faiss # reconstruction complète / incrémentale de FAISS
+from rag.rebuild_jobs import RebuildJobs
+from rag import metrics
+
+# --- Préchauffage au démarrage ---
+def warmup_in_background():
+    """Charge index + clients sans bloquer le démarrage du serveur (voir /ready)."""
+    try:
+        service.warmup()
+    except RagNotReady as e:
+        print("❌ Service RAG indisponible :", e)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Le serveur accepte les connexions tout de suite (/health) ; /ready passe à 200
+    # quand l'index est chargé. RAG_WARMUP=0 : chargement à la première question.
+    if os.getenv("RAG_WARMUP", "1") == "1":
+        threading.Thread(target=warmup_in_background, name="rag-warmup", daemon=True).start()
+    yield
+
 
 # --- Initialiser FastAPI ---
 app = FastAPI(
+    lifespan=lifespan,
     title="RAG Chatbot API",
     description="API REST pour poser des questions sur les événements de Paris (OpenAgenda) via un système RAG.",
     version="1.0.0",
 )
 
+# --- Instrumentation : identifiant de trace + durée par route ---
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    """
+    Identifiant de trace (X-Request-ID reçu, sinon généré) visible dans les journaux des étapes
+    et renvoyé dans la réponse ; durée et statut par route. Rien n'est fait si RAG_METRICS=0
+    et RAG_TRACE_LOG=0. Pour /ask/stream, la durée s'arrête à l'envoi des en-têtes.
+    """
+    if not metrics.registry.enabled and not metrics.TRACE_LOG:
+        return await call_next(request)
+    trace_id = metrics.new_trace_id(request.headers.get("x-request-id"))
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - t0
+    route = request.scope.get("route")
+    path = getattr(route, "path", "other")
+    metrics.observe("rag_request_seconds", elapsed, route=path)
+    metrics.inc("rag_requests_total", route=path, status=str(response.status_code))
+    metrics.trace_log(f"{request.method} {path} {response.status_code} {elapsed * 1000:.1f} ms")
+    response.headers["X-Request-ID"] = trace_id
+    return response
+
+
 # --- Modèle d'entrée pour /ask ---
 class AskRequest(BaseModel):
     question: str
+    k: int = Field(5, ge=1, le=20)  # nombre max d'événements dans le contexte
+
+
+# --- Modèle d'entrée pour /ask/batch ---
+ASK_BATCH_MAX = int(os.getenv("ASK_BATCH_MAX", "256"))
 
 
+class AskBatchRequest(BaseModel):
+    questions: list[str] = Field(..., min_length=1, max_length=ASK_BATCH_MAX)
+    k: int = Field(5, ge=1, le=20)
+
+
+
+
+def serialize_source(d):
+    """Source renvoyée au client (métadonnées + texte du chunk)."""
+    return {
+        "title": d.metadata.get("title"),
+        "url": d.metadata.get("url"),
+        "date_start": d.metadata.get("date_start"),
+        "date_end": d.metadata.get("date_end"),
+        "city": d.metadata.get("city"),
+        "region": d.metadata.get("region"),
+        "keywords": d.metadata.get("keywords"),
+        "page_content": d.page_content
+    }
 
 
 # --- Endpoint health ---
@@ -27,9 +100,29 @@ def health():
     """Vérifie que l’API fonctionne."""
     return {"status": "ok", "message": "API RAG opérationnelle"}
 
+# --- Endpoint ready ---
+@app.get("/ready")
+def ready():
+    """Prêt à répondre : index FAISS chargé et clients initialisés (503 sinon)."""
+    status = service.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+# --- Endpoint /cache/stats ---
+@app.get("/cache/stats")
+def cache_statistics():
+    """Hits/misses du cache d’embeddings des questions et du cache sémantique de réponses."""
+    return service.cache_stats()
+
+# --- Endpoint /metrics (format texte Prometheus) ---
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Durées par étape et par route, tokens, retries d'embedding, caches, taille et version de l'index."""
+    service.export_metrics(metrics.registry)
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # --- Endpoint /ask ---
 @app.post("/ask")
-def ask(req: AskRequest):
+async def ask(req: AskRequest):
     if not req.question.strip():
         raise HTTPException(status_code=400, detail="La question ne peut pas être vide")
 
@@ -37,8 +130,10 @@ def ask(req: AskRequest):
 
     try:
         # Utilise ta fonction RAG
-        answer, sources = answer_question(req.question)
+        answer, sources = await service.aanswer(req.question, req.k)
         print("✅ Réponse générée avec succès")
+    except RagNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         import traceback
         print("❌ Erreur dans answer_question :", traceback.format_exc())
@@ -46,27 +141,126 @@ def ask(req: AskRequest):
 
     return {
         "answer": answer,
-        "sources": [
-            {
-                "title": d.metadata.get("title"),
-                "url": d.metadata.get("url"),
-                "date_start": d.metadata.get("date_start"),
-                "date_end": d.metadata.get("date_end"),
-                "city": d.metadata.get("city"),
-                "region": d.metadata.get("region"),
-                "keywords": d.metadata.get("keywords"),
-                "page_content": d.page_content
-            }
-            for d in sources
-        ]
+        "sources": [serialize_source(d) for d in sources]
     }
 
+
+# --- Endpoint /ask/batch ---
+@app.post("/ask/batch")
+async def ask_batch(req: AskBatchRequest):
+    """
+    Plusieurs questions en une requête : un seul appel d'embedding, une recherche FAISS groupée,
+    générations simultanées bornées (ASK_BATCH_CONCURRENCY). Un résultat par question, dans l'ordre :
+    {"question", "answer", "sources"} ou {"question", "error"} (les autres questions aboutissent ;
+    seul un échec de l'embedding groupé, commun à tout le lot, met toutes les questions en erreur).
+    """
+    print(f"📩 Lot de {len(req.questions)} questions reçu")
+    valid = [i for i, q in enumerate(req.questions) if q.strip()]
+    try:
+        answers = await service.aanswer_batch([req.questions[i] for i in valid], req.k) if valid else []
+    except RagNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        import traceback
+        print("❌ Erreur dans aanswer_batch :", traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
+    results = [{"question": q, "error": "La question ne peut pas être vide"} for q in req.questions]
+    for i, result in zip(valid, answers):
+        if "error" in result:
+            results[i] = {"question": req.questions[i], "error": result["error"]}
+        else:
+            results[i] = {
+                "question": req.questions[i],
+                "answer": result["answer"],
+                "sources": [serialize_source(d) for d in result["sources"]],
+            }
+    errors = sum("error" in r for r in results)
+    print(f"✅ Lot traité : {len(results) - errors} réponses, {errors} erreurs")
+    return {"results": results}
+
+
+# --- Endpoint /ask/stream (Server-Sent Events) ---
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    """
+    Même question que /ask, réponse en Server-Sent Events :
+    - event "sources" : les documents récupérés (envoyés avant la génération)
+    - event "token"   : morceaux de réponse au fil de la génération
+    - event "done"    : fin de réponse (ou "error" en cas d’échec)
+    """
+    if not req.question.strip():
+        raise HTTPException(status_code=400, detail="La question ne peut pas être vide")
+
+    print(f"📩 Question reçue (stream) : {req.question}")
+
+    try:
+        await service.awarmup()
+    except RagNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def events():
+        try:
+            async for event in service.astream(req.question, req.k):
+                if event["type"] == "sources":
+                    yield sse("sources", [serialize_source(d) for d in event["sources"]])
+                else:
+                    yield sse("token", {"text": event["text"]})
+            yield sse("done", {})
+        except Exception as e:
+            import traceback
+            print("❌ Erreur dans astream_answer :", traceback.format_exc())
+            yield sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- Reconstructions en arrière-plan ---
+def run_rebuild(mode, progress):
+    if mode == "full":
+        version_path = rebuild_faiss(progress=progress)
+        return {"mode": "full", "version": version_path.name}
+    return sync_faiss(progress=progress)
+
+
+rebuild_jobs = RebuildJobs(run_rebuild, on_success=lambda result: service.reload())
+
+
 # --- Endpoint /rebuild ---
-@app.post("/rebuild")
-def rebuild():
-    """Reconstruit l’index FAISS à partir des données JSON (events_clean.json)."""
-    store_path = rebuild_faiss()
-    return {"status": f"Index reconstruit et sauvegardé dans {store_path}"}
+@app.post("/rebuild", status_code=202)
+def rebuild(mode: str = "incremental"):
+    """
+    Lance la mise à jour de l’index FAISS (events_clean.json) en arrière-plan
+    et renvoie immédiatement l’id du job.
+    - mode=incremental (défaut) : n’embedde que les événements nouveaux/modifiés
+    - mode=full : reconstruction complète
+    La nouvelle version est publiée puis chargée sans interrompre /ask.
+    """
+    if mode not in {"incremental", "full"}:
+        raise HTTPException(status_code=400, detail="mode doit valoir 'incremental' ou 'full'")
+    job, created = rebuild_jobs.submit(mode)
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created": created,
+        "status_url": f"/rebuild/{job['id']}",
+    }
+
+
+@app.get("/rebuild/{job_id}")
+def rebuild_status(job_id: str):
+    """État d’avancement d’un job de reconstruction."""
+    job = rebuild_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job inconnu")
+    return job
 
 
 if __name__ == "__main__":
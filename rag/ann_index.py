@@ -0,0 +1,148 @@
+"""
+Types d'index FAISS sélectionnables : exact (flat) ou approché (IVF-Flat, HNSW, IVF-PQ).
+
+Les index sont construits et modifiés en flat (exact, suppression possible), puis
+convertis dans le type choisi au moment d'écrire une version. Les paramètres de
+recherche (nprobe, efSearch) sont appliqués au chargement et réglables sans reconstruire.
+"""
+import math
+import os
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# --- Paramètres (surchargeables par variables d'environnement) ---
+INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+NLIST = int(os.getenv("FAISS_NLIST", "0"))                 # 0 : ~4·√n listes
+TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "100000"))
+HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "200"))
+PQ_M = int(os.getenv("FAISS_PQ_M", "64"))                  # sous-quantificateurs (doit diviser la dimension)
+PQ_NBITS = int(os.getenv("FAISS_PQ_NBITS", "8"))
+NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "128"))
+
+
+def default_nlist(n):
+    """~4·√n listes, en gardant au moins 39 points d'entraînement par liste."""
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def index_kind(index):
+    """Type d'un index FAISS chargé ("flat", "ivf_flat", "hnsw", "ivf_pq" ou "other")."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexFlat):
+        return "flat"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    return "other"
+
+
+def _train_sample(vectors, size, seed=0):
+    if len(vectors) <= size:
+        return vectors
+    rows = np.random.default_rng(seed).choice(len(vectors), size=size, replace=False)
+    return vectors[np.sort(rows)]
+
+
+def build_index(vectors, kind=None, nlist=None, train_sample=None, hnsw_m=None,
+                ef_construction=None, pq_m=None, pq_nbits=None):
+    """
+    Construit un index du type `kind` sur `vectors` (float32, n × d), ids = rangs 0..n-1.
+    Les index IVF sont entraînés sur un échantillon ; si le corpus est trop petit
+    pour entraîner le type demandé, on garde un index exact.
+    """
+    kind = kind or INDEX_TYPE
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Type d'index inconnu : {kind} (attendu : {', '.join(INDEX_TYPES)})")
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, hnsw_m or HNSW_M)
+        index.hnsw.efConstruction = ef_construction or HNSW_EF_CONSTRUCTION
+    elif kind in ("ivf_flat", "ivf_pq"):
+        nlist = nlist or NLIST or default_nlist(n)
+        pq_m, pq_nbits = pq_m or PQ_M, pq_nbits or PQ_NBITS
+        needed = max(nlist, 2 ** pq_nbits if kind == "ivf_pq" else 1)
+        if n < needed:
+            print(f"ℹ️ {n} vecteurs : trop peu pour entraîner {kind}, index exact conservé")
+            kind = "flat"
+        else:
+            quantizer = faiss.IndexFlatL2(d)
+            if kind == "ivf_flat":
+                index = faiss.IndexIVFFlat(quantizer, d, nlist)
+            else:
+                if d % pq_m:
+                    raise ValueError(f"FAISS_PQ_M={pq_m} doit diviser la dimension {d}")
+                index = faiss.IndexIVFPQ(quantizer, d, nlist, pq_m, pq_nbits)
+            sample_size = max(train_sample or TRAIN_SAMPLE, 39 * nlist, 2 ** pq_nbits)
+            index.train(_train_sample(vectors, sample_size))
+    if kind == "flat":
+        index = faiss.IndexFlatL2(d)
+
+    if n:
+        index.add(vectors)
+    set_search_params(index)
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Applique nprobe (IVF) / efSearch (HNSW) ; sans effet sur un index exact."""
+    target = faiss.downcast_index(index)
+    if isinstance(target, faiss.IndexIVF):
+        target.nprobe = min(nprobe or NPROBE, target.nlist)
+    elif isinstance(target, faiss.IndexHNSW):
+        target.hnsw.efSearch = ef_search or EF_SEARCH
+    return index
+
+
+def make_reconstructible(index):
+    """
+    IVF : construit la table rang -> liste (direct map) nécessaire à reconstruct_batch.
+    À appeler au chargement, avant que l'index soit partagé : la construire pendant
+    une recherche concurrente ferait lire une table incomplète aux autres threads.
+    """
+    target = faiss.downcast_index(index)
+    if isinstance(target, faiss.IndexIVF) and not target.direct_map.type:
+        target.make_direct_map()
+    return index
+
+
+def to_flat(index):
+    """
+    Copie exacte modifiable (IndexFlatL2) d'un index, pour la synchronisation incrémentale.
+    Renvoie None si les vecteurs d'origine ne sont pas récupérables (IVF-PQ : codes compressés).
+    """
+    kind = index_kind(index)
+    if kind == "flat":
+        return index
+    if kind not in ("ivf_flat", "hnsw"):
+        return None
+    target = faiss.downcast_index(index)
+    if kind == "ivf_flat":
+        target.make_direct_map()
+    flat = faiss.IndexFlatL2(index.d)
+    if index.ntotal:
+        flat.add(target.reconstruct_n(0, index.ntotal))
+    return flat
+
+
+def convert_index(index, kind=None):
+    """Convertit un index exact dans le type configuré (inchangé si "flat" ou déjà converti)."""
+    kind = kind or INDEX_TYPE
+    if kind == "flat" or index_kind(index) != "flat":
+        return index
+    vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), "float32")
+    return build_index(vectors, kind)
+
+
+def index_memory_bytes(index):
+    """Taille sérialisée de l'index (≈ empreinte mémoire une fois chargé)."""
+    return int(faiss.serialize_index(index).size)
@@ -0,0 +1,172 @@
+"""
+Index inversé BM25 en mémoire (texte du chunk + titre + mots-clés), aligné sur les rangs FAISS,
+et fusion des classements dense / lexical par Reciprocal Rank Fusion.
+
+Les poids BM25 de chaque posting sont précalculés à la construction : une requête se
+réduit à quelques additions numpy sur les postings de ses termes.
+"""
+import re
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from filters import fold
+except ImportError:
+    from rag.filters import fold
+
+BM25_INDEX_FILE = "bm25_index.npz"
+
+STOPWORDS = frozenset("""
+au aux avec ce ces cet cette dans de des du elle en est et eux il ils je la le les leur lui ma
+mais me meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te
+tes toi ton tu un une vos votre vous sont ete etre avoir fait faire quel quels quelle quelles
+prevu prevus prevue prevues cherche chercher
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _stem(token):
+    """Racinisation légère : pluriels en -s / -x (concerts -> concert, festivals -> festival)."""
+    if len(token) > 3 and token[-1] in "sx" and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Termes d'un texte : minuscules sans accents, élisions et mots vides retirés, pluriels ramenés."""
+    return [_stem(t) for t in _TOKEN_RE.findall(fold(text)) if t not in STOPWORDS and len(t) > 1]
+
+
+def document_text(metadata, page_content):
+    keywords = metadata.get("keywords") or []
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    return " ".join([metadata.get("title") or "", page_content or ""] + [str(k) for k in keywords])
+
+
+class BM25Index:
+    """Postings CSR (terme -> rangs FAISS) avec le poids BM25 complet de chaque posting."""
+
+    def __init__(self, vocab, indptr, rows, weights, n_docs):
+        self.vocab = list(vocab)
+        self.indptr = indptr
+        self.rows = rows
+        self.weights = weights
+        self.n_docs = int(n_docs)
+        self._lookup = {term: i for i, term in enumerate(self.vocab)}
+
+    def __len__(self):
+        return self.n_docs
+
+    @classmethod
+    def build(cls, texts, k1=1.2, b=0.75):
+        """`texts` : un texte par rang FAISS."""
+        builder = BM25Builder(k1, b)
+        for text in texts:
+            builder.add(text)
+        return builder.finish()
+
+    @classmethod
+    def from_store(cls, db):
+        """Index construit depuis un FAISS LangChain, en un parcours du docstore."""
+        try:
+            from docstore import iter_store_documents
+        except ImportError:
+            from rag.docstore import iter_store_documents
+
+        return cls.build(document_text(doc.metadata, doc.page_content) for doc in iter_store_documents(db))
+
+    # --- Persistance (à côté de l'index) ---
+    def save(self, version_path):
+        np.savez(
+            Path(version_path) / BM25_INDEX_FILE,
+            vocab=np.array(self.vocab, dtype=str), indptr=self.indptr,
+            rows=self.rows, weights=self.weights, n_docs=np.array(self.n_docs),
+        )
+
+    @classmethod
+    def load(cls, version_path):
+        """Index de la version, ou None si elle a été construite sans index lexical."""
+        path = Path(version_path) / BM25_INDEX_FILE
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["vocab"], data["indptr"], data["rows"], data["weights"], data["n_docs"])
+
+    # --- Recherche ---
+    def search(self, query, k=10, rows=None):
+        """(rangs, scores) des k meilleurs chunks pour `query`, limités à `rows` si fourni."""
+        term_ids = {self._lookup[t] for t in tokenize(query) if t in self._lookup}
+        if not term_ids or (rows is not None and len(rows) == 0):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for i in term_ids:
+            start, stop = self.indptr[i], self.indptr[i + 1]
+            scores[self.rows[start:stop]] += self.weights[start:stop]
+        if rows is not None:
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            allowed[rows] = True
+            scores[~allowed] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return hits.astype(np.int64), scores[hits]
+
+
+
+class BM25Builder:
+    """
+    Construction incrémentale d'un BM25Index, texte par texte (rangs FAISS croissants) :
+    seuls les postings (rang, fréquence) et les longueurs sont gardés, pas les textes.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.lengths = array("f")
+        self.postings = {}  # terme -> (rangs, fréquences)
+
+    def add(self, text):
+        row = len(self.lengths)
+        tokens = tokenize(text)
+        self.lengths.append(len(tokens))
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            rows, tfs = self.postings.setdefault(token, (array("i"), array("f")))
+            rows.append(row)
+            tfs.append(tf)
+
+    def finish(self):
+        k1, b = self.k1, self.b
+        lengths = np.array(self.lengths, dtype=np.float32)
+        n = len(lengths)
+        avgdl = float(lengths.mean()) if n else 0.0
+        vocab = sorted(self.postings)
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(self.postings[t][0]) for t in vocab])
+        rows = np.empty(indptr[-1], dtype=np.int32)
+        weights = np.empty(indptr[-1], dtype=np.float32)
+        for i, term in enumerate(vocab):
+            doc_rows = np.frombuffer(self.postings[term][0], dtype=np.int32)
+            tf = np.frombuffer(self.postings[term][1], dtype=np.float32)
+            df = len(doc_rows)
+            idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = k1 * (1 - b + b * lengths[doc_rows] / (avgdl or 1))
+            rows[indptr[i]:indptr[i + 1]] = doc_rows
+            weights[indptr[i]:indptr[i + 1]] = idf * tf * (k1 + 1) / (tf + norm)
+        return BM25Index(vocab, indptr, rows, weights, n)
+
+
+def reciprocal_rank_fusion(rankings, k=10, rrf_k=60):
+    """Fusionne des listes de rangs classés : score = Σ 1 / (rrf_k + position)."""
+    fused = {}
+    for ranking in rankings:
+        for position, row in enumerate(ranking):
+            fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (rrf_k + position + 1)
+    return sorted(fused, key=lambda row: -fused[row])[:k]
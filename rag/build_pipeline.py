@@ -0,0 +1,145 @@
+"""
+Pipeline en flux pour la construction de l'index : chargement -> découpage -> embedding -> index.
+
+Les éléments de la source sont regroupés en lots ; chaque étage tourne dans son propre
+thread et passe ses lots au suivant par une file bornée (`queue_depth`). Le découpage
+du lot suivant recouvre ainsi l'attente réseau des embeddings du lot courant, et la
+mémoire ne dépend que de la taille des lots et de la profondeur des files, pas du corpus.
+Le dernier étage (`sink`) s'exécute dans le thread appelant.
+"""
+import os
+import queue
+import threading
+import time
+from itertools import islice
+
+BUILD_BATCH_EVENTS = int(os.getenv("BUILD_BATCH_EVENTS", "256"))  # événements par lot
+BUILD_QUEUE_DEPTH = int(os.getenv("BUILD_QUEUE_DEPTH", "4"))      # lots en attente entre deux étages
+
+_DONE = object()
+
+
+class PipelineAborted(Exception):
+    pass
+
+
+class StageStats:
+    """Éléments traités et temps passé à travailler (hors attente des files) par un étage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.busy = 0.0
+
+    def record(self, items, seconds):
+        self.items += items
+        self.batches += 1
+        self.busy += seconds
+
+    def as_dict(self):
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy, 3),
+            "per_second": round(self.items / self.busy, 1) if self.busy else None,
+        }
+
+
+def _put(q, item, stop):
+    """put bloquant, interrompu dès que le pipeline s'arrête."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.05)
+            return
+        except queue.Full:
+            continue
+    raise PipelineAborted
+
+
+def _get(q, stop):
+    """get bloquant, interrompu dès que le pipeline s'arrête."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.05)
+        except queue.Empty:
+            continue
+    raise PipelineAborted
+
+
+def run_pipeline(source, stages, sink, batch_size=BUILD_BATCH_EVENTS, queue_depth=BUILD_QUEUE_DEPTH,
+                 sink_name="index", size=len):
+    """
+    Fait passer `source` (itérable) par lots dans `stages` [(nom, fonction lot -> lot)] puis `sink`.
+    `size(lot)` compte les éléments d'un lot pour les débits. La première erreur d'un étage
+    arrête tout le pipeline et est relevée ici. Renvoie ({étage: statistiques}, durée totale).
+    """
+    stop = threading.Event()
+    errors = []
+    stats = [StageStats("load")] + [StageStats(name) for name, _ in stages] + [StageStats(sink_name)]
+    queues = [queue.Queue(maxsize=max(1, queue_depth)) for _ in range(len(stages) + 1)]
+
+    def worker(target):
+        try:
+            target()
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    def load():
+        iterator = iter(source)
+        while True:
+            t0 = time.perf_counter()
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                break
+            stats[0].record(size(batch), time.perf_counter() - t0)
+            _put(queues[0], batch, stop)
+        _put(queues[0], _DONE, stop)
+
+    def make_stage(i, fn):
+        def stage():
+            while True:
+                batch = _get(queues[i], stop)
+                if batch is _DONE:
+                    _put(queues[i + 1], _DONE, stop)
+                    return
+                t0 = time.perf_counter()
+                result = fn(batch)
+                stats[i + 1].record(size(result), time.perf_counter() - t0)
+                _put(queues[i + 1], result, stop)
+        return stage
+
+    targets = [("load", load)] + [(name, make_stage(i, fn)) for i, (name, fn) in enumerate(stages)]
+    threads = [threading.Thread(target=worker, args=(target,), name=f"build-{name}", daemon=True)
+               for name, target in targets]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            try:
+                batch = _get(queues[-1], stop)
+            except PipelineAborted:
+                raise errors[0] if errors else PipelineAborted("pipeline interrompu")
+            if batch is _DONE:
+                break
+            t0 = time.perf_counter()
+            sink(batch)
+            stats[-1].record(size(batch), time.perf_counter() - t0)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+    return {s.name: s.as_dict() for s in stats}, elapsed
+
+
+def format_stats(stats, elapsed, units=None):
+    """Résumé lisible des débits par étage."""
+    units = units or {}
+    parts = [f"{name} {s['items']} {units.get(name, 'él.')} ({s['per_second'] or '-'} /s)"
+             for name, s in stats.items()]
+    return f"{elapsed:.2f} s — " + ", ".join(parts)
@@ -1,40 +1,81 @@
 import os
+import time
+import asyncio
+import hashlib
+import threading
+import uuid
 from pathlib import Path
 from dotenv import load_dotenv
 
-from langchain_community.vectorstores import FAISS
-from langchain.chains import RetrievalQA
 from langchain_core.prompts import PromptTemplate
 from langchain_core.language_models import LLM
+from langchain_core.outputs import GenerationChunk
 from pydantic import Field, ConfigDict
-from mistralai import Mistral
 
 try:
     # Cas où on lance directement python rag/chatbot.py
-    from vector_pipe import MistralEmbeddings
+    from vector_pipe import make_embeddings, make_mistral_client
+    from docstore import load_faiss
+    from filters import MetadataIndex
+    from retrieval import FilteredRetriever, RETRIEVAL_FILTERS, RETRIEVAL_HYBRID
+    from bm25 import BM25Index
+    from index_store import (
+        check_model_identity, current_marker, current_version, hold_versions, resolve_current,
+    )
+    from rate_limit import UpstreamLimiter
+    from query_cache import LRUCache, SemanticAnswerCache
+    from context import CONTEXT_MIN_TOKENS, CONTEXT_TOKEN_BUDGET, pack_context
+    from text_utils import estimate_tokens
+    import metrics
 except ImportError:
     # Cas où on passe par le package (api.main -> rag.chatbot)
-    from rag.vector_pipe import MistralEmbeddings
+    from rag.vector_pipe import make_embeddings, make_mistral_client
+    from rag.docstore import load_faiss
+    from rag.filters import MetadataIndex
+    from rag.retrieval import FilteredRetriever, RETRIEVAL_FILTERS, RETRIEVAL_HYBRID
+    from rag.bm25 import BM25Index
+    from rag.index_store import (
+        check_model_identity, current_marker, current_version, hold_versions, resolve_current,
+    )
+    from rag.rate_limit import UpstreamLimiter
+    from rag.query_cache import LRUCache, SemanticAnswerCache
+    from rag.context import CONTEXT_MIN_TOKENS, CONTEXT_TOKEN_BUDGET, pack_context
+    from rag.text_utils import estimate_tokens
+    from rag import metrics
 
 
 # --- Charger variables d'environnement ---
 ROOT = Path(__file__).resolve().parents[1]
 load_dotenv(ROOT / ".env", override=True)
 
-# --- Charger FAISS + retriever ---
-store_path = ROOT / "data" / "faiss_store"
-embeddings = MistralEmbeddings()
-db = FAISS.load_local(str(store_path), embeddings, allow_dangerous_deserialization=True)
-retriever = db.as_retriever(search_kwargs={"k": 10})
-
-# --- Client Mistral pour génération ---
-api_key = os.getenv("MISTRAL_API_KEY")
-if not api_key:
-    raise ValueError("⚠️ La clé API Mistral n'est pas définie dans .env")
-client = Mistral(api_key=api_key)
+STORE_ROOT = Path(os.getenv("FAISS_STORE_PATH", str(ROOT / "data" / "faiss_store")))
 GEN_MODEL = "mistral-small-2503"  # tu peux changer en mistral-large-2411
+# chaque worker vérifie (stat de CURRENT) au plus toutes les N s si une autre version a été publiée ;
+# 0 : pas de vérification (seul le processus qui reconstruit recharge)
+INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "2"))
+
+# --- Chemin asynchrone : générations simultanées bornées + timeout ---
+chat_limiter = UpstreamLimiter(
+    "mistral-chat",
+    int(os.getenv("MISTRAL_CHAT_CONCURRENCY", "64")),
+    float(os.getenv("MISTRAL_CHAT_TIMEOUT", "60")),
+)
+
+# --- Questions groupées (POST /ask/batch) : générations simultanées par lot ---
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", "16"))
 
 # --- Wrapper LLM ---
+def record_usage(prompt_text, completion, usage=None):
+    """Tokens du prompt et de la réponse : usage renvoyé par l'API, sinon estimation locale."""
+    if not metrics.registry.enabled:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    metrics.inc("rag_prompt_tokens_total", prompt_tokens if isinstance(prompt_tokens, int) else estimate_tokens(prompt_text))
+    metrics.inc("rag_completion_tokens_total",
+                completion_tokens if isinstance(completion_tokens, int) else estimate_tokens(completion))
+
+
 class MistralChatWrapper(LLM):
     """Adapter le client Mistral chat à l’interface LLM de LangChain."""
 
@@ -47,16 +88,49 @@ class MistralChatWrapper(LLM):
     def _llm_type(self) -> str:
         return "mistral-chat"
 
-    def _call(self, prompt: str, stop=None):
-        messages = [
+    def _messages(self, prompt: str):
+        return [
             {"role": "system", "content": "Tu es un assistant culturel. Réponds en français."},
             {"role": "user", "content": prompt},
         ]
-        resp = self.client.chat.complete(model=self.model, messages=messages)
-        return resp.choices[0].message.content.strip()
 
-# --- Instancier LLM ---
-llm = MistralChatWrapper(client=client, model=GEN_MODEL)
+    def _call(self, prompt: str, stop=None, run_manager=None, **kwargs):
+        resp = self.client.chat.complete(model=self.model, messages=self._messages(prompt))
+        text = resp.choices[0].message.content.strip()
+        record_usage(prompt, text, getattr(resp, "usage", None))
+        return text
+
+    async def _acall(self, prompt: str, stop=None, run_manager=None, **kwargs):
+        resp = await chat_limiter.run(
+            self.client.chat.complete_async, model=self.model, messages=self._messages(prompt)
+        )
+        text = resp.choices[0].message.content.strip()
+        record_usage(prompt, text, getattr(resp, "usage", None))
+        return text
+
+    async def _astream(self, prompt: str, stop=None, run_manager=None, **kwargs):
+        """Tokens au fil de la génération (chat.stream_async), sous le même limiteur."""
+        parts = []
+        async with chat_limiter.slot():
+            stream = await chat_limiter.wait(
+                self.client.chat.stream_async(model=self.model, messages=self._messages(prompt))
+            )
+            events = stream.__aiter__()
+            while True:
+                try:
+                    event = await chat_limiter.wait(events.__anext__())
+                except StopAsyncIteration:
+                    break
+                if not event.data.choices:
+                    continue
+                text = event.data.choices[0].delta.content
+                if isinstance(text, str) and text:
+                    parts.append(text)
+                    chunk = GenerationChunk(text=text)
+                    if run_manager is not None:
+                        await run_manager.on_llm_new_token(text, chunk=chunk)
+                    yield chunk
+        record_usage(prompt, "".join(parts))
 
 # --- Prompt personnalisé ---
 prompt_template = """TTu es un assistant culturel qui recommande des événements uniquement à partir du CONTEXTE fourni ci-dessous.
@@ -81,35 +155,450 @@ prompt = PromptTemplate(
     input_variables=["question", "context"]
 )
 
-# --- Construire la chaîne RAG ---
-qa_chain = RetrievalQA.from_chain_type(
-    llm=llm,
-    retriever=retriever,
-    chain_type="stuff",
-    chain_type_kwargs={"prompt": prompt},
-    return_source_documents=True
-)
 
-# --- Fonction réutilisable ---
+
+# --- Index servi : remplacé d'un bloc lors d'un rechargement ---
+class IndexState:
+    """Index FAISS chargé + retriever associé (objet immuable une fois créé)."""
+
+    def __init__(self, db, retriever, version):
+        self.db = db
+        self.retriever = retriever
+        self.version = version
+
+
+class RagNotReady(RuntimeError):
+    """Le service RAG n'a pas pu être initialisé (clé API ou index manquant...)."""
+
+
+# --- Service RAG à initialisation paresseuse ---
+class RagService:
+    """
+    Regroupe clients Mistral, index FAISS et chaîne RAG.
+
+    Rien n'est chargé à l'import : `warmup()` (appelé au démarrage de l'API,
+    ou implicitement à la première question) initialise le tout une seule fois,
+    de façon thread-safe. `status()` sert de sonde de disponibilité.
+
+    Plusieurs workers servent le même dossier : chacun repère une nouvelle version publiée
+    par un autre (CURRENT modifié, vérifié à chaque question au plus toutes les
+    `watch_interval` s) et la charge en arrière-plan. Les versions chargées sont déclarées
+    (index_store.hold_versions) pour que le nettoyage ne les supprime pas.
+    """
+
+    def __init__(self, store_root=STORE_ROOT, embeddings=None, chat_client=None, gen_model=GEN_MODEL,
+                 watch_interval=INDEX_WATCH_INTERVAL):
+        self.store_root = Path(store_root)
+        self.gen_model = gen_model
+        self.watch_interval = watch_interval
+        self._embeddings = embeddings
+        self._chat_client = chat_client
+        self._llm = None
+        self._state = None
+        self._error = None
+        self._load_seconds = None
+        self._lock = threading.Lock()
+        self._marker = None
+        self._next_check = 0.0
+        self._reloading = threading.Lock()
+        self._owner = uuid.uuid4().hex[:8]  # nom du bail (index_store.hold_versions)
+
+        # --- Caches : embeddings des questions (LRU/TTL) + réponses sémantiques (optionnel) ---
+        self.query_embedding_cache = LRUCache(
+            maxsize=int(os.getenv("QUERY_CACHE_SIZE", "2048")),
+            ttl=float(os.getenv("QUERY_CACHE_TTL", "3600")),
+        )
+        self.semantic_cache = (
+            SemanticAnswerCache(
+                threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97")),
+                maxsize=int(os.getenv("SEMANTIC_CACHE_SIZE", "1000")),
+                ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "900")),
+            )
+            if os.getenv("SEMANTIC_CACHE", "0") == "1" else None
+        )
+
+    # --- Initialisation ---
+    def _init_clients(self):
+        if self._embeddings is None or self._chat_client is None:
+            api_key = os.getenv("MISTRAL_API_KEY")
+            if not api_key:
+                raise ValueError("⚠️ La clé API Mistral n'est pas définie dans .env")
+            if self._embeddings is None:
+                self._embeddings = make_embeddings(query_cache=self.query_embedding_cache)
+            if self._chat_client is None:
+                self._chat_client = make_mistral_client(api_key)
+        elif getattr(self._embeddings, "query_cache", False) is None:
+            self._embeddings.query_cache = self.query_embedding_cache
+        if self._llm is None:
+            self._llm = MistralChatWrapper(client=self._chat_client, model=self.gen_model)
+
+    def _load_state(self):
+        # repère lu avant le pointeur : une publication entre les deux sera revue au prochain contrôle
+        marker = current_marker(self.store_root)
+        version, path = resolve_current(self.store_root)
+        if not (path / "index.faiss").exists():
+            raise FileNotFoundError(f"Index FAISS introuvable dans {path} (lancer scripts/build_index.py)")
+        db = load_faiss(path, self._embeddings)
+        # vecteurs produits par un autre modèle : recherche absurde, on refuse de servir
+        check_model_identity(path, self._embeddings, db.index.d)
+        # filtres période / ville / gratuit / famille appliqués avant la recherche,
+        # classements dense + BM25 fusionnés (RRF)
+        retriever = FilteredRetriever(
+            db=db,
+            metadata_index=MetadataIndex.load(path),
+            sparse_index=BM25Index.load(path) if RETRIEVAL_HYBRID else None,
+            k=10,
+            use_filters=RETRIEVAL_FILTERS,
+        )
+        self._marker = marker
+        return IndexState(db, retriever, version)
+
+    def _hold(self, *versions):
+        """Déclare les versions chargées (la précédente peut encore servir des requêtes en cours)."""
+        if any(versions):
+            try:
+                hold_versions(self.store_root, versions, self._owner)
+            except OSError as e:
+                print("⚠️ Déclaration des versions chargées impossible :", e)
+
+    def warmup(self):
+        """Initialise clients + index si ce n'est pas déjà fait ; renvoie l'état servi."""
+        state = self._state
+        if state is not None:
+            self._check_current()
+            return state
+        with self._lock:
+            if self._state is None:
+                t0 = time.perf_counter()
+                try:
+                    self._init_clients()
+                    self._state = self._load_state()
+                    self._error = None
+                    self._hold(self._state.version)
+                except Exception as e:
+                    self._error = f"{type(e).__name__}: {e}"
+                    raise RagNotReady(self._error) from e
+                self._load_seconds = round(time.perf_counter() - t0, 3)
+                print(f"✅ Service RAG prêt en {self._load_seconds}s (index {self._state.version})")
+            return self._state
+
+    async def awarmup(self):
+        state = self._state
+        if state is not None:
+            self._check_current()
+            return state
+        return await asyncio.to_thread(self.warmup)
+
+    def _check_current(self):
+        """Nouvelle version publiée par un autre processus : rechargement en arrière-plan."""
+        if self.watch_interval <= 0:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.watch_interval
+        if current_marker(self.store_root) == self._marker or self._reloading.locked():
+            return
+        threading.Thread(target=self._reload_changed, name="rag-reload", daemon=True).start()
+
+    def _reload_changed(self):
+        if not self._reloading.acquire(blocking=False):
+            return
+        try:
+            if current_version(self.store_root) == self.index_version():
+                self._marker = current_marker(self.store_root)  # déjà chargée (ex. par ce processus)
+            else:
+                self.reload()
+        except Exception as e:
+            print("❌ Rechargement de l'index impossible :", e)
+        finally:
+            self._reloading.release()
+
+    @property
+    def ready(self):
+        return self._state is not None
+
+    def status(self):
+        state = self._state
+        return {
+            "ready": state is not None,
+            "index_version": state.version if state else None,
+            "index_size": state.db.index.ntotal if state else None,
+            "load_seconds": self._load_seconds,
+            "error": self._error,
+        }
+
+    def reload(self):
+        """
+        Charge la version courante de l'index et la met en service.
+        Le remplacement est une simple affectation de référence : les requêtes
+        déjà en cours terminent sur l'ancien index, les suivantes voient le nouveau.
+        """
+        with self._lock:
+            self._init_clients()
+            old_state = self._state
+            new_state = self._load_state()
+            self._state = new_state
+            self._error = None
+            self._hold(new_state.version, old_state.version if old_state else None)
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()  # réponses liées à l'ancien index
+        print(f"🔁 Index rechargé (version {new_state.version})")
+        return new_state.version
+
+    @property
+    def chat_client(self):
+        """Client Mistral (chat) du service, initialisé au besoin (ex. juge de l'évaluation)."""
+        if self._chat_client is None:
+            self.warmup()
+        return self._chat_client
+
+    def index_version(self):
+        state = self._state
+        return state.version if state else None
+
+    def cache_stats(self):
+        """Compteurs des caches (pour mesurer les économies d'appels)."""
+        return {
+            "query_embeddings": self.query_embedding_cache.stats(),
+            "semantic_answers": self.semantic_cache.stats() if self.semantic_cache is not None else None,
+        }
+
+    def export_metrics(self, registry):
+        """Jauges lues à l'export /metrics : caches de questions, taille et version de l'index."""
+        caches = self.cache_stats()
+        for name, stats in caches.items():
+            if stats is None:
+                continue
+            registry.set("rag_cache_hits_total", stats["hits"], cache=name)
+            registry.set("rag_cache_misses_total", stats["misses"], cache=name)
+            registry.set("rag_cache_hit_ratio", stats["hit_rate"], cache=name)
+        state = self._state
+        registry.clear("rag_index_info")
+        if state is not None:
+            registry.set("rag_index_chunks", state.db.index.ntotal)
+            registry.set("rag_index_info", 1, version=state.version)
+
+    # --- Questions : recherche -> assemblage du contexte -> génération ---
+    def context(self, state, question, query_vector, k):
+        """Chunks retrouvés pour la question, dédupliqués par événement et tassés dans le budget."""
+        with metrics.stage("search"):
+            docs = state.retriever.search(question, query_vector, k)
+        with metrics.stage("pack"):
+            return pack_context(docs, k)
+
+    def _cached_answer(self, cache, query_vector, state, k):
+        with metrics.stage("cache"):
+            return cache.lookup(query_vector, state.version, k)
+
+    async def acontext(self, state, question, query_vector, k):
+        return await asyncio.to_thread(self.context, state, question, query_vector, k)
+
+    def answer(self, question: str, k: int = 5):
+        with metrics.stage("total"):
+            return self._answer(question, k)
+
+    def _answer(self, question, k):
+        state = self.warmup()  # une seule lecture : la requête reste sur le même index
+        # l'embedding de la question est partagé par le cache sémantique et le retriever
+        with metrics.stage("embed"):
+            query_vector = self._embeddings.embed_query(question)
+        cache = self.semantic_cache
+        if cache is not None:
+            cached = self._cached_answer(cache, query_vector, state, k)
+            if cached is not None:
+                return cached
+        packed = self.context(state, question, query_vector, k)
+        with metrics.stage("generate"):
+            answer = self._llm.invoke(prompt.format(question=question, context=packed.text))
+        sources = packed.docs
+        if cache is not None:
+            cache.store(query_vector, (answer, sources), state.version, k)
+        return answer, sources
+
+    async def aanswer(self, question: str, k: int = 5):
+        """Même contrat que answer, sans bloquer la boucle d'événements
+        (embedding de la requête et génération via les clients asynchrones Mistral)."""
+        with metrics.stage("total"):
+            return await self._aanswer(question, k)
+
+    async def _aanswer(self, question, k):
+        state = await self.awarmup()
+        with metrics.stage("embed"):
+            query_vector = await self._embeddings.aembed_query(question)
+        cache = self.semantic_cache
+        if cache is not None:
+            cached = self._cached_answer(cache, query_vector, state, k)
+            if cached is not None:
+                return cached
+        packed = await self.acontext(state, question, query_vector, k)
+        answer = await self.agenerate(question, packed.text)
+        sources = packed.docs
+        if cache is not None:
+            cache.store(query_vector, (answer, sources), state.version, k)
+        return answer, sources
+
+    def prompt_fingerprint(self):
+        """Empreinte de tout ce qui façonne la génération (gabarit, modèle, budget du contexte)."""
+        payload = "\n".join([prompt.template, self.gen_model, str(CONTEXT_TOKEN_BUDGET), str(CONTEXT_MIN_TOKENS)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    async def agenerate(self, question, context):
+        """Réponse du LLM pour une question et un contexte déjà assemblé."""
+        if self._llm is None:
+            await self.awarmup()
+        with metrics.stage("generate"):
+            return await self._llm.ainvoke(prompt.format(question=question, context=context))
+
+    async def aanswer_batch(self, questions, k: int = 5):
+        """
+        Plusieurs questions en une fois : un appel d'embedding pour toutes, une recherche FAISS
+        groupée, puis au plus ASK_BATCH_CONCURRENCY générations simultanées.
+        Un résultat par question, dans l'ordre : {"answer", "sources"} ou {"error"}.
+        Les échecs deviennent des erreurs par question, jamais une erreur du lot : embedding
+        groupé en échec -> {"error"} pour chaque question (panne ou quota de l'API, commune à toutes) ;
+        recherche groupée en échec -> chaque question est recherchée seule.
+        """
+        state = await self.awarmup()
+        results = [None] * len(questions)
+
+        def fail(i, e):
+            results[i] = {"error": f"{type(e).__name__}: {e}"}
+
+        try:
+            vectors = await self.aembed_questions(questions)
+        except Exception as e:
+            vectors = [e] * len(questions)
+        cache = self.semantic_cache
+        todo = []
+        for i, vector in enumerate(vectors):
+            if isinstance(vector, Exception):
+                fail(i, vector)
+                continue
+            cached = cache.lookup(vector, state.version, k) if cache is not None else None
+            if cached is not None:
+                results[i] = {"answer": cached[0], "sources": cached[1]}
+            else:
+                todo.append(i)
+
+        with metrics.stage("search"):
+            try:
+                found = await asyncio.to_thread(
+                    state.retriever.search_batch, [questions[i] for i in todo], [vectors[i] for i in todo], k
+                )
+            except Exception:
+                found = await asyncio.gather(
+                    *(asyncio.to_thread(state.retriever.search, questions[i], vectors[i], k) for i in todo),
+                    return_exceptions=True,
+                )
+        semaphore = asyncio.Semaphore(ASK_BATCH_CONCURRENCY)
+
+        async def generate(i, docs):
+            if isinstance(docs, Exception):
+                fail(i, docs)
+                return
+            with metrics.stage("pack"):
+                packed = pack_context(docs, k)
+            async with semaphore:
+                try:
+                    answer = await self.agenerate(questions[i], packed.text)
+                except Exception as e:
+                    fail(i, e)
+                    return
+            results[i] = {"answer": answer, "sources": packed.docs}
+            if cache is not None:
+                cache.store(vectors[i], (answer, packed.docs), state.version, k)
+
+        await asyncio.gather(*(generate(i, docs) for i, docs in zip(todo, found)))
+        return results
+
+    async def aembed_questions(self, questions):
+        """Embeddings de plusieurs questions (un seul appel si le backend le permet)."""
+        if self._embeddings is None:
+            await self.awarmup()
+        embed_many = getattr(self._embeddings, "aembed_queries", None)
+        with metrics.stage("embed"):
+            if embed_many is not None:
+                return await embed_many(questions)
+            return await asyncio.gather(*(self._embeddings.aembed_query(q) for q in questions))
+
+    async def astream(self, question: str, k: int = 5):
+        """
+        Réponse en streaming : renvoie d'abord les sources récupérées,
+        puis les tokens au fur et à mesure de la génération.
+        Événements : {"type": "sources", "sources": [...]} puis {"type": "token", "text": ...}.
+        """
+        with metrics.stage("total"):  # jusqu'au dernier token envoyé
+            async for event in self._astream(question, k):
+                yield event
+
+    async def _astream(self, question, k):
+        state = await self.awarmup()
+        with metrics.stage("embed"):
+            query_vector = await self._embeddings.aembed_query(question)
+        cache = self.semantic_cache
+        if cache is not None:
+            cached = self._cached_answer(cache, query_vector, state, k)
+            if cached is not None:
+                answer, docs = cached
+                yield {"type": "sources", "sources": docs}
+                yield {"type": "token", "text": answer}
+                return
+        packed = await self.acontext(state, question, query_vector, k)
+        yield {"type": "sources", "sources": packed.docs}
+        prompt_text = prompt.format(question=question, context=packed.text)
+        parts = []
+        with metrics.stage("generate"):  # inclut le temps d'envoi des tokens au client
+            async for text in self._llm.astream(prompt_text):
+                parts.append(text)
+                yield {"type": "token", "text": text}
+        if cache is not None:
+            cache.store(query_vector, ("".join(parts).strip(), packed.docs), state.version, k)
+
+
+# --- Instance partagée (rien n'est chargé tant qu'on ne l'utilise pas) ---
+service = RagService()
+
+
+# --- Fonctions réutilisables (API historique du module) ---
 def answer_question(question: str, k: int = 5):
-    response = qa_chain.invoke(question)
-    answer = response["result"]
-    sources = response.get("source_documents", [])
-    return answer, sources
+    return service.answer(question, k)
+
+
+async def answer_question_async(question: str, k: int = 5):
+    return await service.aanswer(question, k)
+
+
+def astream_answer(question: str, k: int = 5):
+    return service.astream(question, k)
+
+
+def reload_index():
+    return service.reload()
+
+
+def index_version():
+    return service.index_version()
+
+
+def cache_stats():
+    return service.cache_stats()
+
+
+def __getattr__(name):
+    """Compatibilité : `db`, `retriever` déclenchent le chargement à la demande."""
+    if name in {"db", "retriever"}:
+        return getattr(service.warmup(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # --- Interface CLI ---
 if __name__ == "__main__":
-    print("🤖 Chatbot culturel (RAG avec RetrievalQA) - tape 'quit' pour arrêter\n")
+    print("🤖 Chatbot culturel (RAG FAISS + Mistral) - tape 'quit' pour arrêter\n")
     while True:
         q = input("Vous: ")
         if q.lower() in {"quit", "exit"}:
             break
-        response = qa_chain.invoke(q)
-        answer = response["result"]
-        print("\nAssistant:", answer)     
+        answer, _ = answer_question(q)
+        print("\nAssistant:", answer)
         print("\n---\n")
-
-
-
-
-
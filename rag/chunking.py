@@ -0,0 +1,152 @@
+"""
+Découpage des événements en chunks, en tenant compte de leur structure.
+
+- un événement court reste entier (un seul chunk) ;
+- une description longue est coupée aux limites de paragraphes puis de phrases
+  (mots en dernier recours), jamais au milieu d'un mot ;
+- le premier chunk commence par un en-tête compact (titre, dates, lieu), les suivants
+  par le seul titre : un extrait isolé reste rattaché à son événement sans répéter
+  dates et lieu (déjà dans les métadonnées, utilisées par les filtres).
+
+CHUNK_STRATEGY=recursive rétablit l'ancien découpage (RecursiveCharacterTextSplitter 500/50).
+"""
+import os
+import re
+from datetime import date, datetime, timezone
+
+from langchain_core.documents import Document
+
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "event")
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "1200"))  # en-tête compris
+
+# Noté dans les métadonnées des chunks : un index construit avec un autre découpage
+# est reconstruit entièrement à la synchronisation suivante.
+CHUNKER_VERSION = f"event-2-{CHUNK_MAX_CHARS}" if CHUNK_STRATEGY == "event" else "recursive-500-50"
+
+MONTH_NAMES = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août",
+               "septembre", "octobre", "novembre", "décembre"]
+
+_PARAGRAPH_RE = re.compile(r"\s*\n\s*")
+_SENTENCE_RE = re.compile(r"(?<=[.!?…»])\s+")
+
+
+# --- En-tête ---
+def _event_date(value):
+    """Date d'une valeur ISO ou d'un horodatage en millisecondes (None si absente ou invalide)."""
+    if (isinstance(value, (int, float)) and not isinstance(value, bool)) or (isinstance(value, str) and value.isdigit()):
+        return datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc).date()
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def _format_date(day, month=True, year=True):
+    text = "1er" if day.day == 1 else str(day.day)
+    if month:
+        text += f" {MONTH_NAMES[day.month - 1]}"
+    return f"{text} {day.year}" if year else text
+
+
+def _format_period(start, end):
+    """« du 6 au 8 avril 2025 » : mois et année écrits une fois quand ils sont partagés."""
+    same_year = start.year == end.year
+    same_month = same_year and start.month == end.month
+    return f"du {_format_date(start, not same_month, not same_year)} au {_format_date(end)}"
+
+
+def event_header(metadata):
+    """En-tête d'un chunk : « titre — dates — lieu » (parties absentes omises)."""
+    start, end = _event_date(metadata.get("date_start")), _event_date(metadata.get("date_end"))
+    dates = None
+    if start and end and end != start:
+        dates = _format_period(start, end)
+    elif start or end:
+        dates = _format_date(start or end)
+    parts = [(metadata.get("title") or "").strip(), dates, metadata.get("city")]
+    return " — ".join(p for p in parts if p)
+
+
+# --- Découpage du corps ---
+def _event_body(text, title):
+    """Texte de l'événement sans le titre de tête (déjà dans l'en-tête)."""
+    text = (text or "").strip()
+    title = (title or "").strip()
+    if title and text.startswith(title):
+        text = text[len(title):].lstrip(" .:-—\n")
+    return text
+
+
+def _split_words(text, budget):
+    pieces, current = [], ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > budget:
+            pieces.append(current)
+            current = ""
+        while len(word) > budget:  # mot plus long que le budget (URL...)
+            pieces.append(word[:budget])
+            word = word[budget:]
+        current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _units(body, budget):
+    """(séparateur, morceau) : paragraphes, sinon phrases, sinon groupes de mots, chacun ≤ budget."""
+    for paragraph in _PARAGRAPH_RE.split(body):
+        if not paragraph:
+            continue
+        sep = "\n"
+        pieces = [paragraph] if len(paragraph) <= budget else _SENTENCE_RE.split(paragraph)
+        for piece in pieces:
+            for part in ([piece] if len(piece) <= budget else _split_words(piece, budget)):
+                yield sep, part
+                sep = " "
+
+
+def split_body(body, budget, first_budget=None):
+    """Regroupe les morceaux du corps en blocs d'au plus `budget` caractères (`first_budget` pour le premier)."""
+    first_budget = first_budget or budget
+    blocks, current = [], ""
+    for sep, unit in _units(body, min(budget, first_budget)):
+        limit = budget if blocks else first_budget
+        if current and len(current) + len(sep) + len(unit) > limit:
+            blocks.append(current)
+            current = ""
+        current = f"{current}{sep}{unit}" if current else unit
+    if current:
+        blocks.append(current)
+    return blocks
+
+
+def _budget(prefix, max_chars):
+    # préfixe très long : on garde au moins la moitié du budget pour le texte
+    return max(max_chars - len(prefix) - 1, max_chars // 2) if prefix else max_chars
+
+
+def chunk_event(doc, max_chars=CHUNK_MAX_CHARS):
+    """
+    Chunks (textes) d'un Document événement : en-tête + corps, découpé seulement s'il dépasse ;
+    les chunks suivants ne reprennent que le titre.
+    """
+    header = event_header(doc.metadata)
+    title = (doc.metadata.get("title") or "").strip()
+    body = _event_body(doc.page_content, title)
+    if not body:
+        return [header or doc.page_content]
+    if len(header) + 1 + len(body) <= max_chars:
+        return [f"{header}\n{body}" if header else body]
+    blocks = split_body(body, _budget(title, max_chars), _budget(header, max_chars))
+    prefixes = [header] + [title] * (len(blocks) - 1)
+    return [f"{prefix}\n{block}" if prefix else block for prefix, block in zip(prefixes, blocks)]
+
+
+def chunk_documents(docs, max_chars=CHUNK_MAX_CHARS):
+    """(chunks, ids) ; ids déterministes "<id événement>:<n° chunk>"."""
+    chunks, ids = [], []
+    for doc in docs:
+        for n, text in enumerate(chunk_event(doc, max_chars)):
+            chunks.append(Document(page_content=text, metadata={**doc.metadata, "chunker": CHUNKER_VERSION}))
+            ids.append(f"{doc.metadata['id']}:{n}")
+    return chunks, ids
@@ -0,0 +1,105 @@
+"""
+Assemblage du contexte "stuff" envoyé au LLM.
+
+Les chunks arrivent du retriever du plus au moins pertinent. On garde un chunk par
+événement, au plus k événements, puis on les empile dans un budget de tokens
+(estimation locale, cf. text_utils.estimate_tokens) : le dernier chunk qui dépasse
+est tronqué à une fin de phrase plutôt qu'écarté, tant qu'il en reste assez pour être utile.
+Par défaut le budget suit k : de quoi loger k chunks pleins (CHUNK_MAX_CHARS) ;
+CONTEXT_TOKEN_BUDGET fixe un plafond indépendant de k.
+"""
+import os
+import re
+
+try:
+    from chunking import CHUNK_MAX_CHARS
+    from text_utils import estimate_tokens
+except ImportError:
+    from rag.chunking import CHUNK_MAX_CHARS
+    from rag.text_utils import estimate_tokens
+
+# 0 (défaut) : budget calculé à partir de k (cf. context_budget)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "0"))
+CONTEXT_MIN_TOKENS = int(os.getenv("CONTEXT_MIN_TOKENS", "60"))  # en dessous, un extrait tronqué est écarté
+
+SEPARATOR = "\n\n"
+_SENTENCE_END_RE = re.compile(r"[.!?…](?=\s|$)")
+
+
+def context_budget(k, budget=CONTEXT_TOKEN_BUDGET):
+    """Budget en tokens : `budget` s'il est fixé, sinon k chunks de CHUNK_MAX_CHARS et leurs séparateurs."""
+    if budget > 0:
+        return budget
+    return k * estimate_tokens("x" * CHUNK_MAX_CHARS) + max(0, k - 1) * estimate_tokens(SEPARATOR)
+
+
+def format_context(docs):
+    """Contexte "stuff" : contenu des chunks séparés par une ligne vide (comme RetrievalQA)."""
+    return SEPARATOR.join(d.page_content for d in docs)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Début de `text` tenant dans `max_tokens` (estimés), coupé à une fin de phrase si possible."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    head = text[:max(0, (max_tokens - 2) * 3)]  # place pour « … »
+    cut = None
+    for match in _SENTENCE_END_RE.finditer(head):
+        cut = match.end()
+    if cut is None or cut < len(head) // 2:
+        cut = head.rfind(" ")
+    return head[:cut].rstrip() + " …" if cut > 0 else head
+
+
+class PackedContext:
+    """Contexte retenu : documents (dans l'ordre du prompt), textes envoyés, tokens estimés."""
+
+    def __init__(self, docs, texts, tokens, candidates):
+        self.docs = docs
+        self.texts = texts
+        self.tokens = tokens
+        self.candidates = candidates
+        self.text = SEPARATOR.join(texts)
+
+    @property
+    def truncated(self):
+        return sum(t != d.page_content for d, t in zip(self.docs, self.texts))
+
+    def stats(self):
+        return {"candidates": self.candidates, "kept": len(self.docs), "truncated": self.truncated,
+                "tokens": self.tokens}
+
+
+def pack_context(docs, k, budget=None, min_tokens=CONTEXT_MIN_TOKENS):
+    """
+    `docs` triés par score décroissant (ordre du retriever). Garde le meilleur chunk de chaque
+    événement, au plus k événements, dans `budget` tokens estimés (séparateurs compris ;
+    défaut : context_budget(k)). Le premier document est toujours présent (tronqué si besoin).
+    """
+    budget = budget or context_budget(k)
+    seen, kept, texts, used = set(), [], [], 0
+    sep_tokens = estimate_tokens(SEPARATOR)
+    for doc in docs:
+        if len(kept) == k:
+            break
+        if doc is None:
+            continue
+        event_id = doc.metadata.get("id") or id(doc)
+        if event_id in seen:
+            continue
+        seen.add(event_id)
+        cost = estimate_tokens(doc.page_content) + (sep_tokens if kept else 0)
+        remaining = budget - used
+        if cost <= remaining:
+            kept.append(doc)
+            texts.append(doc.page_content)
+            used += cost
+            continue
+        room = remaining - (sep_tokens if kept else 0)
+        if room >= min_tokens or not kept:
+            text = truncate_to_tokens(doc.page_content, max(room, min_tokens))
+            kept.append(doc)
+            texts.append(text)
+            used += estimate_tokens(text) + (sep_tokens if len(kept) > 1 else 0)
+        break
+    return PackedContext(kept, texts, used, len(docs))
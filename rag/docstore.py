@@ -0,0 +1,266 @@
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+
+import faiss
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+try:
+    from ann_index import convert_index, make_reconstructible, set_search_params, to_flat
+except ImportError:
+    from rag.ann_index import convert_index, make_reconstructible, set_search_params, to_flat
+
+DOCSTORE_FILE = "docstore.sqlite"
+INDEX_FILE = "index.faiss"
+
+# Taille de la projection mémoire SQLite : les pages lues sont partagées
+# entre workers via le cache de pages de l'OS au lieu d'être copiées.
+DOCSTORE_MMAP_SIZE = int(os.getenv("DOCSTORE_MMAP_SIZE", str(1 << 30)))
+
+
+# --- Écriture ---
+class DocstoreWriter:
+    """
+    Écriture incrémentale de docstore.sqlite, une ligne par vecteur FAISS (clé : rang FAISS,
+    attribué dans l'ordre des ajouts). Fichier temporaire publié par renommage à la fermeture.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tmp = self.path.with_name(self.path.name + ".tmp")
+        self.tmp.unlink(missing_ok=True)
+        self.rows = 0
+        self.conn = sqlite3.connect(self.tmp)
+        self.conn.execute(
+            "CREATE TABLE chunks ("
+            " row INTEGER PRIMARY KEY,"
+            " doc_id TEXT NOT NULL UNIQUE,"
+            " page_content TEXT NOT NULL,"
+            " metadata TEXT NOT NULL)"
+        )
+
+    def add(self, doc_ids, documents):
+        start = self.rows
+        self.conn.executemany(
+            "INSERT INTO chunks VALUES (?, ?, ?, ?)",
+            (
+                (start + i, doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False))
+                for i, (doc_id, doc) in enumerate(zip(doc_ids, documents))
+            ),
+        )
+        self.rows += len(doc_ids)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        self.conn.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+def write_docstore(path, index_to_docstore_id, docstore):
+    """Écrit les chunks dans une base SQLite, une ligne par vecteur FAISS (clé : rang FAISS)."""
+    writer = DocstoreWriter(path)
+    try:
+        doc_ids = [index_to_docstore_id[row] for row in range(len(index_to_docstore_id))]
+        for i in range(0, len(doc_ids), 1000):
+            batch = doc_ids[i:i + 1000]
+            writer.add(batch, [docstore.search(doc_id) for doc_id in batch])
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+
+# --- Lecture ---
+class SQLiteDocstore(Docstore):
+    """
+    Docstore en lecture seule adossé au fichier SQLite d'une version d'index.
+
+    Rien n'est chargé en mémoire à l'ouverture : seuls les chunks renvoyés par
+    une recherche sont lus (et désérialisés). Une connexion par thread.
+    """
+
+    def __init__(self, path, mmap_size=DOCSTORE_MMAP_SIZE):
+        self.path = Path(path)
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._size = None
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _document(doc_id, page_content, metadata):
+        return Document(id=doc_id, page_content=page_content, metadata=json.loads(metadata))
+
+    def search(self, search):
+        row = self._conn().execute(
+            "SELECT doc_id, page_content, metadata FROM chunks WHERE doc_id = ?", (search,)
+        ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return self._document(*row)
+
+    def doc_id(self, row):
+        found = self._conn().execute("SELECT doc_id FROM chunks WHERE row = ?", (int(row),)).fetchone()
+        if found is None:
+            raise KeyError(row)
+        return found[0]
+
+    def by_rows(self, rows):
+        """Documents des rangs FAISS demandés, dans le même ordre (None si absent)."""
+        rows = [int(r) for r in rows]
+        if not rows:
+            return []
+        placeholders = ",".join("?" * len(rows))
+        found = {
+            r[0]: self._document(*r[1:])
+            for r in self._conn().execute(
+                f"SELECT row, doc_id, page_content, metadata FROM chunks WHERE row IN ({placeholders})", rows
+            )
+        }
+        return [found.get(r) for r in rows]
+
+    def doc_ids(self):
+        """Ids des chunks dans l'ordre des rangs FAISS."""
+        return [r[0] for r in self._conn().execute("SELECT doc_id FROM chunks ORDER BY row")]
+
+    def iter_metadata(self):
+        """(doc_id, métadonnées) de tous les chunks, sans charger leur texte."""
+        for doc_id, metadata in self._conn().execute("SELECT doc_id, metadata FROM chunks ORDER BY row"):
+            yield doc_id, json.loads(metadata)
+
+    def iter_documents(self):
+        """Tous les chunks dans l'ordre des rangs FAISS (une seule requête, lue au fil de l'eau)."""
+        for row in self._conn().execute("SELECT doc_id, page_content, metadata FROM chunks ORDER BY row"):
+            yield self._document(*row)
+
+    def __len__(self):
+        if self._size is None:
+            self._size = self._conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        return self._size
+
+    def to_memory(self):
+        """(InMemoryDocstore, index_to_docstore_id) : copie modifiable, pour la synchronisation."""
+        docs = {}
+        mapping = {}
+        for row, doc_id, page_content, metadata in self._conn().execute(
+            "SELECT row, doc_id, page_content, metadata FROM chunks ORDER BY row"
+        ):
+            docs[doc_id] = self._document(doc_id, page_content, metadata)
+            mapping[row] = doc_id
+        return InMemoryDocstore(docs), mapping
+
+    def add(self, texts):
+        raise NotImplementedError("SQLiteDocstore est en lecture seule (charger l'index avec writable=True)")
+
+    def delete(self, ids):
+        raise NotImplementedError("SQLiteDocstore est en lecture seule (charger l'index avec writable=True)")
+
+
+class RowIdMap(Mapping):
+    """index_to_docstore_id paresseux : rang FAISS -> id du chunk, lu à la demande dans SQLite."""
+
+    def __init__(self, store: SQLiteDocstore):
+        self.store = store
+
+    def __getitem__(self, row):
+        return self.store.doc_id(row)
+
+    def __len__(self):
+        return len(self.store)
+
+    def __iter__(self):
+        return iter(range(len(self.store)))
+
+    def values(self):
+        return self.store.doc_ids()
+
+    def items(self):
+        return list(enumerate(self.store.doc_ids()))
+
+
+class ReadOnlyFAISS(FAISS):
+    """Index servi : vecteurs projetés en mémoire, toute modification est refusée d'emblée."""
+
+    def _read_only(self, *args, **kwargs):
+        raise NotImplementedError("index en lecture seule (charger l'index avec writable=True)")
+
+    add_texts = add_embeddings = delete = merge_from = _read_only
+
+
+def docstore_size(docstore):
+    """Nombre de chunks d'un docstore (en mémoire ou SQLite)."""
+    return len(docstore._dict) if hasattr(docstore, "_dict") else len(docstore)
+
+
+def iter_store_documents(db):
+    """Chunks d'un FAISS LangChain dans l'ordre des rangs (parcours séquentiel si SQLite)."""
+    if hasattr(db.docstore, "iter_documents"):
+        yield from db.docstore.iter_documents()
+        return
+    for row in range(db.index.ntotal):
+        yield db.docstore.search(db.index_to_docstore_id[row])
+
+
+# --- Index FAISS + docstore ---
+def save_faiss(db, path):
+    """Écrit index.faiss (dans le type configuré, cf. ann_index) + docstore.sqlite dans `path`."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    faiss.write_index(convert_index(db.index), str(path / INDEX_FILE))
+    write_docstore(path / DOCSTORE_FILE, db.index_to_docstore_id, db.docstore)
+
+
+def _read_index(path, writable):
+    if not writable:
+        try:
+            # vecteurs projetés en mémoire : partagés entre workers, non copiés sur le tas
+            return faiss.read_index(str(path), faiss.IO_FLAG_MMAP_IFC)
+        except (RuntimeError, AttributeError):
+            pass
+    return faiss.read_index(str(path))
+
+
+def load_faiss(path, embeddings, writable=False):
+    """
+    Ouvre une version d'index.
+
+    Par défaut (service des requêtes) rien n'est désérialisé : le docstore reste dans
+    SQLite et seuls les k chunks trouvés sont lus ; nprobe/efSearch sont appliqués et
+    la table de reconstruction IVF est construite avant toute recherche.
+    `writable=True` charge une copie en mémoire modifiable (add/delete), avec un index
+    exact reconstruit si possible, pour la synchronisation incrémentale.
+    Les versions au format pickle (index.pkl) restent lisibles.
+    """
+    path = Path(path)
+    if not (path / DOCSTORE_FILE).exists():
+        db = FAISS.load_local(str(path), embeddings, allow_dangerous_deserialization=True)
+    elif writable:
+        docstore, index_to_docstore_id = SQLiteDocstore(path / DOCSTORE_FILE).to_memory()
+        db = FAISS(embeddings, _read_index(path / INDEX_FILE, writable), docstore, index_to_docstore_id)
+    else:
+        store = SQLiteDocstore(path / DOCSTORE_FILE)
+        db = ReadOnlyFAISS(embeddings, _read_index(path / INDEX_FILE, writable), store, RowIdMap(store))
+
+    if writable:
+        # IVF/HNSW : vecteurs reconstruits dans un index exact ; IVF-PQ : inchangé (non modifiable)
+        db.index = to_flat(db.index) or db.index
+    else:
+        set_search_params(db.index)
+        make_reconstructible(db.index)  # distances exactes sur les candidats filtrés
+    return db
@@ -0,0 +1,103 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from text_utils import text_hash
+except ImportError:
+    from rag.text_utils import text_hash
+
+
+# --- Cache persistant d'embeddings (SQLite) ---
+class EmbeddingCache:
+    """
+    Cache disque des embeddings, adressé par contenu.
+
+    Clé : (nom du modèle, SHA-256 du texte normalisé).
+    Valeur : vecteur float32 stocké en BLOB (4 octets par dimension).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, model, hashes):
+        """Renvoie {hash: vecteur float32} pour les hashes présents dans le cache."""
+        found = {}
+        hashes = list(dict.fromkeys(hashes))
+        with self._lock:
+            # SQLite limite le nombre de paramètres par requête
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, items):
+        """Enregistre une liste de (hash, vecteur)."""
+        rows = []
+        for h, vector in items:
+            arr = np.asarray(vector, dtype=np.float32)
+            rows.append((model, h, arr.shape[0], arr.tobytes()))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def cached_embed(cache, model, texts, embed_fn):
+    """
+    Embeddings de `texts` en passant par le cache : seuls les textes absents
+    (dédupliqués) sont envoyés à `embed_fn`. Renvoie (vecteurs, nb_hits, nb_miss).
+    """
+    hashes = [text_hash(t) for t in texts]
+    found = cache.get_many(model, hashes)
+
+    missing = {}
+    for h, t in zip(hashes, texts):
+        if h not in found and h not in missing:
+            missing[h] = t
+
+    if missing:
+        new_vectors = embed_fn(list(missing.values()))
+        new_items = list(zip(missing.keys(), new_vectors))
+        cache.put_many(model, new_items)
+        for h, v in new_items:
+            found[h] = np.asarray(v, dtype=np.float32)
+
+    vectors = [found[h].tolist() for h in hashes]
+    return vectors, len(texts) - len(missing), len(missing)
@@ -0,0 +1,95 @@
+"""
+Regroupement des embeddings de questions concurrentes (chemin asynchrone de /ask).
+
+Sans regroupement, chaque /ask simultané envoie son propre `embeddings.create(inputs=[question])`
+et consomme une requête du quota. Le coalesceur retient les questions qui arrivent pendant
+une courte fenêtre (EMBED_COALESCE_WINDOW_MS) ou jusqu'à `max_batch` questions, les envoie
+en un seul appel et rend à chaque appelant son vecteur.
+"""
+import asyncio
+import os
+
+try:
+    from query_cache import normalize_question
+    import metrics
+except ImportError:
+    from rag.query_cache import normalize_question
+    from rag import metrics
+
+EMBED_COALESCE = os.getenv("EMBED_COALESCE", "1") == "1"
+EMBED_COALESCE_WINDOW_MS = float(os.getenv("EMBED_COALESCE_WINDOW_MS", "3"))
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+metrics.registry.describe("rag_embed_coalesced_batch", "histogram",
+                          "Questions par appel d'embedding regroupé", buckets=BATCH_BUCKETS)
+
+
+class QueryCoalescer:
+    """
+    `embed_many(texts)` (coroutine) est appelé une fois par lot. Un lot part quand la fenêtre
+    ouverte par sa première question expire, ou dès qu'il atteint `max_batch` questions.
+    Les questions identiques (après normalisation) d'un même lot ne sont envoyées qu'une fois.
+    Une erreur de l'appel est propagée à toutes les questions du lot.
+    Un lot en cours par boucle d'événements (cas des tests / scripts qui enchaînent asyncio.run).
+    """
+
+    def __init__(self, embed_many, window=EMBED_COALESCE_WINDOW_MS / 1000, max_batch=128):
+        self.embed_many = embed_many
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._pending = {}  # boucle -> [(texte, future)]
+        self._timers = {}
+        self._tasks = set()  # références fortes : une tâche non référencée peut être collectée en vol
+        self.calls = 0
+        self.items = 0
+
+    async def embed(self, text):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(loop, [])
+        batch.append((text, future))
+        if len(batch) >= self.max_batch:
+            self._flush(loop)
+        elif len(batch) == 1:
+            self._timers[loop] = loop.call_later(self.window, self._flush, loop)
+        return await future
+
+    def _flush(self, loop):
+        timer = self._timers.pop(loop, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(loop, None)
+        if batch:
+            task = loop.create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch):
+        positions = {}  # question normalisée -> indice dans l'appel
+        texts = []
+        for text, _ in batch:
+            key = normalize_question(text)
+            if key not in positions:
+                positions[key] = len(texts)
+                texts.append(text)
+        self.calls += 1
+        self.items += len(batch)
+        metrics.observe("rag_embed_coalesced_batch", len(texts))
+        try:
+            vectors = await self.embed_many(texts)
+            if len(vectors) != len(texts):
+                raise RuntimeError(f"{len(vectors)} vecteurs reçus pour {len(texts)} questions")
+        except BaseException as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for text, future in batch:
+            if not future.done():  # appelant annulé entre-temps
+                future.set_result(vectors[positions[normalize_question(text)]])
+
+    def stats(self):
+        return {"calls": self.calls, "items": self.items,
+                "mean_batch": round(self.items / self.calls, 2) if self.calls else 0.0}
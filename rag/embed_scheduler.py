@@ -0,0 +1,139 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+from tqdm import tqdm
+
+try:
+    from rate_limit import TokenBucket, is_rate_limit_error, retry_after_seconds, backoff_delay
+    from text_utils import estimate_tokens
+except ImportError:
+    from rag.rate_limit import TokenBucket, is_rate_limit_error, retry_after_seconds, backoff_delay
+    from rag.text_utils import estimate_tokens
+
+
+# --- Découpage en batches selon un budget de tokens ---
+def make_batches(texts, max_batch_tokens=16000, max_batch_size=128):
+    """
+    Regroupe les textes en batches contigus respectant un budget de tokens estimé.
+    Retourne une liste de (indice_de_départ, textes, tokens_estimés).
+    """
+    batches = []
+    start, current, current_tokens = 0, [], 0
+    for i, text in enumerate(texts):
+        n = estimate_tokens(text)
+        if current and (current_tokens + n > max_batch_tokens or len(current) >= max_batch_size):
+            batches.append((start, current, current_tokens))
+            start, current, current_tokens = i, [], 0
+        current.append(text)
+        current_tokens += n
+    if current:
+        batches.append((start, current, current_tokens))
+    return batches
+
+
+# --- Ordonnanceur d'embeddings ---
+class EmbeddingScheduler:
+    """
+    Envoie les batches d'embeddings en parallèle sous contrainte de quota.
+
+    - batches dimensionnés par budget de tokens (`max_batch_tokens`)
+    - au plus `max_in_flight` requêtes simultanées
+    - token bucket sur les requêtes/s et (optionnel) sur les tokens/min
+    - retries avec backoff exponentiel sur 429 / "capacity exceeded"
+    - résultats renvoyés dans l'ordre des textes d'entrée
+
+    `client` est n'importe quel objet exposant `client.embeddings.create(model=..., inputs=[...])`
+    (client Mistral officiel ou faux client local pour les tests).
+    """
+
+    def __init__(
+        self,
+        client,
+        model="mistral-embed",
+        max_in_flight=2,
+        requests_per_second=1.0,
+        tokens_per_minute=None,
+        max_batch_tokens=16000,
+        max_batch_size=128,
+        max_retries=6,
+        base_backoff=1.0,
+        max_backoff=60.0,
+        sleep=time.sleep,
+        show_progress=True,
+    ):
+        self.client = client
+        self.model = model
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.show_progress = show_progress
+        self._sleep = sleep
+        self.request_bucket = TokenBucket(requests_per_second, capacity=max(1.0, requests_per_second), sleep=sleep)
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute / 60.0, capacity=tokens_per_minute, sleep=sleep)
+            if tokens_per_minute else None
+        )
+        self.retries = 0
+
+    def _embed_batch(self, batch, n_tokens):
+        """Envoie un batch avec retries ; renvoie la liste des vecteurs."""
+        attempt = 0
+        while True:
+            self.request_bucket.acquire(1)
+            if self.token_bucket is not None:
+                self.token_bucket.acquire(n_tokens)
+            try:
+                response = self.client.embeddings.create(model=self.model, inputs=batch)
+                return [e.embedding for e in response.data]
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                delay = retry_after_seconds(e) or backoff_delay(attempt, self.base_backoff, self.max_backoff)
+                # Un 429 concerne tout le compte : on met tout le monde en pause
+                self.request_bucket.pause(delay)
+                self.retries += 1
+                attempt += 1
+                self._sleep(delay)
+
+    def embed(self, texts, progress=None):
+        """
+        Calcule les embeddings de `texts` (dans l'ordre).
+        `progress(done, total)` est appelé après chaque batch terminé.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        batches = make_batches(texts, self.max_batch_tokens, self.max_batch_size)
+        results = [None] * len(texts)
+        bar = tqdm(total=len(batches), desc="Embedding batches", disable=not self.show_progress)
+        done = 0
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as pool:
+            futures = {
+                pool.submit(self._embed_batch, batch, n_tokens): (start, len(batch))
+                for start, batch, n_tokens in batches
+            }
+            pending = set(futures)
+            try:
+                while pending:
+                    finished, pending = wait(pending, return_when=FIRST_EXCEPTION)
+                    for fut in finished:
+                        start, size = futures[fut]
+                        vectors = fut.result()
+                        if len(vectors) != size:
+                            raise RuntimeError(
+                                f"Réponse d'embedding incomplète : {len(vectors)} vecteurs pour {size} textes"
+                            )
+                        results[start:start + size] = vectors
+                        done += 1
+                        bar.update(1)
+                        if progress is not None:
+                            progress(done, len(batches))
+            except BaseException:
+                for fut in pending:
+                    fut.cancel()
+                raise
+            finally:
+                bar.close()
+        return results
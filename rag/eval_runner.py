@@ -0,0 +1,329 @@
+"""
+Évaluation hors ligne du RAG, en processus (sans passer par l'API HTTP).
+
+Chaque étape est mise en cache dans data/eval_cache.sqlite :
+- recherche : (question, version de l'index, k, réglages du retriever) ;
+- prédiction : (question, version de l'index, empreinte du prompt, k, empreinte du contexte assemblé) ;
+- verdict du juge : (modèle et prompt du juge, question, réponse, contexte, réponse attendue).
+Relancer après une modification du seul prompt ne régénère que les réponses ; les recherches
+sont relues du cache et le juge n'est rappelé que pour les réponses qui ont changé.
+
+Les questions non encore recherchées sont embeddées en un seul appel, les similarités
+(réponse attendue / réponse produite) encodées en un seul lot, et les appels LLM
+(génération + juge) tournent en parallèle sous un token bucket (EVAL_RPS) et un nombre
+d'appels simultanés borné (EVAL_CONCURRENCY).
+
+    python -m rag.eval_runner --eval eval/eval_data.json --out eval/results.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+try:
+    from chatbot import service as default_service
+    from context import pack_context
+    from rate_limit import TokenBucket, backoff_delay, is_rate_limit_error
+    from retrieval import RETRIEVAL_COLLAPSE, RETRIEVAL_FILTERS, RETRIEVAL_HYBRID
+    from vector_pipe import default_embed_cache, make_embeddings
+except ImportError:
+    from rag.chatbot import service as default_service
+    from rag.context import pack_context
+    from rag.rate_limit import TokenBucket, backoff_delay, is_rate_limit_error
+    from rag.retrieval import RETRIEVAL_COLLAPSE, RETRIEVAL_FILTERS, RETRIEVAL_HYBRID
+    from rag.vector_pipe import default_embed_cache, make_embeddings
+
+ROOT = Path(__file__).resolve().parents[1]
+
+EVAL_FILE = ROOT / "eval" / "eval_data.json"
+EVAL_CACHE_PATH = Path(os.getenv("EVAL_CACHE_PATH", str(ROOT / "data" / "eval_cache.sqlite")))
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "4"))
+EVAL_RPS = float(os.getenv("EVAL_RPS", "1"))  # appels LLM (génération + juge) par seconde
+JUDGE_MODEL = os.getenv("EVAL_MODEL", "mistral-small-2503")
+
+JUDGE_PROMPT = """Tu évalues la réponse d'un assistant RAG sur des événements culturels.
+
+Question : {question}
+
+Contexte fourni à l'assistant :
+{context}
+
+Réponse attendue : {ground_truth}
+
+Réponse de l'assistant : {answer}
+
+Note chaque critère entre 0 et 1 :
+- faithfulness : la réponse ne contient que des informations présentes dans le contexte ;
+- correctness : la réponse couvre la réponse attendue.
+Réponds uniquement par un objet JSON : {{"faithfulness": <nombre>, "correctness": <nombre>, "reason": "<une phrase>"}}
+"""
+
+_JSON_RE = re.compile(r"\{.*\}", re.S)
+
+
+def _key(*parts):
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# --- Cache persistant des étapes (SQLite) ---
+class EvalCache:
+    """Valeurs JSON adressées par (étape, clé) ; compteurs hits/misses par étape."""
+
+    def __init__(self, path=EVAL_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, created REAL NOT NULL,"
+            " PRIMARY KEY (kind, key)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self.counters = {}
+
+    def _count(self, kind, hit):
+        counter = self.counters.setdefault(kind, {"hits": 0, "misses": 0})
+        counter["hits" if hit else "misses"] += 1
+
+    def get(self, kind, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+        self._count(kind, row is not None)
+        return json.loads(row[0]) if row else None
+
+    def put(self, kind, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (kind, key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Juge LLM ---
+class Judge:
+    """Juge LLM (client Mistral) : note fidélité au contexte et justesse, en JSON."""
+
+    def __init__(self, client, model=JUDGE_MODEL, template=JUDGE_PROMPT):
+        self.client = client
+        self.model = model
+        self.template = template
+        self.fingerprint = _key(model, template)[:16]
+
+    async def score(self, question, answer, contexts, ground_truth):
+        prompt = self.template.format(question=question, answer=answer, ground_truth=ground_truth,
+                                      context="\n\n".join(contexts) or "(vide)")
+        response = await self.client.chat.complete_async(
+            model=self.model, messages=[{"role": "user", "content": prompt}]
+        )
+        return parse_verdict(response.choices[0].message.content)
+
+
+def parse_verdict(text):
+    """Objet JSON de la réponse du juge (tolère du texte autour) ; notes bornées à [0, 1]."""
+    match = _JSON_RE.search(text or "")
+    try:
+        data = json.loads(match.group(0)) if match else {}
+    except ValueError:
+        data = {}
+    verdict = {"reason": str(data.get("reason", ""))[:500]}
+    for name in ("faithfulness", "correctness"):
+        try:
+            verdict[name] = min(1.0, max(0.0, float(data[name])))
+        except (KeyError, TypeError, ValueError):
+            verdict[name] = None
+    return verdict
+
+
+def cosine(a, b):
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    denom = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / denom if denom else 0.0
+
+
+# --- Exécution ---
+class EvalRunner:
+    """
+    Évalue un jeu de cas {"question", "ground_truth"} avec le service RAG en processus.
+    `judge` (optionnel) note chaque réponse ; `encoder` (optionnel, interface Embeddings)
+    calcule la similarité réponse attendue / réponse produite.
+    """
+
+    def __init__(self, service=None, cache=None, judge=None, encoder=None, k=5,
+                 concurrency=EVAL_CONCURRENCY, rps=EVAL_RPS, max_retries=3):
+        self.service = service or default_service
+        self.cache = cache or EvalCache()
+        self.judge = judge
+        self.encoder = encoder
+        self.k = k
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rps, capacity=max(1.0, rps))
+        self.max_retries = max_retries
+
+    async def _call(self, semaphore, fn, *args):
+        """Appel LLM sous le token bucket et le sémaphore, avec reprise sur 429."""
+        for attempt in range(self.max_retries + 1):
+            async with semaphore:
+                await self.bucket.acquire_async()
+                try:
+                    return await fn(*args)
+                except Exception as e:
+                    if attempt == self.max_retries or not is_rate_limit_error(e):
+                        raise
+            await asyncio.sleep(backoff_delay(attempt))
+
+    async def _retrieve(self, state, questions):
+        """Contextes (documents) par question : cache, sinon un embedding groupé + recherche groupée."""
+        settings = (RETRIEVAL_FILTERS, RETRIEVAL_HYBRID, RETRIEVAL_COLLAPSE)
+        keys = [_key("retrieval", q, state.version, self.k, settings) for q in questions]
+        found = [self.cache.get("retrieval", key) for key in keys]
+        missing = [i for i, docs in enumerate(found) if docs is None]
+        if missing:
+            vectors = await self.service.aembed_questions([questions[i] for i in missing])
+            results = await asyncio.to_thread(
+                state.retriever.search_batch, [questions[i] for i in missing], vectors, self.k
+            )
+            for i, docs in zip(missing, results):
+                found[i] = [{"page_content": d.page_content, "metadata": d.metadata} for d in docs]
+                self.cache.put("retrieval", keys[i], found[i])
+        return [[Document(**doc) for doc in docs] for docs in found]
+
+    async def _predict(self, semaphore, state, question, docs):
+        # le contexte assemblé fait partie de la clé : réglages de recherche ou contenu de
+        # l'index modifiés (même sans version) -> nouvelle réponse
+        packed = pack_context(docs, self.k)
+        context_hash = hashlib.sha256(packed.text.encode("utf-8")).hexdigest()
+        key = _key("prediction", question, state.version, self.service.prompt_fingerprint(), self.k, context_hash)
+        prediction = self.cache.get("prediction", key)
+        if prediction is None:
+            answer = await self._call(semaphore, self.service.agenerate, question, packed.text)
+            prediction = {"answer": answer, "contexts": packed.texts,
+                          "sources": [d.metadata.get("id") for d in packed.docs]}
+            self.cache.put("prediction", key, prediction)
+        return prediction
+
+    async def _judge(self, semaphore, case, prediction):
+        key = _key("judge", self.judge.fingerprint, case["question"], prediction["answer"],
+                   prediction["contexts"], case["ground_truth"])
+        verdict = self.cache.get("judge", key)
+        if verdict is None:
+            verdict = await self._call(semaphore, self.judge.score, case["question"], prediction["answer"],
+                                       prediction["contexts"], case["ground_truth"])
+            self.cache.put("judge", key, verdict)
+        return verdict
+
+    def _similarities(self, cases, predictions):
+        """Toutes les réponses attendues et produites encodées en un seul appel."""
+        texts = [c["ground_truth"] for c in cases] + [p["answer"] for p in predictions]
+        vectors = self.encoder.embed_documents(texts)
+        n = len(cases)
+        return [cosine(vectors[i], vectors[n + i]) for i in range(n)]
+
+    async def arun(self, cases):
+        t0 = time.perf_counter()
+        state = await self.service.awarmup()
+        questions = [c["question"] for c in cases]
+        contexts = await self._retrieve(state, questions)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def evaluate(case, docs):
+            try:
+                prediction = await self._predict(semaphore, state, case["question"], docs)
+            except Exception as e:
+                return {"question": case["question"], "error": f"{type(e).__name__}: {e}"}
+            item = {"question": case["question"], "ground_truth": case["ground_truth"], **prediction}
+            if self.judge is not None:
+                try:
+                    item["verdict"] = await self._judge(semaphore, case, prediction)
+                except Exception as e:
+                    item["verdict"] = {"error": f"{type(e).__name__}: {e}"}
+            return item
+
+        items = await asyncio.gather(*(evaluate(c, docs) for c, docs in zip(cases, contexts)))
+        answered = [(c, item) for c, item in zip(cases, items) if "error" not in item]
+        if self.encoder is not None and answered:
+            scores = await asyncio.to_thread(self._similarities, *zip(*answered))
+            for (_, item), score in zip(answered, scores):
+                item["similarity"] = round(score, 4)
+        return {
+            "index_version": state.version,
+            "prompt": self.service.prompt_fingerprint(),
+            "items": items,
+            "summary": summarize(items),
+            "cache": self.cache.counters,
+            "seconds": round(time.perf_counter() - t0, 2),
+        }
+
+    def run(self, cases):
+        return asyncio.run(self.arun(cases))
+
+
+def summarize(items):
+    """Moyennes des métriques disponibles et nombre d'erreurs."""
+    def mean(values):
+        values = [v for v in values if v is not None]
+        return round(sum(values) / len(values), 4) if values else None
+
+    verdicts = [item.get("verdict") or {} for item in items]
+    return {
+        "questions": len(items),
+        "errors": sum("error" in item for item in items),
+        "similarity": mean([item.get("similarity") for item in items]),
+        "faithfulness": mean([v.get("faithfulness") for v in verdicts]),
+        "correctness": mean([v.get("correctness") for v in verdicts]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eval", default=str(EVAL_FILE))
+    parser.add_argument("--out")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=EVAL_CONCURRENCY)
+    parser.add_argument("--rps", type=float, default=EVAL_RPS)
+    parser.add_argument("--no-judge", action="store_true")
+    args = parser.parse_args()
+
+    cases = json.loads(Path(args.eval).read_text(encoding="utf-8"))
+    service = default_service
+    service.warmup()
+    judge = None if args.no_judge else Judge(service.chat_client)
+    runner = EvalRunner(service, judge=judge, encoder=make_embeddings(cache=default_embed_cache()),
+                        k=args.k, concurrency=args.concurrency, rps=args.rps)
+    report = runner.run(cases)
+
+    for item in report["items"]:
+        verdict = item.get("verdict") or {}
+        print(f"🔹 {item['question']}")
+        if "error" in item:
+            print(f"   ❌ {item['error']}")
+            continue
+        print(f"   similarité {item.get('similarity')}  fidélité {verdict.get('faithfulness')}  "
+              f"justesse {verdict.get('correctness')}")
+    print(f"\n=== Résultats ({report['seconds']} s, index {report['index_version']}, prompt {report['prompt']}) ===")
+    print(json.dumps(report["summary"], ensure_ascii=False))
+    print("Cache :", json.dumps(report["cache"]))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Jeu d'événements nettoyés au format Parquet (data/events_clean.parquet) : artefact canonique
+entre l'ingestion et la construction de l'index. events_clean.json / .csv restent des exports.
+
+Colonnes typées (listes, structures) ; les dates restent au format ISO reçu de l'API.
+L'empreinte de contenu (content_hash) est calculée à l'écriture : l'indexeur ne lit que
+les colonnes dont il a besoin, par lots, sans repasser par l'enregistrement complet.
+
+    python -m rag.events_dataset data/events_clean.json   # conversion d'un export JSON existant
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+EVENTS_PARQUET = Path(os.getenv("EVENTS_PARQUET_PATH", "./data/events_clean.parquet"))
+BATCH_ROWS = int(os.getenv("EVENTS_BATCH_ROWS", "2048"))
+
+EVENTS_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("title", pa.string()),
+    ("description", pa.string()),
+    ("long_description", pa.string()),
+    ("keywords", pa.list_(pa.string())),
+    ("city", pa.string()),
+    ("region", pa.string()),
+    ("country", pa.string()),
+    ("address", pa.string()),
+    ("coordinates", pa.struct([("lon", pa.float64()), ("lat", pa.float64())])),
+    ("date_start", pa.string()),
+    ("date_end", pa.string()),
+    ("url", pa.string()),
+    ("text_to_embed", pa.string()),
+    ("content_hash", pa.string()),
+])
+
+# colonnes lues par l'indexeur (texte à embedder + métadonnées des chunks)
+INDEX_COLUMNS = ["id", "title", "url", "date_start", "date_end", "city", "region", "keywords",
+                 "text_to_embed", "content_hash"]
+
+
+# --- Empreinte d'un événement (détection des modifications) ---
+def record_hash(record):
+    """Hash stable du contenu complet d'un événement."""
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _row(record):
+    """Enregistrement mis au schéma : mots-clés en liste, dates en texte, empreinte ajoutée."""
+    row = {name: record.get(name) for name in EVENTS_SCHEMA.names}
+    row["content_hash"] = record.get("content_hash") or record_hash(record)
+    keywords = row["keywords"]
+    if isinstance(keywords, str):
+        try:
+            keywords = json.loads(keywords)
+        except ValueError:
+            keywords = [keywords]
+    row["keywords"] = [str(k) for k in keywords] if keywords else []
+    for key in ("id", "date_start", "date_end"):
+        if row[key] is not None and not isinstance(row[key], str):
+            row[key] = str(row[key])
+    if not isinstance(row["coordinates"], dict):
+        row["coordinates"] = None
+    return row
+
+
+class EventsWriter:
+    """Écriture en flux : les lignes sont écrites par groupes de `batch_rows` (mémoire constante)."""
+
+    def __init__(self, path, batch_rows=BATCH_ROWS):
+        self.path = Path(path)
+        self.tmp = self.path.with_name(self.path.name + ".tmp")
+        self.batch_rows = batch_rows
+        self.rows = []
+        self.count = 0
+        self.writer = pq.ParquetWriter(self.tmp, EVENTS_SCHEMA, compression="zstd")
+
+    def write(self, record):
+        self.rows.append(_row(record))
+        self.count += 1
+        if len(self.rows) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.write_batch(pa.RecordBatch.from_pylist(self.rows, schema=EVENTS_SCHEMA))
+            self.rows = []
+
+    def close(self):
+        """Termine le fichier et le publie (renommage atomique)."""
+        self.flush()
+        self.writer.close()
+        os.replace(self.tmp, self.path)
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.writer.close()
+            self.tmp.unlink(missing_ok=True)
+
+
+def write_events(records, path=EVENTS_PARQUET, batch_rows=BATCH_ROWS):
+    """Écrit un itérable d'événements en Parquet ; renvoie le nombre de lignes."""
+    with EventsWriter(path, batch_rows) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+
+def iter_event_batches(path=EVENTS_PARQUET, columns=INDEX_COLUMNS, batch_rows=BATCH_ROWS):
+    """Lots d'événements (listes de dicts) limités aux colonnes demandées."""
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=batch_rows, columns=columns):
+        yield batch.to_pylist()
+
+
+def iter_events(path=EVENTS_PARQUET, columns=INDEX_COLUMNS, batch_rows=BATCH_ROWS):
+    for batch in iter_event_batches(path, columns, batch_rows):
+        yield from batch
+
+
+def convert_json(json_path, parquet_path=None):
+    """Convertit un export events_clean.json (tableau JSON) en Parquet à côté."""
+    json_path = Path(json_path)
+    parquet_path = Path(parquet_path or json_path.with_suffix(".parquet"))
+    records = json.loads(json_path.read_text(encoding="utf-8"))
+    return parquet_path, write_events(records, parquet_path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    for source in sys.argv[1:] or ["data/events_clean.json"]:
+        target, count = convert_json(source)
+        print(f"{count} événements écrits dans {target}")
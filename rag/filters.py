@@ -0,0 +1,375 @@
+"""
+Filtres structurés extraits de la question (dates, ville, gratuit, famille)
+et index de métadonnées précalculé, une ligne par vecteur FAISS.
+
+Le filtre produit directement l'ensemble des rangs FAISS candidats (masques numpy
+sur des colonnes précalculées) : la recherche vectorielle est ensuite restreinte à
+ces rangs, sans parcourir le docstore.
+"""
+import ast
+import calendar
+import json
+import re
+import unicodedata
+from array import array
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+METADATA_INDEX_FILE = "metadata_index.npz"
+
+MONTHS = {
+    "janvier": 1, "fevrier": 2, "mars": 3, "avril": 4, "mai": 5, "juin": 6, "juillet": 7,
+    "aout": 8, "septembre": 9, "octobre": 10, "novembre": 11, "decembre": 12,
+}
+_MONTH = "(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + ")"
+_DAY = r"(1er|[0-3]?\d)"
+_YEAR = r"(20\d\d)"
+
+_DAY_RANGE_RE = re.compile(
+    rf"\b(?:du|entre le|entre)\s+{_DAY}(?:\s+{_MONTH})?(?:\s+{_YEAR})?\s+(?:au|et le|et)\s+{_DAY}\s+{_MONTH}(?:\s+{_YEAR})?"
+)
+_MONTH_RANGE_RE = re.compile(
+    rf"\b(?:entre|de|d'|du mois de|du mois d')\s*{_MONTH}(?:\s+{_YEAR})?\s+(?:et|a)\s+{_MONTH}(?:\s+{_YEAR})?"
+)
+_DAY_RE = re.compile(rf"\b{_DAY}\s+{_MONTH}(?:\s+{_YEAR})?")
+_NUMERIC_RE = re.compile(r"\b([0-3]?\d)/([01]?\d)/(20\d\d)\b")
+_MONTH_RE = re.compile(rf"\b{_MONTH}(?:\s+{_YEAR})?\b")
+_YEAR_RE = re.compile(rf"\b{_YEAR}\b")
+
+FREE_RE = re.compile(r"\bgratuite?s?\b|\bentree (?:libre|gratuite)\b|\bsans frais\b")
+FAMILY_RE = re.compile(r"\ben famille\b|\bfamil(?:le|les|ial|iale|iales|iaux)\b|\benfants?\b|\bjeune public\b|\bkids?\b")
+_WORD_RE = re.compile(r"\w+")
+
+
+def fold(text):
+    """Minuscules sans accents, apostrophes et espaces normalisés (pour les comparaisons)."""
+    text = unicodedata.normalize("NFD", (text or "").lower())
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    return " ".join(text.replace("’", "'").split())
+
+
+def _day(value):
+    return 1 if value == "1er" else int(value)
+
+
+def _month_bounds(year, month):
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _safe_date(year, month, day):
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def parse_dates(text, today=None, default_year=None):
+    """
+    (début, fin) de la période citée dans un texte déjà replié par `fold`, ou (None, None).
+    Mois ou jour sans année : `default_year` (ex. année couverte par l'index), sinon l'année en cours.
+    """
+    today = today or date.today()
+    years = _YEAR_RE.findall(text)
+    default_year = int(years[-1]) if years else (default_year or today.year)
+
+    m = _DAY_RANGE_RE.search(text)
+    if m:
+        d1, m1, y1, d2, m2, y2 = m.groups()
+        year2 = int(y2) if y2 else default_year
+        start = _safe_date(int(y1) if y1 else year2, MONTHS[m1 or m2], _day(d1))
+        end = _safe_date(year2, MONTHS[m2], _day(d2))
+        if start and end:
+            return start, end
+    m = _MONTH_RANGE_RE.search(text)
+    if m:
+        m1, y1, m2, y2 = m.groups()
+        year2 = int(y2) if y2 else default_year
+        return _month_bounds(int(y1) if y1 else year2, MONTHS[m1])[0], _month_bounds(year2, MONTHS[m2])[1]
+    m = _NUMERIC_RE.search(text)
+    if m:
+        day = _safe_date(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+        if day:
+            return day, day
+    m = _DAY_RE.search(text)
+    if m:
+        day = _safe_date(int(m.group(3)) if m.group(3) else default_year, MONTHS[m.group(2)], _day(m.group(1)))
+        if day:
+            return day, day
+    m = _MONTH_RE.search(text)
+    if m:
+        return _month_bounds(int(m.group(2)) if m.group(2) else default_year, MONTHS[m.group(1)])
+    if years:
+        return date(default_year, 1, 1), date(default_year, 12, 31)
+
+    if "aujourd'hui" in text or "ce soir" in text:
+        return today, today
+    if "demain" in text:
+        return today + timedelta(days=1), today + timedelta(days=1)
+    if "week-end" in text or "weekend" in text:
+        if today.weekday() == 6:
+            return today, today
+        saturday = today + timedelta(days=(5 - today.weekday()) % 7)
+        return saturday, saturday + timedelta(days=1)
+    if "cette semaine" in text:
+        return today, today + timedelta(days=6 - today.weekday())
+    if "ce mois" in text:
+        return today, _month_bounds(today.year, today.month)[1]
+    return None, None
+
+
+class CityMatcher:
+    """
+    Ville citée dans une question, parmi les villes connues de l'index.
+    Les noms sont découpés en mots une fois pour toutes ; une question est parcourue par
+    n-grammes de mots (dictionnaire), quel que soit le nombre de villes.
+    """
+
+    def __init__(self, cities=()):
+        self._names = {}
+        self.max_words = 0
+        for name in cities:
+            words = tuple(_WORD_RE.findall(name or ""))
+            if words:
+                self._names.setdefault(words, name)
+                self.max_words = max(self.max_words, len(words))
+
+    def find(self, text):
+        """Ville la plus longue citée dans `text` (déjà replié par `fold`), ou None."""
+        words = _WORD_RE.findall(text)
+        for n in range(min(self.max_words, len(words)), 0, -1):
+            found = [self._names.get(tuple(words[i:i + n])) for i in range(len(words) - n + 1)]
+            found = [name for name in found if name is not None]
+            if found:
+                return max(found, key=len)
+        return None
+
+
+def parse_filters(question, cities=(), today=None, default_year=None):
+    """
+    Filtres tirés de la question :
+    {"date_from", "date_to", "city", "free", "family"} (None / False si absent).
+    `cities` : CityMatcher de l'index (MetadataIndex.city_matcher) ou liste de villes connues
+    (la plus longue trouvée l'emporte).
+    `default_year` : année retenue quand la question n'en cite pas (cf. MetadataIndex.default_year).
+    """
+    text = fold(question)
+    date_from, date_to = parse_dates(text, today, default_year)
+    matcher = cities if isinstance(cities, CityMatcher) else CityMatcher(cities)
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "city": matcher.find(text),
+        "free": bool(FREE_RE.search(text)),
+        "family": bool(FAMILY_RE.search(text)),
+    }
+
+
+def has_filters(filters):
+    return any(filters.get(key) for key in ("date_from", "city", "free", "family"))
+
+
+# --- Index de métadonnées ---
+def _day_number(value):
+    """
+    Jour (nombre de jours depuis 1970) d'une date ISO ou d'un horodatage en millisecondes
+    (forme produite par DataFrame.to_json pour date_start), -1 si absente ou invalide.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value // 86_400_000)
+    if isinstance(value, str) and value.isdigit():
+        return int(value) // 86_400_000
+    try:
+        return (date.fromisoformat(str(value)[:10]) - date(1970, 1, 1)).days
+    except (TypeError, ValueError):
+        return -1
+
+
+def _keywords(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            try:
+                value = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                value = [value]
+    return [fold(k) for k in (value or []) if isinstance(k, str) and k.strip()]
+
+
+class MetadataIndex:
+    """
+    Colonnes de métadonnées alignées sur les rangs FAISS : dates de début/fin (en jours),
+    code ville, drapeaux gratuit/famille (au niveau de l'événement) et index inversé des mots-clés.
+    """
+
+    def __init__(self, start, end, city_codes, cities, free, family, keywords, keyword_indptr, keyword_rows):
+        self.start = start
+        self.end = end
+        self.city_codes = city_codes
+        self.cities = list(cities)
+        self.free = free
+        self.family = family
+        self.keywords = list(keywords)
+        self.keyword_indptr = keyword_indptr
+        self.keyword_rows = keyword_rows
+        self._city_lookup = {name: i for i, name in enumerate(self.cities)}
+        self.city_matcher = CityMatcher(self.cities)
+        self._keyword_lookup = {name: i for i, name in enumerate(self.keywords)}
+        self._years = None
+
+    def __len__(self):
+        return len(self.start)
+
+    def year_range(self):
+        """(première, dernière) année couverte par les événements datés, ou None."""
+        if self._years is None:
+            dated = self.start >= 0
+            if not dated.any():
+                self._years = ()
+            else:
+                epoch = date(1970, 1, 1)
+                first = epoch + timedelta(days=int(self.start[dated].min()))
+                last = epoch + timedelta(days=int(self.end[dated].max()))
+                self._years = (first.year, last.year)
+        return self._years or None
+
+    def default_year(self, today=None):
+        """
+        Année d'une question sans année ("en avril") : l'année en cours si l'index la couvre,
+        sinon l'année de l'index la plus proche (un index 2025 interrogé en 2026 -> 2025).
+        """
+        year = (today or date.today()).year
+        years = self.year_range()
+        if years is None:
+            return year
+        return min(max(year, years[0]), years[1])
+
+    @classmethod
+    def build(cls, documents):
+        """`documents` : (metadata, texte du chunk) dans l'ordre des rangs FAISS."""
+        builder = MetadataIndexBuilder()
+        for meta, text in documents:
+            builder.add(meta, text)
+        return builder.finish()
+
+    @classmethod
+    def from_store(cls, db):
+        """Index construit depuis un FAISS LangChain (docstore en mémoire ou SQLite), en un parcours."""
+        try:
+            from docstore import iter_store_documents
+        except ImportError:
+            from rag.docstore import iter_store_documents
+
+        return cls.build((doc.metadata, doc.page_content) for doc in iter_store_documents(db))
+
+    # --- Persistance (à côté de l'index) ---
+    def save(self, version_path):
+        np.savez(
+            Path(version_path) / METADATA_INDEX_FILE,
+            start=self.start, end=self.end, city_codes=self.city_codes,
+            cities=np.array(self.cities, dtype=str), free=self.free, family=self.family,
+            keywords=np.array(self.keywords, dtype=str),
+            keyword_indptr=self.keyword_indptr, keyword_rows=self.keyword_rows,
+        )
+
+    @classmethod
+    def load(cls, version_path):
+        """Index de la version, ou None si elle a été construite avant les filtres."""
+        path = Path(version_path) / METADATA_INDEX_FILE
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+    # --- Sélection des rangs candidats ---
+    def rows_with_keyword(self, keyword):
+        i = self._keyword_lookup.get(fold(keyword))
+        if i is None:
+            return np.zeros(0, dtype=np.int64)
+        return self.keyword_rows[self.keyword_indptr[i]:self.keyword_indptr[i + 1]]
+
+    def candidate_rows(self, filters):
+        """Rangs FAISS compatibles avec les filtres, ou None si aucun filtre ne s'applique."""
+        if not has_filters(filters):
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        if filters.get("date_from"):
+            epoch = date(1970, 1, 1)
+            date_from = (filters["date_from"] - epoch).days
+            date_to = (filters["date_to"] - epoch).days
+            # l'événement chevauche la période demandée
+            mask &= (self.start >= 0) & (self.start <= date_to) & (self.end >= date_from)
+        if filters.get("city"):
+            code = self._city_lookup.get(fold(filters["city"]), -2)
+            mask &= self.city_codes == code
+        if filters.get("free"):
+            mask &= self.free
+        if filters.get("family"):
+            mask &= self.family
+        return np.flatnonzero(mask)
+
+
+class MetadataIndexBuilder:
+    """
+    Construction incrémentale d'un MetadataIndex, chunk par chunk (rangs FAISS croissants) :
+    seules les colonnes compactes sont gardées, jamais les textes ni les métadonnées complètes.
+    """
+
+    def __init__(self):
+        self.start = array("i")
+        self.end = array("i")
+        self.city_codes = array("i")
+        self.cities, self._city_lookup = [], {}
+        self.event_rows = {}
+        self.free_events, self.family_events = set(), set()
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.start)
+
+    def add(self, meta, text):
+        row = len(self.start)
+        start = _day_number(meta.get("date_start"))
+        end = _day_number(meta.get("date_end"))
+        self.start.append(start)
+        self.end.append(end if end >= 0 else start)
+        city = fold(meta.get("city"))
+        code = -1
+        if city:
+            if city not in self._city_lookup:
+                self._city_lookup[city] = len(self.cities)
+                self.cities.append(city)
+            code = self._city_lookup[city]
+        self.city_codes.append(code)
+        keywords = _keywords(meta.get("keywords"))
+        for keyword in set(keywords):
+            self.postings.setdefault(keyword, array("q")).append(row)
+        event_id = meta.get("id", row)
+        self.event_rows.setdefault(event_id, array("q")).append(row)
+        folded = " ".join([fold(meta.get("title")), fold(text)] + keywords)
+        if FREE_RE.search(folded):
+            self.free_events.add(event_id)
+        if FAMILY_RE.search(folded):
+            self.family_events.add(event_id)
+
+    def finish(self):
+        n = len(self)
+        free = np.zeros(n, dtype=bool)
+        family = np.zeros(n, dtype=bool)
+        for event_id in self.free_events:
+            free[self.event_rows[event_id]] = True
+        for event_id in self.family_events:
+            family[self.event_rows[event_id]] = True
+
+        keywords = sorted(self.postings)
+        indptr = np.zeros(len(keywords) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(self.postings[k]) for k in keywords])
+        rows = np.zeros(indptr[-1], dtype=np.int64)
+        for i, keyword in enumerate(keywords):
+            rows[indptr[i]:indptr[i + 1]] = self.postings[keyword]
+        return MetadataIndex(
+            np.array(self.start, dtype=np.int32), np.array(self.end, dtype=np.int32),
+            np.array(self.city_codes, dtype=np.int32), self.cities, free, family, keywords, indptr, rows,
+        )
@@ -0,0 +1,189 @@
+"""
+Organisation versionnée de l'index sur disque :
+
+    data/faiss_store/
+        CURRENT                  <- nom de la version servie (remplacé atomiquement)
+        versions/<version>/      <- index.faiss + docstore.sqlite d'une construction,
+                                    embedding_model.json (modèle qui a produit les vecteurs)
+        leases/<pid>-<id>.json   <- versions chargées par chaque service (worker uvicorn...)
+
+Un ancien index "à plat" (data/faiss_store/index.faiss) reste lisible.
+Le nettoyage des anciennes versions épargne celles qu'un processus vivant a chargées.
+"""
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+LEASES_DIR = "leases"
+KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "3"))
+MODEL_FILE = "embedding_model.json"
+# index écrits avant l'enregistrement du modèle : tous construits avec mistral-embed
+LEGACY_MODEL = {"backend": "mistral", "model": "mistral-embed"}
+# champs qui rendent deux modèles incompatibles (le runtime, ex. ONNX int8, n'en fait pas partie)
+IDENTITY_KEYS = ("backend", "model", "normalize")
+
+
+class EmbeddingModelMismatch(RuntimeError):
+    """L'index a été construit avec un autre modèle d'embedding que celui configuré."""
+
+
+def current_version(root):
+    """Nom de la version publiée, ou None pour un index à plat / absent."""
+    pointer = Path(root) / CURRENT_FILE
+    if not pointer.exists():
+        return None
+    return pointer.read_text(encoding="utf-8").strip() or None
+
+
+def resolve_current(root):
+    """(version, dossier) de l'index servi, lus en une seule fois."""
+    root = Path(root)
+    version = current_version(root)
+    if version is None:
+        return None, root
+    return version, root / VERSIONS_DIR / version
+
+
+def current_store_path(root):
+    """Dossier de l'index actuellement servi."""
+    return resolve_current(root)[1]
+
+
+def store_exists(root):
+    return (current_store_path(root) / "index.faiss").exists()
+
+
+def embedding_identity(embeddings):
+    """Identité du backend d'embeddings (méthode identity()), None si inconnue."""
+    identity = getattr(embeddings, "identity", None)
+    return identity() if callable(identity) else None
+
+
+def write_model_identity(version_path, embeddings, dim):
+    """Enregistre le modèle et la dimension des vecteurs d'une version."""
+    identity = embedding_identity(embeddings)
+    if identity is None:
+        return None
+    identity = {**identity, "dim": int(dim)}
+    (Path(version_path) / MODEL_FILE).write_text(json.dumps(identity, indent=2), encoding="utf-8")
+    return identity
+
+
+def read_model_identity(version_path):
+    path = Path(version_path) / MODEL_FILE
+    if not path.exists():
+        return dict(LEGACY_MODEL)
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def check_model_identity(version_path, embeddings, dim=None):
+    """
+    Refuse (EmbeddingModelMismatch) un index construit avec un autre modèle que `embeddings`,
+    ou dont la dimension diffère de celle enregistrée. Backend sans identité : pas de contrôle.
+    """
+    expected = embedding_identity(embeddings)
+    if expected is None:
+        return
+    stored = read_model_identity(version_path)
+    diff = {key: (stored.get(key), expected.get(key)) for key in IDENTITY_KEYS
+            if key in stored and key in expected and stored[key] != expected[key]}
+    if dim is not None and stored.get("dim") not in (None, dim):
+        diff["dim"] = (stored["dim"], dim)
+    if diff:
+        details = ", ".join(f"{key} : index {a!r} / configuré {b!r}" for key, (a, b) in diff.items())
+        raise EmbeddingModelMismatch(
+            f"Index {Path(version_path).name} construit avec un autre modèle d'embedding ({details}) : "
+            "reconstruire l'index (scripts/build_index.py) ou revenir au modèle d'origine"
+        )
+
+
+def new_version_dir(root):
+    """Crée un dossier de version vide (horodaté, donc trié chronologiquement)."""
+    now = time.time()
+    version = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"{int(now * 1000) % 1000:03d}-" + uuid.uuid4().hex[:6]
+    path = Path(root) / VERSIONS_DIR / version
+    path.mkdir(parents=True, exist_ok=False)
+    return path
+
+
+def publish_version(version_path):
+    """
+    Rend `version_path` visible comme version courante.
+    L'écriture du pointeur passe par un fichier temporaire + os.replace :
+    un lecteur voit soit l'ancienne version, soit la nouvelle, jamais un état partiel.
+    """
+    version_path = Path(version_path)
+    root = version_path.parent.parent
+    tmp = root / f".{CURRENT_FILE}.{uuid.uuid4().hex}"
+    tmp.write_text(version_path.name, encoding="utf-8")
+    os.replace(tmp, root / CURRENT_FILE)
+    prune_versions(root)
+    return version_path.name
+
+
+def current_marker(root):
+    """Identité du fichier CURRENT (inode, date de modification) : un stat, sans lecture."""
+    try:
+        st = os.stat(Path(root) / CURRENT_FILE)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+# --- Versions chargées par les processus (baux) ---
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def hold_versions(root, versions, owner):
+    """Déclare les versions chargées par `owner` dans ce processus (remplace sa déclaration précédente)."""
+    versions = [v for v in versions if v]
+    leases = Path(root) / LEASES_DIR
+    leases.mkdir(parents=True, exist_ok=True)
+    path = leases / f"{os.getpid()}-{owner}.json"
+    tmp = leases / f".{path.name}.{uuid.uuid4().hex}"
+    tmp.write_text(json.dumps(versions), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def held_versions(root):
+    """Versions chargées par des processus vivants ; les baux des processus terminés sont retirés."""
+    leases = Path(root) / LEASES_DIR
+    held = set()
+    if not leases.exists():
+        return held
+    for path in leases.glob("*.json"):
+        try:
+            pid = int(path.stem.split("-")[0])
+            versions = json.loads(path.read_text(encoding="utf-8"))
+        except (ValueError, OSError):
+            continue
+        if _pid_alive(pid):
+            held.update(versions)
+        else:
+            path.unlink(missing_ok=True)
+    return held
+
+
+def prune_versions(root, keep=KEEP_VERSIONS):
+    """Supprime les versions les plus anciennes (jamais la courante, ni celles encore chargées)."""
+    versions_dir = Path(root) / VERSIONS_DIR
+    if not versions_dir.exists():
+        return
+    protected = {current_version(root)} | held_versions(root)
+    versions = sorted(p for p in versions_dir.iterdir() if p.is_dir())
+    for path in versions[:-keep] if keep > 0 else versions:
+        if path.name not in protected:
+            shutil.rmtree(path, ignore_errors=True)
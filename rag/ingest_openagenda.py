@@ -1,17 +1,113 @@
+import csv
+import hashlib
+import json
+import os
+import re
+from contextlib import ExitStack, closing, nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from pathlib import Path
+
 import requests
-import pandas as pd
 from bs4 import BeautifulSoup
-from pathlib import Path
+from bs4.dammit import EntitySubstitution
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from events_dataset import EventsWriter
+except ImportError:
+    from rag.events_dataset import EventsWriter
 
 BASE_URL = "https://public.opendatasoft.com/api/explore/v2.1/catalog/datasets/evenements-publics-openagenda/records"
 
+# --- Paramètres de l'ingestion (surchargeables par variables d'environnement) ---
+INGEST_WORKERS = int(os.getenv("OPENAGENDA_WORKERS", "4"))        # pages téléchargées en parallèle
+INGEST_PAGE_SIZE = int(os.getenv("OPENAGENDA_PAGE_SIZE", "100"))  # maximum de l'API explore v2.1
+INGEST_RETRIES = int(os.getenv("OPENAGENDA_RETRIES", "5"))
+INGEST_TIMEOUT = float(os.getenv("OPENAGENDA_TIMEOUT", "30"))
+INGEST_PROCESSES = int(os.getenv("OPENAGENDA_PROCESSES", "0"))   # nettoyage en processus séparés (0 : dans les threads)
+MAX_RESULT_WINDOW = 10_000       # l'API refuse offset + limit au-delà : plafond d'une tranche
+MIN_SLICE = timedelta(minutes=1)  # fenêtre updatedat en dessous de laquelle on ne découpe plus
+
+COLUMNS = [
+    "id", "title", "description", "long_description", "keywords", "city", "region", "country",
+    "address", "coordinates", "date_start", "date_end", "url", "text_to_embed",
+]
+
 # --- Nettoyage texte ---
+# Chemin rapide de clean_html : découpage du HTML sur les balises par expression régulière,
+# sans construire d'arbre. Il ne traite que les cas dont le résultat est certain d'être identique
+# à BeautifulSoup (html.parser) ; tout le reste (commentaires, <script>/<style>, CDATA, entités
+# inconnues, « < » isolé...) repasse par BeautifulSoup.
+_TAG_RE = re.compile(
+    r"<[a-zA-Z][a-zA-Z0-9:-]*(?:\s+[^\s\"'>/=]+(?:\s*=\s*(?:\"[^\"]*\"|'[^']*'|[^\s\"'=<>`]+))?)*\s*/?>"
+    r"|</[a-zA-Z][a-zA-Z0-9:-]*\s*>"
+)
+_SLOW_PATH_RE = re.compile(
+    r"<[!?]|<(?:script|style|textarea|title|template|xmp|iframe|noembed|noframes|noscript|plaintext)\b",
+    re.IGNORECASE,
+)
+_AMP_RE = re.compile(r"&(?:#(\d{1,7});|#[xX]([0-9a-fA-F]{1,6});|([a-zA-Z][a-zA-Z0-9]{0,31});|(?=\s)|$)")
+
+
+class _SlowPath(Exception):
+    pass
+
+
+def _safe_codepoint(n):
+    """Codes que BeautifulSoup convertit tels quels (hors C0/C1, substituts, remplacements)."""
+    return n in (9, 10, 13) or 32 <= n <= 126 or 160 <= n <= 0xD7FF or 0xE000 <= n <= 0xFFFD or 0x10000 <= n <= 0x10FFFF
+
+
+def _entity(match):
+    decimal, hexadecimal, name = match.groups()
+    if decimal or hexadecimal:
+        n = int(decimal) if decimal else int(hexadecimal, 16)
+        if not _safe_codepoint(n):
+            raise _SlowPath
+        return chr(n)
+    if name:
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        if character is None:
+            raise _SlowPath
+        return character
+    return "&"  # « & » suivi d'un blanc ou en fin de texte : littéral
+
+
+def _fast_html_text(raw_html):
+    """Texte de `raw_html` comme get_text(" ", strip=True), ou None si le cas exige BeautifulSoup."""
+    if _SLOW_PATH_RE.search(raw_html):
+        return None
+    pieces = []
+    try:
+        for segment in _TAG_RE.split(raw_html):
+            if "<" in segment:
+                return None
+            if "&" in segment:
+                if len(_AMP_RE.findall(segment)) != segment.count("&"):
+                    return None
+                segment = _AMP_RE.sub(_entity, segment)
+            segment = segment.strip()
+            if segment:
+                pieces.append(segment)
+    except _SlowPath:
+        return None
+    return " ".join(pieces)
+
+
+def clean_html_bs4(raw_html):
+    """Référence : texte extrait par BeautifulSoup (html.parser)."""
+    soup = BeautifulSoup(raw_html, "html.parser")
+    return soup.get_text(separator=" ", strip=True)
+
+
 def clean_html(raw_html):
     """Nettoie le HTML et retourne du texte brut"""
     if not raw_html:
         return ""
-    soup = BeautifulSoup(raw_html, "html.parser")
-    return soup.get_text(separator=" ", strip=True)
+    text = _fast_html_text(raw_html)
+    return text if text is not None else clean_html_bs4(raw_html)
 
 def clean_text(text):
     """Supprime caractères invisibles (LS, PS) et normalise les espaces"""
@@ -25,31 +121,57 @@ def clean_text(text):
     )
 
 # --- API OpenAgenda ---
-def get_total(city="Paris", year="2025"):
+def make_session(pool_size=INGEST_WORKERS, retries=INGEST_RETRIES, backoff=0.5):
+    """
+    Session HTTP partagée : connexions réutilisées (keep-alive) et nouvelles tentatives
+    avec backoff exponentiel sur les erreurs réseau, 429 et 5xx (Retry-After respecté).
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def query_params(city=None, year=None, region=None, window=None):
+    """
+    Paramètres refine / where d'une requête : ville, région et soit l'année de mise à jour,
+    soit une fenêtre [début, fin[ sur updatedat (tranche d'une ingestion découpée).
+    """
+    refine = []
+    if city:
+        refine.append(f"location_city:\"{city}\"")
+    if region:
+        refine.append(f"location_region:\"{region}\"")
+    params = {"refine": refine}
+    if window:
+        start, end = window
+        params["where"] = (f"updatedat >= date'{start:%Y-%m-%dT%H:%M:%S}' "
+                           f"AND updatedat < date'{end:%Y-%m-%dT%H:%M:%S}'")
+    elif year:
+        refine.append(f"updatedat:\"{year}\"")
+    return params
+
+def get_total(city="Paris", year="2025", session=None, base_url=BASE_URL, region=None, window=None):
     """Récupère le nombre total d'événements pour une ville et une année (par update)"""
-    params = {
-        "refine": [
-            f"location_city:\"{city}\"",
-            f"updatedat:\"{year}\""
-        ],
-        "limit": 0
-    }
-    response = requests.get(BASE_URL, params=params)
+    params = {**query_params(city, year, region, window), "limit": 0}
+    response = (session or requests).get(base_url, params=params, timeout=INGEST_TIMEOUT)
     response.raise_for_status()
     data = response.json()
     return data["total_count"]
 
-def fetch_events(city="Paris", year="2025", limit=100, offset=0):
+def fetch_events(city="Paris", year="2025", limit=100, offset=0, session=None, base_url=BASE_URL,
+                 region=None, window=None):
     """Récupère une page d'événements"""
-    params = {
-        "refine": [
-            f"location_city:\"{city}\"",
-            f"updatedat:\"{year}\""
-        ],
-        "limit": limit,
-        "offset": offset
-    }
-    response = requests.get(BASE_URL, params=params)
+    params = {**query_params(city, year, region, window), "limit": limit, "offset": offset}
+    response = (session or requests).get(base_url, params=params, timeout=INGEST_TIMEOUT)
     response.raise_for_status()
     return response.json()
 
@@ -74,58 +196,329 @@ def extract_records(json_data):
         })
     return records
 
-# --- Script principal ---
-if __name__ == "__main__":
-    city = "Paris"
-    year = "2025"
-    step = 100
+def finalize_record(record, years=("2025",)):
+    """
+    Nettoyage final d'un événement (mêmes règles que l'ancien passage pandas, appliquées
+    enregistrement par enregistrement) : None si date_start est absente, invalide ou hors de
+    l'année (ou des années `years`), valeurs par défaut des champs manquants, puis text_to_embed.
+    """
+    try:
+        start = datetime.fromisoformat(str(record.get("date_start")))
+    except ValueError:
+        return None
+    if str(start.year) not in _as_list(years):
+        return None
+    record = dict(record)
+    defaults = {"title": "Titre manquant", "description": "Description manquante", "region": "Île-de-France"}
+    for key, default in defaults.items():
+        if record.get(key) is None:
+            record[key] = default
+    if record.get("long_description") is None:
+        record["long_description"] = record["description"]
+    if record.get("keywords") is None:
+        record["keywords"] = []
+    record["text_to_embed"] = f"{record['title']}. {record['long_description']}".strip()
+    return record
 
-    # Dossier data
-    ROOT = Path(__file__).resolve().parents[1]
-    DATA_DIR = ROOT / "data"
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-    # 1. Nombre total d'événements
-    total = get_total(city, year)
-    print(f"Nombre total d'événements trouvés (maj en {year}) pour {city} : {total}")
+def clean_page(results, years=("2025",)):
+    """Extraction et nettoyage final d'une page brute (exécutable dans un processus séparé)."""
+    records = (finalize_record(r, years) for r in extract_records({"results": results}))
+    return [r for r in records if r is not None]
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return [str(value)] if isinstance(value, (str, int)) else [str(v) for v in value]
+
+
+# --- Découpage des requêtes sous le plafond d'offset ---
+def split_window(start, end):
+    """
+    Sous-fenêtres de [start, end[ : par mois au-delà d'un mois, sinon deux moitiés.
+    None si la fenêtre est déjà au minimum (MIN_SLICE).
+    """
+    if end - start > timedelta(days=31):
+        bounds = [start]
+        while bounds[-1] < end:
+            current = bounds[-1]
+            bounds.append(min(end, datetime(current.year + current.month // 12, current.month % 12 + 1, 1)))
+        return list(zip(bounds, bounds[1:]))
+    if end - start <= MIN_SLICE:
+        return None
+    middle = start + (end - start) // 2
+    middle = middle.replace(microsecond=0)
+    return [(start, middle), (middle, end)]
+
+
+def plan_slices(cities=(), regions=(), years=("2025",), session=None, base_url=BASE_URL,
+                cap=MAX_RESULT_WINDOW, workers=INGEST_WORKERS):
+    """
+    Tranches (lieu, fenêtre updatedat) de moins de `cap` événements chacune, couvrant chaque
+    ville / région pour chaque année. Les comptages d'un même niveau de découpage sont parallèles.
+    Une tranche encore trop grande à la fenêtre minimale est gardée, marquée `truncated`.
+    """
+    places = [{"city": c} for c in _as_list(cities)] + [{"region": r} for r in _as_list(regions)]
+    frontier = [(place, (datetime(int(y), 1, 1), datetime(int(y) + 1, 1, 1)))
+                for place in places for y in _as_list(years)]
+    slices = []
+
+    def count(item):
+        place, window = item
+        return get_total(place.get("city"), None, session=session, base_url=base_url,
+                         region=place.get("region"), window=window)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="openagenda-plan") as executor:
+        while frontier:
+            next_frontier = []
+            for (place, window), total in zip(frontier, executor.map(count, frontier)):
+                if total == 0:
+                    continue
+                parts = split_window(*window) if total > cap else None
+                if parts:
+                    next_frontier.extend((place, part) for part in parts)
+                    continue
+                slices.append({
+                    "city": place.get("city"), "region": place.get("region"),
+                    "start": window[0].isoformat(), "end": window[1].isoformat(),
+                    "total": min(total, cap), "truncated": total > cap,
+                })
+            frontier = next_frontier
+    return sorted(slices, key=lambda s: (s["city"] or "", s["region"] or "", s["start"]))
+
+
+# --- Ingestion parallèle, reprenable, écrite au fil de l'eau ---
+class IngestCheckpoint:
+    """
+    État d'une ingestion, dans le dossier des parts : checkpoint.json (paramètres de la requête,
+    tranches planifiées ; écrit atomiquement au démarrage) et done.log, journal des pages déjà
+    écrites ("tranche:offset"). Chaque page ajoute une ligne au journal : coût constant,
+    quel que soit le nombre de pages déjà faites.
+    """
+
+    def __init__(self, parts_dir, query):
+        self.path = Path(parts_dir) / "checkpoint.json"
+        self.log_path = Path(parts_dir) / "done.log"
+        self.query = query
+        self.slices = None
+        self.done = set()
+        self._log = None
+        if self.path.exists():
+            state = json.loads(self.path.read_text(encoding="utf-8"))
+            if state.get("query") == query:
+                self.slices = state.get("slices")
+                self.done = set(state.get("done", []))  # ancien format : pages dans checkpoint.json
+                self.done.update(self._read_log())
+
+    def _read_log(self):
+        if not self.log_path.exists():
+            return []
+        # dernière ligne sans retour à la ligne : écriture interrompue, page refaite
+        return self.log_path.read_text(encoding="utf-8").split("\n")[:-1]
+
+    def reset(self):
+        """Repart de zéro : tranches à replanifier, journal des pages vidé."""
+        self.close()
+        self.slices, self.done = None, set()
+        self.log_path.unlink(missing_ok=True)
+
+    def save(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        state = {"query": self.query, "slices": self.slices}
+        tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def mark_done(self, key):
+        self.done.add(key)
+        if self._log is None:
+            self._log = open(self.log_path, "a", encoding="utf-8")
+        self._log.write(key + "\n")
+        self._log.flush()
 
-    # 2. Récupération paginée
-    all_records = []
-    for offset in range(0, total, step):
-        print(f"Récupération des événements {offset} à {offset+step}...")
-        data = fetch_events(city=city, year=year, limit=step, offset=offset)
-        all_records.extend(extract_records(data))
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
 
-    # 3. Conversion DataFrame + nettoyage Pandas
-    df = pd.DataFrame(all_records)
 
-    # Conversion des dates
-    df["date_start"] = pd.to_datetime(df["date_start"], errors="coerce")
+def part_path(parts_dir, slice_id, offset):
+    return Path(parts_dir) / f"part-{slice_id:05d}-{offset:08d}.jsonl"
 
-    # Filtrer uniquement les événements qui commencent en 2025
-    df = df[df["date_start"].dt.year == 2025]
 
-    # Gestion des valeurs manquantes
-    df["title"] = df["title"].fillna("Titre manquant")
-    df["description"] = df["description"].fillna("Description manquante")
-    df["long_description"] = df["long_description"].fillna(df["description"])
-    df["region"] = df["region"].fillna("Île-de-France")
-    df["keywords"] = df["keywords"].fillna("[]")
+def write_part(parts_dir, slice_id, offset, records):
+    """Écrit les événements d'une page (fichier temporaire puis renommage : jamais de part tronquée)."""
+    path = part_path(parts_dir, slice_id, offset)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+    return path
 
-    # Créer une colonne text_to_embed = title + long_description
-    df["text_to_embed"] = (
-        df["title"].fillna("Titre manquant") + ". " +
-        df["long_description"].fillna("")
-    ).str.strip()
 
+def ingest(parts_dir, cities=("Paris",), years=("2025",), regions=(), page_size=INGEST_PAGE_SIZE,
+           workers=INGEST_WORKERS, session=None, base_url=BASE_URL, resume=True, cap=MAX_RESULT_WINDOW,
+           processes=INGEST_PROCESSES):
+    """
+    Ingestion de plusieurs villes / régions et années : la requête est découpée en tranches
+    de moins de `cap` résultats (plan_slices), puis toutes les pages de toutes les tranches
+    sont téléchargées en parallèle (au plus `workers` en vol) et écrites dès réception dans
+    leur part JSONL : la mémoire ne dépend pas du nombre d'événements.
+    Avec `processes` > 0, le nettoyage HTML des pages passe par un pool de processus
+    (les threads ne font plus que le réseau et l'écriture).
+    Une relance reprend là où l'ingestion s'est arrêtée (tranches et pages déjà écrites conservées).
+    Les pages en échec sont listées dans l'exception levée en fin de parcours.
+    """
+    parts_dir = Path(parts_dir)
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    years = _as_list(years)
+    query = {"cities": _as_list(cities), "regions": _as_list(regions), "years": years,
+             "page_size": page_size, "cap": cap, "base_url": base_url}
+    checkpoint = IngestCheckpoint(parts_dir, query)
+    if not resume or not checkpoint.done:
+        for stale in parts_dir.glob("part-*.jsonl"):
+            stale.unlink()
+        checkpoint.reset()
+    session = session or make_session(workers)
 
-    # 4. Sauvegarde CSV + JSON
-    out_csv = DATA_DIR / "events_clean.csv"
-    out_json = DATA_DIR / "events_clean.json"
+    if checkpoint.slices is None:
+        checkpoint.slices = plan_slices(cities, regions, years, session=session, base_url=base_url,
+                                        cap=cap, workers=workers)
+        checkpoint.save()
+    slices = checkpoint.slices
+    pages = [(i, offset) for i, sl in enumerate(slices) for offset in range(0, sl["total"], page_size)
+             if f"{i}:{offset}" not in checkpoint.done]
+    truncated = [sl for sl in slices if sl["truncated"]]
+    print(f"{sum(sl['total'] for sl in slices)} événements en {len(slices)} tranche(s) : "
+          f"{len(pages)} pages à récupérer, {len(checkpoint.done)} déjà écrites")
+    for sl in truncated:
+        print(f"⚠️ Tranche {sl['city'] or sl['region']} {sl['start']} limitée à {cap} résultats")
 
-    df.to_csv(out_csv, index=False, encoding="utf-8")
-    df.to_json(out_json, orient="records", force_ascii=False, indent=2)
+    def fetch_page(page):
+        i, offset = page
+        sl = slices[i]
+        window = (datetime.fromisoformat(sl["start"]), datetime.fromisoformat(sl["end"]))
+        data = fetch_events(sl["city"], None, limit=min(page_size, cap - offset), offset=offset,
+                            session=session, base_url=base_url, region=sl["region"], window=window)
+        results = data.get("results", [])
+        records = cleaner.submit(clean_page, results, years).result() if cleaner else clean_page(results, years)
+        return write_part(parts_dir, i, offset, records)
 
-    print(f"{len(df)} événements filtrés (date_start=2025) sauvegardés dans {out_csv} et {out_json}")
+    failed = {}
+    pending = {}
+    todo = iter(pages)
+    cleaner = ProcessPoolExecutor(max_workers=processes) if processes > 0 and pages else None
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="openagenda") as executor, \
+            cleaner or nullcontext(), closing(checkpoint):
+        while True:
+            while len(pending) < workers:
+                page = next(todo, None)
+                if page is None:
+                    break
+                pending[executor.submit(fetch_page, page)] = page
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i, offset = pending.pop(future)
+                try:
+                    future.result()
+                    checkpoint.mark_done(f"{i}:{offset}")
+                except Exception as e:
+                    failed[f"{i}:{offset}"] = str(e)
+                    print(f"❌ Page {offset} de la tranche {i} en échec : {e}")
+
+    summary = {
+        "total": sum(sl["total"] for sl in slices),
+        "slices": len(slices),
+        "truncated": len(truncated),
+        "pages": len(checkpoint.done),
+        "fetched": len(pages) - len(failed),
+        "failed": sorted(failed),
+    }
+    if failed:
+        raise RuntimeError(f"{len(failed)} page(s) en échec (relancer pour reprendre) : {summary}")
+    return summary
+
+
+def iter_parts(parts_dir):
+    """Événements des parts, dans l'ordre des pages, sans doublon d'id."""
+    seen = set()
+    for path in sorted(Path(parts_dir).glob("part-*.jsonl")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record["id"] in seen:
+                    continue
+                seen.add(record["id"])
+                yield record
+
+
+def export_events(parts_dir, out_json=None, out_csv=None, out_parquet=None):
+    """
+    Assemble les parts en flux vers events_clean.parquet (artefact lu par l'indexeur)
+    et, au choix, les exports events_clean.json / .csv ; renvoie le nombre d'événements.
+    """
+    count = 0
+    outputs = [Path(p) for p in (out_json, out_csv) if p]
+    with ExitStack() as stack:
+        json_file = csv_writer = parquet_writer = None
+        if out_json:
+            json_file = stack.enter_context(open(str(out_json) + ".tmp", "w", encoding="utf-8"))
+            json_file.write("[")
+        if out_csv:
+            csv_file = stack.enter_context(open(str(out_csv) + ".tmp", "w", encoding="utf-8", newline=""))
+            csv_writer = csv.DictWriter(csv_file, fieldnames=COLUMNS, extrasaction="ignore")
+            csv_writer.writeheader()
+        if out_parquet:
+            parquet_writer = stack.enter_context(EventsWriter(out_parquet))
+        for record in iter_parts(parts_dir):
+            if json_file:
+                json_file.write(("," if count else "") + "\n  " + json.dumps(record, ensure_ascii=False))
+            if csv_writer:
+                csv_writer.writerow(record)
+            if parquet_writer:
+                parquet_writer.write(record)
+            count += 1
+        if json_file:
+            json_file.write("\n]\n")
+    for path in outputs:
+        os.replace(str(path) + ".tmp", path)
+    return count
+
+
+# --- Script principal ---
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingestion OpenAgenda -> data/events_clean.json / .csv")
+    parser.add_argument("--city", nargs="*", default=None, help="une ou plusieurs villes (défaut : Paris)")
+    parser.add_argument("--region", nargs="*", default=[], help="une ou plusieurs régions")
+    parser.add_argument("--year", nargs="+", default=["2025"], help="années de mise à jour (et de début) des événements")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--page-size", type=int, default=INGEST_PAGE_SIZE)
+    parser.add_argument("--processes", type=int, default=INGEST_PROCESSES, help="processus de nettoyage HTML (0 : aucun)")
+    parser.add_argument("--restart", action="store_true", help="ignorer le checkpoint et tout retélécharger")
+    parser.add_argument("--formats", default="parquet,json,csv",
+                        help="fichiers écrits dans data/ (parquet : source de l'index ; json, csv : exports)")
+    args = parser.parse_args()
+    cities = args.city if args.city is not None else ([] if args.region else ["Paris"])
+
+    # Dossier data
+    ROOT = Path(__file__).resolve().parents[1]
+    DATA_DIR = ROOT / "data"
+    slug = "_".join(cities + args.region + args.year).replace(" ", "-")
+    if len(slug) > 80:
+        slug = hashlib.sha1(slug.encode("utf-8")).hexdigest()[:12]
+    PARTS_DIR = DATA_DIR / "ingest" / slug
 
+    summary = ingest(PARTS_DIR, cities, args.year, regions=args.region, page_size=args.page_size,
+                     workers=args.workers, resume=not args.restart, processes=args.processes)
+    print(f"Pages écrites : {summary}")
 
+    formats = {f.strip() for f in args.formats.split(",")}
+    outputs = {fmt: DATA_DIR / f"events_clean.{fmt}" for fmt in ("json", "csv", "parquet") if fmt in formats}
+    count = export_events(PARTS_DIR, outputs.get("json"), outputs.get("csv"), outputs.get("parquet"))
+    print(f"{count} événements (date_start={', '.join(args.year)}, doublons d'uid retirés) "
+          f"sauvegardés dans {', '.join(str(p) for p in outputs.values())}")
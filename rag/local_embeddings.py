@@ -0,0 +1,224 @@
+"""
+Backend d'embeddings local (sentence-transformers, CPU), choisi avec EMBED_BACKEND=local.
+
+Plus d'aller-retour réseau ni de quota : une question est encodée sur la machine.
+Les questions concurrentes passent par un seul thread d'inférence (BatchingEncoder) :
+celles qui arrivent pendant un encodage partent ensemble au suivant, en un seul
+appel au modèle. Le parallélisme vient des threads du moteur (LOCAL_EMBED_THREADS,
+défaut : cœurs disponibles pour le processus).
+
+LOCAL_EMBED_RUNTIME=onnx charge l'export ONNX du modèle (sentence-transformers >= 3.2,
+extra "onnx") ; LOCAL_EMBED_ONNX_FILE choisit une variante, par ex. un modèle quantifié int8
+(onnx/model_qint8_avx2.onnx).
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    from embed_cache import cached_embed
+    from query_cache import normalize_question
+except ImportError:
+    from rag.embed_cache import cached_embed
+    from rag.query_cache import normalize_question
+
+# multilingue (français), 384 dimensions, quelques ms par question sur CPU
+LOCAL_EMBED_MODEL = os.getenv("LOCAL_EMBED_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+LOCAL_EMBED_RUNTIME = os.getenv("LOCAL_EMBED_RUNTIME", "torch")  # torch | onnx
+LOCAL_EMBED_ONNX_FILE = os.getenv("LOCAL_EMBED_ONNX_FILE") or None
+LOCAL_EMBED_THREADS = int(os.getenv("LOCAL_EMBED_THREADS", "0"))  # 0 : cœurs disponibles
+LOCAL_EMBED_BATCH_SIZE = int(os.getenv("LOCAL_EMBED_BATCH_SIZE", "64"))  # documents (construction)
+LOCAL_EMBED_MAX_BATCH = int(os.getenv("LOCAL_EMBED_MAX_BATCH", "32"))  # questions regroupées
+# attente de questions supplémentaires ; 0 : seules celles arrivées pendant l'encodage précédent
+LOCAL_EMBED_WAIT_MS = float(os.getenv("LOCAL_EMBED_WAIT_MS", "0"))
+
+
+def available_cpus():
+    """Cœurs utilisables par le processus (affinité / conteneur), à défaut os.cpu_count()."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def load_sentence_transformer(model_name, runtime=LOCAL_EMBED_RUNTIME, onnx_file=LOCAL_EMBED_ONNX_FILE,
+                              threads=LOCAL_EMBED_THREADS):
+    """Modèle sentence-transformers sur CPU, threads d'inférence fixés."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError(
+            "EMBED_BACKEND=local nécessite sentence-transformers (pip install sentence-transformers)"
+        ) from e
+    threads = threads or available_cpus()
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    kwargs = {"device": "cpu"}
+    if runtime == "onnx":
+        # onnxruntime lit OMP_NUM_THREADS à la création de la session
+        os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+        kwargs["backend"] = "onnx"
+        if onnx_file:
+            kwargs["model_kwargs"] = {"file_name": onnx_file}
+    return SentenceTransformer(model_name, **kwargs)
+
+
+# --- Regroupement des questions concurrentes ---
+class BatchingEncoder:
+    """
+    Un thread d'inférence et une file : chaque appel `submit(texts)` renvoie un Future.
+    Le thread prend la première demande en attente, y ajoute celles arrivées entre-temps
+    (au plus `max_batch` textes, attente d'au plus `max_wait` secondes), encode le tout
+    en un appel et redistribue les vecteurs.
+    """
+
+    def __init__(self, encode, max_batch=LOCAL_EMBED_MAX_BATCH, max_wait=LOCAL_EMBED_WAIT_MS / 1000):
+        self._encode = encode
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, texts):
+        future = Future()
+        self._queue.put((list(texts), future))
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="local-embed", daemon=True)
+                    self._thread.start()
+        return future
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            texts = [text for batch, _ in pending for text in batch]
+            try:
+                vectors = self._encode(texts)
+            except BaseException as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(texts)
+            start = 0
+            for batch, future in pending:
+                future.set_result(vectors[start:start + len(batch)])
+                start += len(batch)
+
+    def stats(self):
+        return {"batches": self.batches, "items": self.items,
+                "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0}
+
+
+# --- Wrapper embeddings local ---
+class LocalEmbeddings(Embeddings):
+    """
+    Embeddings sentence-transformers (vecteurs normalisés), même interface que MistralEmbeddings :
+    cache disque des chunks (`cache`), LRU des questions (`query_cache`), aembed_queries.
+    `model` : encodeur déjà chargé (sinon chargé à la première utilisation).
+    """
+
+    def __init__(self, model_name=LOCAL_EMBED_MODEL, model=None, cache=None, query_cache=None,
+                 batch_size=LOCAL_EMBED_BATCH_SIZE, runtime=LOCAL_EMBED_RUNTIME, onnx_file=LOCAL_EMBED_ONNX_FILE):
+        self.model = model_name
+        self.runtime = runtime
+        self.onnx_file = onnx_file if runtime == "onnx" else None
+        # clé du cache d'embeddings : une variante quantifiée ne partage pas les vecteurs du modèle d'origine
+        self.cache_name = f"{model_name}@{self.onnx_file}" if self.onnx_file else model_name
+        self.batch_size = batch_size
+        self.cache = cache
+        self.query_cache = query_cache
+        self._encoder = model
+        self._lock = threading.Lock()
+        self.engine = BatchingEncoder(self._encode)
+
+    def identity(self):
+        """Identité du modèle enregistrée avec l'index (cf. index_store.check_model_identity)."""
+        return {"backend": "local", "model": self.model, "normalize": True,
+                "runtime": self.runtime, "onnx_file": self.onnx_file}
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            with self._lock:
+                if self._encoder is None:
+                    self._encoder = load_sentence_transformer(self.model, self.runtime, self.onnx_file)
+        return self._encoder
+
+    def _encode(self, texts):
+        vectors = self.encoder.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                      convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_documents(self, texts):
+        if self.cache is None:
+            return self._encode(texts)
+        vectors, hits, misses = cached_embed(self.cache, self.cache_name, texts, self._encode)
+        print(f"🗃️ Cache embeddings : {hits} réutilisés, {misses} calculés")
+        return vectors
+
+    def embed_query(self, text):
+        key = normalize_question(text)
+        vector = self.query_cache.get(key) if self.query_cache is not None else None
+        if vector is None:
+            vector = self.engine.submit([text]).result()[0]
+            if self.query_cache is not None:
+                self.query_cache.put(key, vector)
+        return vector
+
+    async def aembed_query(self, text):
+        key = normalize_question(text)
+        vector = self.query_cache.get(key) if self.query_cache is not None else None
+        if vector is None:
+            vector = (await asyncio.wrap_future(self.engine.submit([text])))[0]
+            if self.query_cache is not None:
+                self.query_cache.put(key, vector)
+        return vector
+
+    async def aembed_queries(self, texts):
+        """Plusieurs questions : LRU d'abord, les autres en une seule demande au thread d'inférence."""
+        vectors = [None] * len(texts)
+        missing = {}
+        for i, text in enumerate(texts):
+            key = normalize_question(text)
+            vector = self.query_cache.get(key) if self.query_cache is not None else None
+            if vector is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                vectors[i] = vector
+        if missing:
+            keys = list(missing)
+            encoded = await asyncio.wrap_future(self.engine.submit([texts[missing[key][0]] for key in keys]))
+            for key, vector in zip(keys, encoded):
+                for i in missing[key]:
+                    vectors[i] = vector
+                if self.query_cache is not None:
+                    self.query_cache.put(key, vector)
+        return vectors
@@ -0,0 +1,194 @@
+"""
+Instrumentation du chemin /ask : durées par étape, tokens, retries, caches, index.
+
+Registre minimal (sans dépendance) exporté au format texte Prometheus par GET /metrics.
+Les valeurs "à l'instant" (taille et version de l'index, compteurs des caches) ne sont pas
+tenues à jour sur le chemin chaud : elles sont relues au moment de l'export
+(RagService.export_metrics).
+
+RAG_METRICS=0 désactive les mesures : `stage()` renvoie alors un contexte vide partagé
+et `inc` / `observe` rendent la main immédiatement.
+RAG_TRACE_LOG=1 journalise chaque étape avec l'identifiant de trace de la requête
+(en-tête X-Request-ID, généré s'il est absent).
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+
+METRICS_ENABLED = os.getenv("RAG_METRICS", "1") == "1"
+TRACE_LOG = os.getenv("RAG_TRACE_LOG", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_trace_id = contextvars.ContextVar("rag_trace_id", default=None)
+_NOOP = nullcontext()
+
+
+# --- Identifiant de trace (par requête) ---
+def new_trace_id(value=None):
+    """Fixe l'identifiant de trace du contexte courant (tâche asyncio / thread) et le renvoie."""
+    trace_id = (value or uuid.uuid4().hex[:16])[:64]
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+def trace_id():
+    return _trace_id.get()
+
+
+def trace_log(message):
+    if TRACE_LOG:
+        print(f"[trace {_trace_id.get() or '-'}] {message}")
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(items, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# --- Registre ---
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    """Compteurs, jauges et histogrammes étiquetés ; export au format texte Prometheus 0.0.4."""
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._meta = {}  # nom -> (type, aide, buckets)
+        self._values = {}  # nom -> {clé d'étiquettes -> valeur ou Histogram}
+
+    def describe(self, name, kind, help_text, buckets=LATENCY_BUCKETS):
+        self._meta[name] = (kind, help_text, buckets)
+        self._values.setdefault(name, {})
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def clear(self, name):
+        """Retire toutes les séries d'une métrique (ex. ancienne version d'index)."""
+        with self._lock:
+            self._values[name] = {}
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values.setdefault(name, {})[_labels_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._meta.get(name, ("histogram", "", LATENCY_BUCKETS))[2])
+            histogram.observe(value)
+
+    def stage(self, name, **labels):
+        """Mesure la durée d'un bloc dans rag_stage_seconds{stage=name} (contexte vide si désactivé)."""
+        if not self.enabled and not TRACE_LOG:
+            return _NOOP
+        return _StageTimer(self, name, labels)
+
+    def value(self, name, **labels):
+        """Valeur courante d'une série (compteur / jauge) ou Histogram ; None si absente."""
+        return self._values.get(name, {}).get(_labels_key(labels))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, series in self._values.items():
+                kind, help_text, _ = self._meta.get(name, ("untyped", "", None))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(series.items()):
+                    if isinstance(value, Histogram):
+                        cumulative = 0
+                        for bound, count in zip(value.buckets, value.counts):
+                            cumulative += count
+                            le = (("le", _format_value(float(bound))),)
+                            lines.append(f"{name}_bucket{_format_labels(key, le)} {cumulative}")
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {value.count}")
+                        lines.append(f"{name}_sum{_format_labels(key)} {_format_value(value.sum)}")
+                        lines.append(f"{name}_count{_format_labels(key)} {value.count}")
+                    else:
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class _StageTimer:
+    __slots__ = ("registry", "name", "labels", "t0")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.t0
+        self.registry.observe("rag_stage_seconds", elapsed, stage=self.name, **self.labels)
+        if exc_type is not None:
+            self.registry.inc("rag_stage_errors_total", stage=self.name)
+        if TRACE_LOG:
+            trace_log(f"{self.name} {elapsed * 1000:.1f} ms" + (f" ({exc_type.__name__})" if exc_type else ""))
+        return False
+
+
+# --- Registre partagé et métriques du RAG ---
+registry = Registry()
+registry.describe("rag_stage_seconds", "histogram",
+                  "Durée de chaque étape de /ask (embed, cache, search, pack, generate) "
+                  "et de la question entière (total)")
+registry.describe("rag_request_seconds", "histogram", "Durée des requêtes HTTP, par route")
+registry.describe("rag_stage_errors_total", "counter", "Étapes terminées par une exception")
+registry.describe("rag_requests_total", "counter", "Requêtes HTTP, par route et statut")
+registry.describe("rag_prompt_tokens_total", "counter", "Tokens du prompt envoyés au LLM (usage API, sinon estimation)")
+registry.describe("rag_completion_tokens_total", "counter", "Tokens générés par le LLM (usage API, sinon estimation)")
+registry.describe("rag_embed_retries_total", "counter", "Nouvelles tentatives d'embedding de question après un 429")
+registry.describe("rag_cache_hits_total", "counter", "Hits des caches de questions")
+registry.describe("rag_cache_misses_total", "counter", "Misses des caches de questions")
+registry.describe("rag_cache_hit_ratio", "gauge", "Taux de hit des caches de questions")
+registry.describe("rag_index_chunks", "gauge", "Nombre de vecteurs de l'index servi")
+registry.describe("rag_index_info", "gauge", "Version de l'index servi (étiquette version)")
+
+stage = registry.stage
+inc = registry.inc
+observe = registry.observe
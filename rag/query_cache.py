@@ -0,0 +1,151 @@
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+# --- Normalisation des questions ---
+def normalize_question(question: str) -> str:
+    """Clé de cache : minuscules, NFC, espaces compactés, ponctuation finale retirée."""
+    text = unicodedata.normalize("NFC", question or "").lower()
+    text = " ".join(text.split())
+    return text.rstrip(" ?!.;…").strip()
+
+
+# --- Cache LRU avec expiration ---
+class LRUCache:
+    """Cache LRU borné, thread-safe, avec durée de vie (TTL) et compteurs hits/misses."""
+
+    def __init__(self, maxsize=2048, ttl=3600, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires = item
+                if self.ttl is None or expires > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, self._clock() + (self.ttl or 0))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# --- Cache sémantique des réponses ---
+class SemanticAnswerCache:
+    """
+    Réutilise une réponse déjà générée pour une question très proche.
+
+    Une entrée est servie si la similarité cosinus entre les embeddings des deux
+    questions dépasse `threshold`, que l'index n'a pas changé de version depuis
+    et que l'entrée n'a pas expiré.
+    """
+
+    def __init__(self, threshold=0.97, maxsize=1000, ttl=900, clock=time.monotonic):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        # emplacement -> (valeur, version, k, expiration), du moins au plus récemment utilisé
+        self._entries = OrderedDict()
+        # vecteurs normalisés, une ligne par emplacement : (maxsize, dim) alloué au premier store,
+        # les emplacements [0, _filled) sont occupés
+        self._matrix = None
+        self._filled = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector):
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, vector, version, k=None):
+        """Renvoie la valeur mise en cache la plus proche, ou None."""
+        query = self._normalize(vector)
+        with self._lock:
+            if not self._filled:
+                self.misses += 1
+                return None
+            scores = self._matrix[:self._filled] @ query
+            now = self._clock()
+            for slot in np.argsort(-scores):
+                if scores[slot] < self.threshold:
+                    break
+                value, entry_version, entry_k, expires = self._entries[slot]
+                if entry_version == version and entry_k == k and expires > now:
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def store(self, vector, value, version, k=None):
+        """Écrit l'entrée dans un emplacement libre, sinon à la place de la moins récemment utilisée."""
+        if self.maxsize <= 0:
+            return
+        vec = self._normalize(vector)
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != len(vec):
+                self._matrix = np.zeros((self.maxsize, len(vec)), dtype=np.float32)
+                self._entries.clear()
+                self._filled = 0
+            if self._filled < self.maxsize:
+                slot = self._filled
+                self._filled += 1
+            else:
+                slot, _ = self._entries.popitem(last=False)
+            self._matrix[slot] = vec
+            self._entries[slot] = (value, version, k, self._clock() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._filled = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
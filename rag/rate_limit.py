@@ -0,0 +1,155 @@
+import asyncio
+import contextlib
+import random
+import threading
+import time
+import weakref
+
+
+# --- Détection des erreurs de quota ---
+def is_rate_limit_error(exc: Exception) -> bool:
+    """Vrai si l'exception correspond à un 429 / une saturation de l'API Mistral."""
+    status = getattr(exc, "status_code", None)
+    if status in (429, 503):
+        return True
+    message = str(exc)
+    return "429" in message or "capacity" in message
+
+
+def retry_after_seconds(exc: Exception):
+    """Lit l'en-tête Retry-After de la réponse HTTP si le SDK l'expose."""
+    response = getattr(exc, "raw_response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, maximum: float = 60.0) -> float:
+    """Backoff exponentiel avec jitter ("full jitter")."""
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+# --- Token bucket ---
+class TokenBucket:
+    """
+    Limiteur de débit thread-safe.
+
+    `rate` jetons sont ajoutés par seconde, jusqu'à `capacity`.
+    `acquire(n)` bloque jusqu'à ce que `n` jetons soient disponibles ;
+    une demande plus grosse que la capacité est acceptée une fois le seau plein
+    (le seau passe alors en négatif, ce qui retarde les appels suivants).
+    """
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate doit être > 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def _reserve(self, n):
+        """Réserve `n` jetons ou renvoie le temps d'attente nécessaire."""
+        with self._lock:
+            now = self._clock()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            needed = min(n, self.capacity)
+            if self._tokens >= needed:
+                self._tokens -= n
+                return 0.0
+            return (needed - self._tokens) / self.rate
+
+    def acquire(self, n: float = 1.0):
+        """Bloque jusqu'à obtention de `n` jetons."""
+        while True:
+            wait = self._reserve(n)
+            if wait <= 0:
+                return
+            self._sleep(wait)
+
+    async def acquire_async(self, n: float = 1.0):
+        """Comme acquire, sans bloquer la boucle d'événements."""
+        while True:
+            wait = self._reserve(n)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Suspend toutes les acquisitions (ex. après un 429 renvoyé par l'API)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+# --- Limiteur asynchrone par service amont ---
+class UpstreamLimiter:
+    """
+    Borne le nombre d'appels asynchrones simultanés vers un service amont
+    et applique un timeout à chacun.
+
+    Les sémaphores asyncio sont liés à une boucle d'événements : on en garde
+    un par boucle (cas des tests / scripts qui enchaînent plusieurs asyncio.run).
+    """
+
+    def __init__(self, name, max_concurrency, timeout):
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.timeout = timeout
+        self._semaphores = weakref.WeakKeyDictionary()
+        self.in_flight = 0
+        self.timeouts = 0
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        sem = self._semaphores.get(loop)
+        if sem is None:
+            sem = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = sem
+        return sem
+
+    async def run(self, coro_fn, *args, **kwargs):
+        """Exécute `await coro_fn(*args, **kwargs)` sous le sémaphore et le timeout."""
+        async with self._semaphore():
+            self.in_flight += 1
+            try:
+                return await asyncio.wait_for(coro_fn(*args, **kwargs), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise TimeoutError(f"{self.name} : pas de réponse après {self.timeout}s")
+            finally:
+                self.in_flight -= 1
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Réserve une place pour toute la durée d'un échange (ex. réponse en streaming)."""
+        async with self._semaphore():
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    async def wait(self, awaitable):
+        """Applique le timeout du service à une attente ponctuelle (ex. prochain token)."""
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise TimeoutError(f"{self.name} : pas de réponse après {self.timeout}s")
@@ -0,0 +1,91 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+# --- Jobs de reconstruction d'index en arrière-plan ---
+class RebuildJobs:
+    """
+    Exécute les reconstructions d'index dans un thread dédié (une à la fois).
+
+    `run_fn(mode, progress)` fait le travail et renvoie un dict de résultat ;
+    `on_success(result)` est appelé ensuite (ex. rechargement de l'index servi).
+    Chaque job est consultable par son id pendant et après son exécution.
+    """
+
+    def __init__(self, run_fn, on_success=None, max_history=50):
+        self.run_fn = run_fn
+        self.on_success = on_success
+        self.max_history = max_history
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rebuild")
+
+    def submit(self, mode):
+        """
+        Lance un job et renvoie (job, créé). Si un job est déjà en attente ou en cours,
+        on renvoie celui-ci plutôt que d'empiler une seconde reconstruction.
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] in {"queued", "running"}:
+                    return dict(job), False
+            job = {
+                "id": uuid.uuid4().hex[:12],
+                "mode": mode,
+                "status": "queued",
+                "stage": None,
+                "progress": 0.0,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job["id"]] = job
+            self._trim()
+            snapshot = dict(job)
+        self._executor.submit(self._run, job["id"])
+        return snapshot, True
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _progress(self, job_id):
+        def report(stage, done=None, total=None):
+            fields = {"stage": stage}
+            if stage == "embed" and total:
+                fields["progress"] = round(done / total, 3)
+            elif stage == "save":
+                fields["progress"] = 1.0
+            self._update(job_id, **fields)
+        return report
+
+    def _run(self, job_id):
+        job = self.get(job_id)
+        self._update(job_id, status="running", started_at=time.time())
+        try:
+            result = self.run_fn(job["mode"], self._progress(job_id))
+            if self.on_success is not None:
+                self._update(job_id, stage="reload")
+                self.on_success(result)
+            self._update(job_id, status="succeeded", stage="done", progress=1.0,
+                         result=result, finished_at=time.time())
+        except Exception as e:
+            print("❌ Échec de la reconstruction :", traceback.format_exc())
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+
+    def _trim(self):
+        """Oublie les jobs terminés les plus anciens au-delà de `max_history`."""
+        finished = [j for j in self._jobs.values() if j["status"] in {"succeeded", "failed"}]
+        excess = len(self._jobs) - self.max_history
+        for job in sorted(finished, key=lambda j: j["created_at"])[:max(0, excess)]:
+            del self._jobs[job["id"]]
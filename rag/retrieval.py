@@ -0,0 +1,194 @@
+"""
+Recherche FAISS restreinte aux rangs candidats issus des filtres de métadonnées,
+éventuellement fusionnée (RRF) avec une recherche lexicale BM25.
+
+Petit ensemble de candidats : distances exactes calculées sur leurs seuls vecteurs.
+Sinon : recherche FAISS avec un IDSelector (les rangs exclus ne sont jamais renvoyés).
+"""
+import asyncio
+import os
+from typing import Any, List
+
+import faiss
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+try:
+    from filters import parse_filters
+    from bm25 import reciprocal_rank_fusion
+except ImportError:
+    from rag.filters import parse_filters
+    from rag.bm25 import reciprocal_rank_fusion
+
+# En dessous de ce nombre de candidats, calcul exact sur leurs vecteurs plutôt qu'un parcours d'index
+EXACT_SUBSET_MAX = int(os.getenv("FILTER_EXACT_SUBSET_MAX", "4096"))
+RETRIEVAL_FILTERS = os.getenv("RETRIEVAL_FILTERS", "1") == "1"
+RETRIEVAL_HYBRID = os.getenv("RETRIEVAL_HYBRID", "1") == "1"
+RRF_K = int(os.getenv("RRF_K", "60"))
+RETRIEVAL_COLLAPSE = os.getenv("RETRIEVAL_COLLAPSE", "1") == "1"
+
+
+def _search_params(index, selector):
+    target = faiss.downcast_index(index)
+    if isinstance(target, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=target.nprobe)
+    if isinstance(target, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=target.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def search_rows(index, query_vector, k, rows=None):
+    """
+    (rangs, distances L2) des k plus proches voisins de `query_vector`,
+    limités à `rows` si fourni (tableau de rangs FAISS, éventuellement vide).
+    Un index IVF doit avoir sa table de reconstruction (ann_index.make_reconstructible).
+    """
+    query = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+    if rows is None:
+        distances, found = index.search(query, k)
+    elif len(rows) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    elif len(rows) <= EXACT_SUBSET_MAX:
+        rows = np.asarray(rows, dtype=np.int64)
+        dists = ((index.reconstruct_batch(rows) - query) ** 2).sum(axis=1)
+        top = np.argsort(dists)[:k] if len(rows) <= k else np.argpartition(dists, k)[:k]
+        top = top[np.argsort(dists[top])]
+        return rows[top], dists[top]
+    else:
+        selector = faiss.IDSelectorBatch(np.asarray(rows, dtype=np.int64))
+        distances, found = index.search(query, k, params=_search_params(index, selector))
+    keep = found[0] >= 0
+    return found[0][keep], distances[0][keep]
+
+
+def search_rows_batch(index, query_vectors, k):
+    """search_rows sans filtre pour plusieurs questions : un seul index.search sur la matrice."""
+    queries = np.asarray(query_vectors, dtype=np.float32).reshape(len(query_vectors), -1)
+    distances, found = index.search(queries, k)
+    return [(f[f >= 0], d[f >= 0]) for f, d in zip(found, distances)]
+
+
+def documents_for_rows(db, rows):
+    """Documents des rangs FAISS (lecture ciblée si le docstore le permet)."""
+    if hasattr(db.docstore, "by_rows"):
+        return db.docstore.by_rows(rows)
+    return [db.docstore.search(db.index_to_docstore_id[int(row)]) for row in rows]
+
+
+def collapse_by_event(docs, k):
+    """Meilleur chunk de chaque événement (ordre conservé), au plus k documents."""
+    seen, kept = set(), []
+    for doc in docs:
+        if doc is None:
+            continue
+        event_id = doc.metadata.get("id") or id(doc)
+        if event_id in seen:
+            continue
+        seen.add(event_id)
+        kept.append(doc)
+        if len(kept) == k:
+            break
+    return kept
+
+
+class FilteredRetriever(BaseRetriever):
+    """
+    Retriever FAISS qui applique d'abord les filtres (période, ville, gratuit, famille)
+    extraits de la question, puis cherche les k plus proches parmi les chunks retenus.
+    Avec un index BM25 (`sparse_index`), les classements dense et lexical (fetch_k chacun)
+    sont fusionnés par Reciprocal Rank Fusion.
+    Avec `collapse`, un seul chunk (le mieux classé) par événement : les fetch_k premiers
+    rangs sont lus pour compléter k événements distincts.
+    Sans index de métadonnées, BM25 ni regroupement, se comporte comme `db.as_retriever(k=...)`.
+    """
+
+    db: Any
+    metadata_index: Any = None
+    sparse_index: Any = None
+    k: int = 10
+    fetch_k: int = 30
+    rrf_k: int = RRF_K
+    use_filters: bool = True
+    collapse: bool = RETRIEVAL_COLLAPSE
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def candidate_rows(self, query):
+        """
+        Rangs compatibles avec les filtres de la question, None sans filtre. Si rien ne correspond,
+        la période est abandonnée (dates relatives hors de l'index...), puis tous les filtres :
+        mieux vaut un contexte approché qu'un contexte vide.
+        """
+        meta = self.metadata_index
+        if meta is None or not self.use_filters:
+            return None
+        filters = parse_filters(query, meta.city_matcher, default_year=meta.default_year())
+        rows = meta.candidate_rows(filters)
+        if rows is not None and len(rows) == 0 and filters["date_from"]:
+            rows = meta.candidate_rows({**filters, "date_from": None, "date_to": None})
+        if rows is not None and len(rows) == 0:
+            return None
+        return rows
+
+    def _depth(self, k):
+        return k if self.sparse_index is None else max(k, self.fetch_k)
+
+    def _fuse(self, query, dense, rows, k):
+        if self.sparse_index is None:
+            return dense[:k]
+        sparse = self.sparse_index.search(query, self._depth(k), rows)[0]
+        return reciprocal_rank_fusion([dense, sparse], k=k, rrf_k=self.rrf_k)
+
+    def ranked_rows(self, query, query_vector, k=None):
+        """Rangs FAISS retenus pour la question, du plus au moins pertinent."""
+        k = k or self.k
+        rows = self.candidate_rows(query)
+        dense = search_rows(self.db.index, query_vector, self._depth(k), rows)[0]
+        return self._fuse(query, dense, rows, k)
+
+    def ranked_rows_batch(self, queries, query_vectors, k=None):
+        """
+        ranked_rows pour plusieurs questions : les questions sans filtre partagent un seul
+        index.search ; les autres sont restreintes à leurs propres rangs candidats.
+        """
+        k = k or self.k
+        candidates = [self.candidate_rows(query) for query in queries]
+        dense = [None] * len(queries)
+        free = [i for i, rows in enumerate(candidates) if rows is None]
+        if free:
+            batch = search_rows_batch(self.db.index, [query_vectors[i] for i in free], self._depth(k))
+            for i, (found, _) in zip(free, batch):
+                dense[i] = found
+        for i, rows in enumerate(candidates):
+            if rows is not None:
+                dense[i] = search_rows(self.db.index, query_vectors[i], self._depth(k), rows)[0]
+        return [self._fuse(query, found, rows, k) for query, found, rows in zip(queries, dense, candidates)]
+
+    def search(self, query, query_vector, k=None):
+        """Documents pour une question dont l'embedding est déjà connu."""
+        return self.search_batch([query], [query_vector], k)[0]
+
+    def search_batch(self, queries, query_vectors, k=None):
+        """Documents pour plusieurs questions ; le docstore est lu une fois pour l'ensemble des rangs."""
+        k = k or self.k
+        depth = max(k, self.fetch_k) if self.collapse else k
+        ranked = self.ranked_rows_batch(queries, query_vectors, depth)
+        rows = sorted({int(row) for found in ranked for row in found})
+        by_row = dict(zip(rows, documents_for_rows(self.db, rows)))
+        results = []
+        for found in ranked:
+            docs = [by_row[int(row)] for row in found]
+            results.append(collapse_by_event(docs, k) if self.collapse else [d for d in docs if d is not None])
+        return results
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.search(query, self.db.embeddings.embed_query(query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        vector = await self.db.embeddings.aembed_query(query)
+        return await asyncio.to_thread(self.search, query, vector)
@@ -0,0 +1,27 @@
+"""Petits utilitaires texte partagés par le pipeline RAG."""
+import hashlib
+import unicodedata
+
+
+# --- Estimation rapide du nombre de tokens ---
+def estimate_tokens(text: str) -> int:
+    """
+    Estimation locale (sans tokenizer) du nombre de tokens d'un texte.
+    Volontairement pessimiste : ~3 caractères par token pour du français.
+    """
+    if not text:
+        return 1
+    return len(text) // 3 + 1
+
+
+# --- Normalisation pour les clés de cache ---
+def normalize_text(text: str) -> str:
+    """Forme canonique d'un texte : Unicode NFC, espaces compactés, sans bords."""
+    if not text:
+        return ""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> str:
+    """Empreinte SHA-256 du texte normalisé."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
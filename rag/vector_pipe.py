@@ -1,21 +1,111 @@
 import os
+import json
+import shutil
 from pathlib import Path
-from pprint import pprint
-from tqdm import tqdm
 import time
+import asyncio
+import faiss
+import httpx
+import numpy as np
+import pyarrow.parquet as pq
 from mistralai import models
 from langchain_core.embeddings import Embeddings
 from langchain_community.document_loaders import JSONLoader
+from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from mistralai import Mistral
 from dotenv import load_dotenv
+
+try:
+    from embed_scheduler import EmbeddingScheduler
+    from embed_cache import EmbeddingCache, cached_embed
+    from embed_coalescer import EMBED_COALESCE, QueryCoalescer
+    from index_store import (EmbeddingModelMismatch, check_model_identity, current_store_path, new_version_dir,
+                             publish_version, store_exists, write_model_identity)
+    from rate_limit import UpstreamLimiter, is_rate_limit_error, backoff_delay
+    from query_cache import normalize_question
+    from docstore import DOCSTORE_FILE, INDEX_FILE, DocstoreWriter, docstore_size, load_faiss, save_faiss
+    from ann_index import convert_index, index_kind
+    from filters import MetadataIndex, MetadataIndexBuilder
+    from bm25 import BM25Builder, BM25Index, document_text
+    from events_dataset import EVENTS_PARQUET, INDEX_COLUMNS, iter_event_batches, iter_events, record_hash
+    from build_pipeline import BUILD_BATCH_EVENTS, BUILD_QUEUE_DEPTH, format_stats, run_pipeline
+    from chunking import CHUNK_STRATEGY, CHUNKER_VERSION, chunk_documents
+    import metrics
+except ImportError:
+    from rag.embed_scheduler import EmbeddingScheduler
+    from rag.embed_cache import EmbeddingCache, cached_embed
+    from rag.embed_coalescer import EMBED_COALESCE, QueryCoalescer
+    from rag.index_store import (EmbeddingModelMismatch, check_model_identity, current_store_path, new_version_dir,
+                                 publish_version, store_exists, write_model_identity)
+    from rag.rate_limit import UpstreamLimiter, is_rate_limit_error, backoff_delay
+    from rag.query_cache import normalize_question
+    from rag.docstore import DOCSTORE_FILE, INDEX_FILE, DocstoreWriter, docstore_size, load_faiss, save_faiss
+    from rag.ann_index import convert_index, index_kind
+    from rag.filters import MetadataIndex, MetadataIndexBuilder
+    from rag.bm25 import BM25Builder, BM25Index, document_text
+    from rag.events_dataset import EVENTS_PARQUET, INDEX_COLUMNS, iter_event_batches, iter_events, record_hash
+    from rag.build_pipeline import BUILD_BATCH_EVENTS, BUILD_QUEUE_DEPTH, format_stats, run_pipeline
+    from rag.chunking import CHUNK_STRATEGY, CHUNKER_VERSION, chunk_documents
+    from rag import metrics
+
 load_dotenv()
+ROOT = Path(__file__).resolve().parents[1]
+
+# --- Paramètres de l'ordonnanceur d'embeddings (quota du compte Mistral) ---
+EMBED_MAX_IN_FLIGHT = int(os.getenv("MISTRAL_EMBED_CONCURRENCY", "2"))
+EMBED_RPS = float(os.getenv("MISTRAL_EMBED_RPS", "1"))          # offre gratuite : 1 req/s
+EMBED_TPM = int(os.getenv("MISTRAL_EMBED_TPM", "0")) or None     # tokens/minute (optionnel)
+EMBED_BATCH_TOKENS = int(os.getenv("MISTRAL_EMBED_BATCH_TOKENS", "16000"))
+EMBED_BATCH_SIZE = int(os.getenv("MISTRAL_EMBED_BATCH_SIZE", "128"))
+
+# --- Chemin asynchrone (/ask) : appels simultanés bornés + timeout ---
+EMBED_ASYNC_CONCURRENCY = int(os.getenv("MISTRAL_EMBED_ASYNC_CONCURRENCY", "16"))
+EMBED_TIMEOUT = float(os.getenv("MISTRAL_EMBED_TIMEOUT", "15"))
+embed_limiter = UpstreamLimiter("mistral-embed", EMBED_ASYNC_CONCURRENCY, EMBED_TIMEOUT)
+
+# URL de l'API (surchargeable pour pointer vers un bouchon local, cf. scripts/mistral_stub.py)
+MISTRAL_SERVER_URL = os.getenv("MISTRAL_SERVER_URL") or None
+MISTRAL_MAX_CONNECTIONS = int(os.getenv("MISTRAL_HTTP_MAX_CONNECTIONS", "256"))
+
+# Backend d'embeddings : "mistral" (API, défaut) ou "local" (sentence-transformers, cf. local_embeddings)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "mistral")
+
+# Format du docstore écrit à chaque version : "sqlite" (défaut, lu à la demande) ou "pickle" (index.pkl)
+DOCSTORE_BACKEND = os.getenv("DOCSTORE_BACKEND", "sqlite")
+
+
+def make_mistral_client(api_key):
+    """Client Mistral dont le pool de connexions async suit la concurrence visée."""
+    limits = httpx.Limits(
+        max_connections=MISTRAL_MAX_CONNECTIONS,
+        max_keepalive_connections=MISTRAL_MAX_CONNECTIONS,
+    )
+    return Mistral(
+        api_key=api_key,
+        server_url=MISTRAL_SERVER_URL,
+        async_client=httpx.AsyncClient(limits=limits, follow_redirects=True),
+    )
+
+# --- Cache disque des embeddings (clé : modèle + hash du texte normalisé) ---
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE", "1") != "0"
+EMBED_CACHE_PATH = Path(os.getenv("EMBED_CACHE_PATH", str(ROOT / "data" / "embed_cache.sqlite")))
+
+EVENTS_PATH = Path("./data/events_clean.json")
+STORE_PATH = Path("data/faiss_store")
+
+
+def default_events_path():
+    """Source de l'index : events_clean.parquet s'il existe, sinon l'export events_clean.json."""
+    return EVENTS_PARQUET if EVENTS_PARQUET.exists() else EVENTS_PATH
+
 
 # --- Fonction pour extraire les métadonnées ---
 def metadata_extractor(record, metadata):
     return {
         "id": record.get("id"),
+        "content_hash": record.get("content_hash") or record_hash(record),
         "title": record.get("title"),
         "url": record.get("url"),
         "date_start": record.get("date_start"),
@@ -27,28 +117,69 @@ def metadata_extractor(record, metadata):
 
 # --- Wrapper embeddings Mistral ---
 class MistralEmbeddings(Embeddings):
-    def __init__(self, model="mistral-embed"):
-        api_key = os.getenv("MISTRAL_API_KEY")
-        if not api_key:
-            raise ValueError("⚠️ La clé API Mistral n'est pas définie.")
-        self.client = Mistral(api_key=api_key)
+    def __init__(self, model="mistral-embed", client=None, scheduler=None, cache=None, query_cache=None,
+                 coalesce=EMBED_COALESCE):
+        if client is None:
+            api_key = os.getenv("MISTRAL_API_KEY")
+            if not api_key:
+                raise ValueError("⚠️ La clé API Mistral n'est pas définie.")
+            client = make_mistral_client(api_key)
+        self.client = client
         self.model = model
+        self.scheduler = scheduler or EmbeddingScheduler(
+            client,
+            model=model,
+            max_in_flight=EMBED_MAX_IN_FLIGHT,
+            requests_per_second=EMBED_RPS,
+            tokens_per_minute=EMBED_TPM,
+            max_batch_tokens=EMBED_BATCH_TOKENS,
+            max_batch_size=EMBED_BATCH_SIZE,
+        )
+        self.cache = cache
+        self.query_cache = query_cache  # LRU des embeddings de questions (optionnel)
+        # questions simultanées regroupées en un appel (cf. embed_coalescer)
+        self.coalescer = QueryCoalescer(self._aembed_remote, max_batch=EMBED_BATCH_SIZE) if coalesce else None
 
-    def embed_documents(self, texts):
-        """Embeddings pour une liste de documents"""
-        embeddings = []
-        batch_size = 50
-        for i in tqdm(range(0, len(texts), batch_size), desc="Embedding batches"):
-            batch = texts[i:i+batch_size]
-            response = self.client.embeddings.create(
-                model=self.model,
-                inputs=batch
-            )
-            embeddings.extend([e.embedding for e in response.data])
-            time.sleep(1)  # respecter limite 1 req/sec
-        return embeddings
+    def identity(self):
+        """Identité du modèle enregistrée avec l'index (cf. index_store.check_model_identity)."""
+        return {"backend": "mistral", "model": self.model}
+
+    def embed_documents(self, texts, progress=None):
+        """
+        Embeddings pour une liste de documents (cache disque puis batches parallèles sous quota).
+        `progress(done, total)` est appelé après chaque batch envoyé à l'API.
+        """
+        def embed(batch):
+            return self.scheduler.embed(batch, progress=progress)
+
+        if self.cache is None:
+            return embed(texts)
+        vectors, hits, misses = cached_embed(self.cache, self.model, texts, embed)
+        print(f"🗃️ Cache embeddings : {hits} réutilisés, {misses} calculés")
+        return vectors
 
     def embed_query(self, text):
+        if self.query_cache is None:
+            return self._embed_query_remote(text)
+        key = normalize_question(text)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = self._embed_query_remote(text)
+            self.query_cache.put(key, vector)
+        return vector
+
+    async def aembed_query(self, text):
+        """Version asynchrone de embed_query (ne bloque pas la boucle d'événements)."""
+        if self.query_cache is None:
+            return await self._aembed_query_remote(text)
+        key = normalize_question(text)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = await self._aembed_query_remote(text)
+            self.query_cache.put(key, vector)
+        return vector
+
+    def _embed_query_remote(self, text):
         for _ in range(3):  # jusqu’à 3 tentatives
             try:
                 response = self.client.embeddings.create(
@@ -58,78 +189,438 @@ class MistralEmbeddings(Embeddings):
                 return response.data[0].embedding
             except models.SDKError as e:
                 if "capacity" in str(e) or "429" in str(e):
+                    metrics.inc("rag_embed_retries_total", path="sync")
                     print("⚠️ API Mistral saturée, nouvelle tentative dans 5 secondes...")
                     time.sleep(5)
                     continue
                 raise
         raise RuntimeError("Échec de l’embedding après plusieurs tentatives")
 
+    async def aembed_queries(self, texts):
+        """
+        Embeddings de plusieurs questions (POST /ask/batch) : cache LRU d'abord, puis un seul
+        appel API (par tranche de MISTRAL_EMBED_BATCH_SIZE) pour les questions distinctes restantes.
+        """
+        vectors = [None] * len(texts)
+        missing = {}  # clé (question normalisée) -> positions
+        for i, text in enumerate(texts):
+            key = normalize_question(text)
+            vector = self.query_cache.get(key) if self.query_cache is not None else None
+            if vector is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                vectors[i] = vector
+        keys = list(missing)
+        for start in range(0, len(keys), EMBED_BATCH_SIZE):
+            batch = keys[start:start + EMBED_BATCH_SIZE]
+            remote = await self._aembed_remote([texts[missing[key][0]] for key in batch])
+            for key, vector in zip(batch, remote):
+                for i in missing[key]:
+                    vectors[i] = vector
+                if self.query_cache is not None:
+                    self.query_cache.put(key, vector)
+        return vectors
 
-if __name__ == "__main__":
-    # --- Charger les données JSON ---
+    async def _aembed_query_remote(self, text):
+        if self.coalescer is not None:
+            return await self.coalescer.embed(text)
+        return (await self._aembed_remote([text]))[0]
+
+    async def _aembed_remote(self, texts):
+        for attempt in range(3):  # jusqu’à 3 tentatives
+            try:
+                response = await embed_limiter.run(
+                    self.client.embeddings.create_async, model=self.model, inputs=texts
+                )
+                return [item.embedding for item in response.data]
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                metrics.inc("rag_embed_retries_total", path="async")
+                print("⚠️ API Mistral saturée, nouvelle tentative...")
+                await asyncio.sleep(backoff_delay(attempt, base=1.0, maximum=5.0))
+        raise RuntimeError("Échec de l’embedding après plusieurs tentatives")
+
+
+def make_embeddings(cache=None, query_cache=None, backend=None):
+    """Backend d'embeddings configuré (EMBED_BACKEND) : MistralEmbeddings ou LocalEmbeddings."""
+    backend = backend or EMBED_BACKEND
+    if backend == "local":
+        try:
+            from local_embeddings import LocalEmbeddings
+        except ImportError:
+            from rag.local_embeddings import LocalEmbeddings
+        return LocalEmbeddings(cache=cache, query_cache=query_cache)
+    if backend != "mistral":
+        raise ValueError(f"EMBED_BACKEND inconnu : {backend!r} (mistral ou local)")
+    return MistralEmbeddings(cache=cache, query_cache=query_cache)
+
+
+def default_embed_cache():
+    """Cache d'embeddings par défaut (None si désactivé via EMBED_CACHE=0)."""
+    if not EMBED_CACHE_ENABLED:
+        return None
+    return EmbeddingCache(EMBED_CACHE_PATH)
+
+
+# --- Chargement + découpage des événements ---
+def iter_documents(events_path=None):
+    """
+    Un Document par événement, dans l'ordre du fichier. Parquet : lecture par lots des seules
+    colonnes utiles à l'index ; JSON : chargement complet via JSONLoader (ancien format).
+    """
+    events_path = Path(events_path or default_events_path())
+    if events_path.suffix == ".parquet":
+        for batch in iter_event_batches(events_path, INDEX_COLUMNS):
+            for record in batch:
+                yield Document(page_content=record["text_to_embed"] or "",
+                               metadata=metadata_extractor(record, {}))
+        return
     loader = JSONLoader(
-        file_path="./data/events_clean.json",
+        file_path=str(events_path),
         jq_schema=".[]",
         content_key="text_to_embed",
         metadata_func=metadata_extractor
     )
+    yield from loader.load()
 
-    docs = loader.load()
-    print(f"Documents chargés : {len(docs)}")
-    pprint(docs[0].metadata)
 
-    # --- Split en chunks ---
+def load_documents(events_path=None):
+    """Charge les événements (un Document par événement, dédupliqués par id)."""
+    by_id = {}
+    for doc in iter_documents(events_path):
+        event_id = doc.metadata.get("id") or doc.metadata["content_hash"]
+        doc.metadata["id"] = event_id
+        by_id[event_id] = doc
+    return list(by_id.values())
+
+
+def split_documents(docs):
+    """Découpe en chunks ; ids déterministes "<id événement>:<n° chunk>" (cf. rag/chunking)."""
+    if CHUNK_STRATEGY == "event":
+        return chunk_documents(docs)
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=500,
         chunk_overlap=50
     )
-    split_docs = splitter.split_documents(docs)
-    print(f"Nombre de chunks générés : {len(split_docs)}")
+    chunks, ids = [], []
+    for doc in docs:
+        for n, chunk in enumerate(splitter.split_documents([doc])):
+            chunk.metadata["chunker"] = CHUNKER_VERSION
+            chunks.append(chunk)
+            ids.append(f"{doc.metadata['id']}:{n}")
+    return chunks, ids
+
+
+def check_store(db):
+    """Vérifie la cohérence vecteurs FAISS <-> docstore."""
+    index_size = db.index.ntotal
+    metadata_size = docstore_size(db.docstore)
+    if index_size != metadata_size or index_size != len(db.index_to_docstore_id):
+        raise RuntimeError(
+            f"Incohérence détectée : {index_size} vecteurs FAISS "
+            f"mais {metadata_size} métadonnées"
+        )
+    return index_size
+
+
+def _report(progress, stage, done=None, total=None):
+    if progress is not None:
+        progress(stage, done, total)
+
 
-    # --- Créer l’index FAISS avec LangChain ---
-    embeddings = MistralEmbeddings()
-    db = FAISS.from_documents(split_docs, embeddings)
+def embed_chunks(embeddings, chunks, progress=None):
+    """Embeddings des chunks, avec suivi de progression quand le backend le permet."""
+    texts = [c.page_content for c in chunks]
+    if isinstance(embeddings, MistralEmbeddings):
+        return embeddings.embed_documents(
+            texts, progress=lambda done, total: _report(progress, "embed", done, total)
+        )
+    return embeddings.embed_documents(texts)
 
-    # --- Sauvegarder l’index ---
-    store_path = Path("data/faiss_store")
-    db.save_local(str(store_path))
-    print(f"💾 Index FAISS + métadonnées sauvegardé dans {store_path}")
+
+def load_store(store_path, embeddings, writable=False):
+    """Charge la version courante de l'index (copie modifiable si `writable`)."""
+    return load_faiss(current_store_path(store_path), embeddings, writable=writable)
+
+
+def save_version(db, store_path, progress=None):
+    """Écrit l'index dans un nouveau dossier de version puis le publie atomiquement."""
+    _report(progress, "save")
+    version_path = new_version_dir(store_path)
+    if DOCSTORE_BACKEND == "pickle":
+        db.index = convert_index(db.index)  # type d'index configuré (FAISS_INDEX_TYPE)
+        db.save_local(str(version_path))
+    else:
+        save_faiss(db, version_path)
+    return finalize_version(db, version_path)
+
+
+def finalize_version(db, version_path, annexes=True):
+    """
+    Index annexes d'une version écrite (filtres, BM25), puis publication atomique.
+    `annexes=False` : déjà écrits pendant la construction (stream_build).
+    """
+    if annexes:
+        # colonnes date/ville/mots-clés alignées sur les rangs FAISS (filtres de recherche)
+        MetadataIndex.from_store(db).save(version_path)
+        # index lexical BM25 pour la recherche hybride
+        BM25Index.from_store(db).save(version_path)
+    # modèle qui a produit les vecteurs : un chargement avec un autre modèle sera refusé
+    write_model_identity(version_path, db.embeddings, db.index.d)
+    publish_version(version_path)
+    return version_path
+
+
+# --- Construction en flux : chargement -> découpage -> embedding -> index ---
+class ChunkBatch:
+    """Lot de chunks passé d'un étage à l'autre (len : nombre de chunks)."""
+
+    __slots__ = ("events", "chunks", "ids", "vectors")
+
+    def __init__(self, events, chunks, ids):
+        self.events = events
+        self.chunks = chunks
+        self.ids = ids
+        self.vectors = None
+
+    def __len__(self):
+        return len(self.chunks)
+
+
+def unique_documents(events_path=None):
+    """
+    Documents à indexer, en flux et dédupliqués par id (le dernier l'emporte, comme load_documents).
+    Parquet : un premier passage sur la seule colonne id repère les doublons, chaque événement
+    est émis à sa dernière occurrence ; JSON : chargement complet (ancien format).
+    """
+    events_path = Path(events_path or default_events_path())
+    if events_path.suffix != ".parquet":
+        yield from load_documents(events_path)
+        return
+    last = {}
+    for row, record in enumerate(iter_events(events_path, columns=["id", "content_hash"])):
+        last[record["id"] or record["content_hash"]] = row
+    for row, doc in enumerate(iter_documents(events_path)):
+        event_id = doc.metadata.get("id") or doc.metadata["content_hash"]
+        if last[event_id] == row:
+            doc.metadata["id"] = event_id
+            yield doc
+
+
+def stream_build(events_path, version_path, embeddings, progress=None,
+                 batch_size=BUILD_BATCH_EVENTS, queue_depth=BUILD_QUEUE_DEPTH):
+    """
+    Écrit index.faiss + docstore.sqlite dans `version_path` sans matérialiser le corpus :
+    les lots d'événements sont découpés, embeddés puis ajoutés à l'index au fil de l'eau
+    (cf. build_pipeline). Les vecteurs vont directement dans l'index exact (buffer float32
+    contigu), converti ensuite au type configuré. Les index de filtres et BM25 sont
+    alimentés lot par lot au même moment (ni relecture du docstore, ni textes gardés).
+    Renvoie les statistiques par étage.
+    """
+    version_path = Path(version_path)
+    events_path = Path(events_path or default_events_path())
+    # total connu d'avance en Parquet (métadonnées du fichier), pour l'avancement
+    total_events = pq.ParquetFile(events_path).metadata.num_rows if events_path.suffix == ".parquet" else None
+    state = {"index": None, "events": 0}
+    writer = DocstoreWriter(version_path / DOCSTORE_FILE)
+    metadata_builder, bm25_builder = MetadataIndexBuilder(), BM25Builder()
+
+    def split(docs):
+        chunks, ids = split_documents(docs)
+        return ChunkBatch(len(docs), chunks, ids)
+
+    def embed(batch):
+        if len(batch):
+            batch.vectors = np.asarray(embed_chunks(embeddings, batch.chunks), dtype=np.float32)
+        return batch
+
+    def add(batch):
+        if len(batch):
+            if state["index"] is None:
+                state["index"] = faiss.IndexFlatL2(batch.vectors.shape[1])
+            state["index"].add(batch.vectors)
+            writer.add(batch.ids, batch.chunks)
+            for chunk in batch.chunks:
+                metadata_builder.add(chunk.metadata, chunk.page_content)
+                bm25_builder.add(document_text(chunk.metadata, chunk.page_content))
+        state["events"] += batch.events
+        _report(progress, "embed", state["events"], total_events)
+
+    try:
+        stats, elapsed = run_pipeline(
+            unique_documents(events_path), [("split", split), ("embed", embed)], add,
+            batch_size=batch_size, queue_depth=queue_depth,
+        )
+        if state["index"] is None:
+            raise RuntimeError(f"Aucun chunk à indexer dans {events_path}")
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    faiss.write_index(convert_index(state["index"]), str(version_path / INDEX_FILE))
+    metadata_builder.finish().save(version_path)
+    bm25_builder.finish().save(version_path)
+    stats = {"seconds": round(elapsed, 3), "events": state["events"], "stages": stats}
+    (version_path / "build_stats.json").write_text(json.dumps(stats, indent=2), encoding="utf-8")
+    units = {"load": "événements", "split": "chunks", "embed": "chunks", "index": "chunks"}
+    print(f"⏱️ Construction en flux : {format_stats(stats['stages'], elapsed, units)}")
+    return stats
 
 
 # fonction rebuild pour API
-def rebuild_faiss():
+def rebuild_faiss(events_path=None, store_path=STORE_PATH, embeddings=None, progress=None):
     """
-    Reconstruit l’index FAISS à partir du fichier events_clean.json
-    et le sauvegarde dans data/faiss_store.
+    Reconstruit l’index FAISS à partir des événements (events_clean.parquet, ou events_clean.json
+    à défaut ; cf. default_events_path) et le publie comme nouvelle version dans data/faiss_store.
+    Docstore SQLite (défaut) : construction en flux à mémoire bornée (stream_build) ;
+    DOCSTORE_BACKEND=pickle : tout le corpus en mémoire, comme auparavant.
+    `progress(stage, done, total)` reçoit l’avancement (load, split, embed, save).
     """
     print("🔄 Reconstruction de l’index FAISS en cours...")
+    embeddings = embeddings or make_embeddings(cache=default_embed_cache())
 
-    # --- Charger les données JSON ---
-    loader = JSONLoader(
-        file_path="./data/events_clean.json",
-        jq_schema=".[]",
-        content_key="text_to_embed",
-        metadata_func=metadata_extractor
-    )
-    docs = loader.load()
+    if DOCSTORE_BACKEND == "pickle":
+        version_path = _rebuild_in_memory(events_path, store_path, embeddings, progress)
+    else:
+        _report(progress, "load")
+        version_path = new_version_dir(store_path)
+        try:
+            stats = stream_build(events_path, version_path, embeddings, progress)
+            print(f"Documents chargés : {stats['events']}")
+            print(f"Nombre de chunks générés : {stats['stages']['index']['items']}")
+            _report(progress, "save")
+            finalize_version(load_faiss(version_path, embeddings), version_path, annexes=False)
+        except BaseException:
+            shutil.rmtree(version_path, ignore_errors=True)
+            raise
+
+    print(f"✅ Index FAISS reconstruit et sauvegardé dans {version_path}")
+    return version_path
+
+
+def _rebuild_in_memory(events_path, store_path, embeddings, progress):
+    # --- Charger les événements (Parquet ou JSON) ---
+    _report(progress, "load")
+    docs = load_documents(events_path)
     print(f"Documents chargés : {len(docs)}")
 
     # --- Split en chunks ---
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=50
-    )
-    split_docs = splitter.split_documents(docs)
+    _report(progress, "split")
+    split_docs, ids = split_documents(docs)
     print(f"Nombre de chunks générés : {len(split_docs)}")
 
-    # --- Créer l’index FAISS avec LangChain ---
-    embeddings = MistralEmbeddings()
-    db = FAISS.from_documents(split_docs, embeddings)
+    # --- Créer l’index FAISS avec LangChain (embeddings déjà connus lus dans le cache) ---
+    vectors = embed_chunks(embeddings, split_docs, progress)
+    db = FAISS.from_embeddings(
+        zip([d.page_content for d in split_docs], vectors),
+        embeddings,
+        metadatas=[d.metadata for d in split_docs],
+        ids=ids,
+    )
+
+    # --- Sauvegarder l’index (nouvelle version, bascule atomique) ---
+    return save_version(db, store_path, progress)
+
+
+# --- Synchronisation incrémentale ---
+def indexed_events(db, chunkers=None):
+    """
+    {id événement: (content_hash, [ids des chunks])} pour l'index existant ;
+    `chunkers` (ensemble) reçoit les versions de découpage rencontrées.
+    """
+    events = {}
+    for doc_id in db.index_to_docstore_id.values():
+        meta = db.docstore.search(doc_id).metadata
+        if chunkers is not None:
+            chunkers.add(meta.get("chunker"))
+        content_hash, chunk_ids = events.setdefault(meta.get("id"), (meta.get("content_hash"), []))
+        chunk_ids.append(doc_id)
+    return events
+
+
+def sync_faiss(events_path=None, store_path=STORE_PATH, embeddings=None, progress=None):
+    """
+    Met à jour l’index existant au lieu de tout reconstruire :
+    seuls les événements nouveaux ou modifiés sont embeddés,
+    les chunks des événements supprimés ou modifiés sont retirés.
+    Le résultat est publié comme nouvelle version (l’index servi n’est jamais modifié en place).
+    Bascule sur une reconstruction complète si l’index n’existe pas
+    ou date d’avant les empreintes de contenu.
+    """
+    if not store_exists(store_path):
+        print("ℹ️ Aucun index existant : reconstruction complète")
+        version_path = rebuild_faiss(events_path, store_path, embeddings, progress)
+        return {"mode": "full", "version": version_path.name}
+
+    _report(progress, "load")
+    embeddings = embeddings or make_embeddings(cache=default_embed_cache())
+    db = load_store(store_path, embeddings, writable=True)
+    chunkers = set()
+    indexed = indexed_events(db, chunkers)
+    if any(content_hash is None for content_hash, _ in indexed.values()):
+        print("ℹ️ Index sans empreintes de contenu : reconstruction complète")
+        version_path = rebuild_faiss(events_path, store_path, embeddings, progress)
+        return {"mode": "full", "version": version_path.name}
+    if chunkers - {CHUNKER_VERSION}:
+        print("ℹ️ Index découpé autrement (CHUNK_STRATEGY / CHUNK_MAX_CHARS) : reconstruction complète")
+        version_path = rebuild_faiss(events_path, store_path, embeddings, progress)
+        return {"mode": "full", "version": version_path.name}
+    try:
+        check_model_identity(current_store_path(store_path), embeddings, db.index.d)
+    except EmbeddingModelMismatch as e:
+        print(f"ℹ️ {e} : reconstruction complète")
+        version_path = rebuild_faiss(events_path, store_path, embeddings, progress)
+        return {"mode": "full", "version": version_path.name}
+    if index_kind(db.index) != "flat":
+        # IVF-PQ : vecteurs d'origine perdus ; le cache d'embeddings évite de tout recalculer
+        print("ℹ️ Index compressé non modifiable : reconstruction complète")
+        version_path = rebuild_faiss(events_path, store_path, embeddings, progress)
+        return {"mode": "full", "version": version_path.name}
+
+    docs = load_documents(events_path)
+    current = {doc.metadata["id"]: doc for doc in docs}
 
-    # --- Sauvegarder l’index ---
-    store_path = Path("data/faiss_store")
-    db.save_local(str(store_path))
+    added = [doc for event_id, doc in current.items() if event_id not in indexed]
+    changed = [
+        doc for event_id, doc in current.items()
+        if event_id in indexed and indexed[event_id][0] != doc.metadata["content_hash"]
+    ]
+    deleted = [event_id for event_id in indexed if event_id not in current]
 
-    print(f"✅ Index FAISS reconstruit et sauvegardé dans {store_path}")
-    return store_path
+    # --- Retirer les chunks des événements supprimés ou modifiés ---
+    stale_ids = [cid for event_id in deleted for cid in indexed[event_id][1]]
+    stale_ids += [cid for doc in changed for cid in indexed[doc.metadata["id"]][1]]
+    if stale_ids:
+        db.delete(stale_ids)
 
+    # --- Embedder et ajouter uniquement les nouveaux chunks ---
+    _report(progress, "split")
+    new_chunks, new_ids = split_documents(added + changed)
+    if new_chunks:
+        vectors = embed_chunks(embeddings, new_chunks, progress)
+        db.add_embeddings(
+            zip([c.page_content for c in new_chunks], vectors),
+            metadatas=[c.metadata for c in new_chunks],
+            ids=new_ids,
+        )
+
+    total = check_store(db)
+    version_path = save_version(db, store_path, progress)
+
+    summary = {
+        "mode": "incremental",
+        "version": version_path.name,
+        "added": len(added),
+        "changed": len(changed),
+        "deleted": len(deleted),
+        "chunks_removed": len(stale_ids),
+        "chunks_added": len(new_chunks),
+        "total_chunks": total,
+    }
+    print(f"✅ Index FAISS synchronisé : {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    rebuild_faiss()
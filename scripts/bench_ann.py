@@ -0,0 +1,100 @@
+# scripts/bench_ann.py
+"""
+Index exact vs approchés (IVF-Flat, HNSW, IVF-PQ) sur corpus synthétiques.
+
+Pour chaque taille de corpus, construit chaque type d'index puis balaie nprobe / efSearch
+et affiche : temps de construction, rappel@k par rapport à l'index exact,
+latence par requête (p50, une requête à la fois comme /ask) et taille en mémoire.
+
+Les vecteurs sont tirés autour de centres (données groupées, plus proches des
+embeddings réels qu'un bruit uniforme), normalisés comme ceux de mistral-embed.
+
+    python -m scripts.bench_ann --sizes 10000,100000,1000000 --dim 128
+    python -m scripts.bench_ann --sizes 10000 --dim 1024 --pq-m 64
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from rag.ann_index import build_index, default_nlist, index_memory_bytes, set_search_params
+
+
+def synthetic_corpus(n, dim, n_queries, seed=0):
+    rng = np.random.default_rng(seed)
+    n_centers = max(10, int(np.sqrt(n)))
+    centers = rng.standard_normal((n_centers, dim)).astype(np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    step = 100_000
+    for start in range(0, n, step):  # par blocs pour borner la mémoire
+        stop = min(n, start + step)
+        vectors[start:stop] = centers[rng.integers(0, n_centers, stop - start)]
+        vectors[start:stop] += 0.5 * rng.standard_normal((stop - start, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(n, n_queries, replace=False)] + 0.05 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, queries
+
+
+def recall_at_k(found, exact, k):
+    return float(np.mean([len(set(f[:k]) & set(e[:k])) / k for f, e in zip(found, exact)]))
+
+
+def measure(index, queries, exact, k):
+    latencies, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        found.append(index.search(q[None, :], k)[1][0])
+        latencies.append(time.perf_counter() - t0)
+    return recall_at_k(found, exact, k), statistics.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=128, help="1024 pour mistral-embed (≈4 Go par million de vecteurs)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", default="ivf_flat,hnsw,ivf_pq")
+    parser.add_argument("--nprobe", default="1,4,16,64")
+    parser.add_argument("--ef-search", default="16,64,256")
+    parser.add_argument("--pq-m", type=int, default=16)
+    args = parser.parse_args()
+
+    for n in (int(s) for s in args.sizes.split(",")):
+        vectors, queries = synthetic_corpus(n, args.dim, args.queries)
+        t0 = time.perf_counter()
+        flat = build_index(vectors, "flat")
+        flat_build = time.perf_counter() - t0
+        exact = flat.search(queries, args.k)[1]
+        _, flat_ms = measure(flat, queries, exact, args.k)
+        print(f"\n=== {n} vecteurs, dim {args.dim}, nlist {default_nlist(n)} ===")
+        print(f"{'index':<10} {'réglage':<14} {'construction':>12} {f'rappel@{args.k}':>10} {'p50':>9} {'mémoire':>10}")
+        print(f"{'flat':<10} {'-':<14} {flat_build:>11.2f}s {1.0:>10.3f} {flat_ms:>7.2f}ms "
+              f"{index_memory_bytes(flat) / 2**20:>8.1f}Mo")
+        del flat
+
+        for kind in args.types.split(","):
+            t0 = time.perf_counter()
+            index = build_index(vectors, kind, pq_m=args.pq_m)
+            build_s = time.perf_counter() - t0
+            memory = index_memory_bytes(index) / 2**20
+            if kind == "hnsw":
+                settings = [("efSearch", int(v)) for v in args.ef_search.split(",")]
+            else:
+                settings = [("nprobe", int(v)) for v in args.nprobe.split(",")]
+            for name, value in settings:
+                set_search_params(index, nprobe=value, ef_search=value)
+                recall, p50 = measure(index, queries, exact, args.k)
+                print(f"{kind:<10} {f'{name}={value}':<14} {build_s:>11.2f}s {recall:>10.3f} {p50:>7.2f}ms {memory:>8.1f}Mo")
+            del index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# scripts/bench_ask.py
+"""
+Benchmark de charge de /ask contre un bouchon local des endpoints Mistral.
+
+Construit un petit index synthétique, démarre le bouchon (scripts/mistral_stub.py),
+lance l'API dans un serveur uvicorn local (un seul worker) et lui envoie N questions
+avec C requêtes simultanées.
+Affiche p50/p95 de latence et le débit (requêtes/s).
+
+    python -m scripts.bench_ask --requests 400 --concurrency 200
+    python -m scripts.bench_ask --compare-sync   # + ancien chemin synchrone (threadpool)
+    python -m scripts.bench_ask --stream         # + /ask/stream : délai avant premier octet
+    python -m scripts.bench_ask --batch 100      # + N appels /ask successifs vs un POST /ask/batch de N
+    python -m scripts.bench_ask --distinct       # questions toutes différentes (sans cache de questions)
+
+Le nombre d'appels embeddings reçus par le bouchon est affiché : comparer EMBED_COALESCE=0 / 1
+pour mesurer le regroupement des questions simultanées.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from scripts.mistral_stub import create_app, serve_in_thread, stub_vector
+
+QUESTIONS = [
+    "Quels concerts de musique classique en avril 2025 à Paris ?",
+    "Y a-t-il un hommage à Beethoven en 2025 ?",
+    "Je cherche un atelier jeux vidéos en octobre 2025 ?",
+    "Un concert de gospel jazz est-il prévu en juin 2025 à Paris ?",
+]
+
+
+def build_synthetic_store(store_root, n_events):
+    """Index FAISS de `n_events` faux événements, embeddés localement (sans réseau)."""
+    from langchain_community.vectorstores import FAISS
+    from rag.vector_pipe import MistralEmbeddings, save_version
+
+    texts = [f"Événement {i}. Concert, exposition ou atelier à Paris en 2025." for i in range(n_events)]
+    metadatas = [{"id": f"evt-{i}", "title": f"Événement {i}", "city": "Paris"} for i in range(n_events)]
+    db = FAISS.from_embeddings(
+        [(t, stub_vector(t)) for t in texts], MistralEmbeddings(), metadatas=metadatas,
+        ids=[f"evt-{i}:0" for i in range(n_events)],
+    )
+    save_version(db, store_root)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def report(label, latencies, elapsed, errors):
+    n = len(latencies)
+    print(
+        f"{label:<12} n={n:<5} erreurs={errors:<4} "
+        f"p50={percentile(latencies, 50) * 1000:7.1f} ms  "
+        f"p95={percentile(latencies, 95) * 1000:7.1f} ms  "
+        f"moy={statistics.mean(latencies) * 1000:7.1f} ms  "
+        f"débit={n / elapsed:7.1f} req/s"
+    )
+
+
+def question_for(i, distinct=False):
+    question = QUESTIONS[i % len(QUESTIONS)]
+    return f"{question} (variante {i})" if distinct else question
+
+
+async def run_load(call, n_requests, concurrency, distinct=False):
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                await call(question_for(i, distinct))
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print("⚠️ Première erreur :", repr(e))
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    return latencies, time.perf_counter() - t0, errors
+
+
+def http_client(api_url, concurrency):
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    return httpx.AsyncClient(base_url=api_url, timeout=120, limits=limits)
+
+
+async def bench_async_api(api_url, n_requests, concurrency, distinct=False):
+    async with http_client(api_url, concurrency) as http:
+        async def call(question):
+            r = await http.post("/ask", json={"question": question})
+            r.raise_for_status()
+        return await run_load(call, n_requests, concurrency, distinct)
+
+
+async def bench_stream_api(api_url, n_requests, concurrency):
+    """/ask/stream : mesure le délai avant le premier token (TTFB) et la durée totale."""
+    ttfb = []
+    async with http_client(api_url, concurrency) as http:
+        async def call(question):
+            t0 = time.perf_counter()
+            first = None
+            async with http.stream("POST", "/ask/stream", json={"question": question}) as r:
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    if first is None and line.startswith("event: token"):
+                        first = time.perf_counter() - t0
+            ttfb.append(first if first is not None else time.perf_counter() - t0)
+        latencies, elapsed, errors = await run_load(call, n_requests, concurrency)
+    return latencies, elapsed, errors, ttfb
+
+
+async def bench_sync_path(n_requests, concurrency, threads=40):
+    """Ancien comportement : handler synchrone exécuté dans le threadpool (40 threads par défaut)."""
+    from concurrent.futures import ThreadPoolExecutor
+    from rag.chatbot import answer_question
+
+    pool = ThreadPoolExecutor(max_workers=threads)
+    loop = asyncio.get_running_loop()
+
+    async def call(question):
+        await loop.run_in_executor(pool, answer_question, question)
+
+    try:
+        return await run_load(call, n_requests, concurrency)
+    finally:
+        pool.shutdown(wait=False)
+
+
+async def bench_batch_api(api_url, n_questions):
+    """N questions : appels /ask successifs (comme les scripts d'évaluation) puis un seul /ask/batch."""
+    questions = [f"{QUESTIONS[i % len(QUESTIONS)]} (variante {i})" for i in range(n_questions)]
+    async with http_client(api_url, 1) as http:
+        t0 = time.perf_counter()
+        for question in questions:
+            (await http.post("/ask", json={"question": question})).raise_for_status()
+        sequential = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        r = await http.post("/ask/batch", json={"questions": [q + " (lot)" for q in questions]})
+        r.raise_for_status()
+        batch = time.perf_counter() - t0
+    errors = sum("error" in item for item in r.json()["results"])
+    return sequential, batch, errors
+
+
+async def run_all(args, api_url, stub):
+    if args.batch:
+        sequential, batch, errors = await bench_batch_api(api_url, args.batch)
+        print(f"{'/ask x' + str(args.batch):<12} {sequential:7.2f} s  débit={args.batch / sequential:7.1f} questions/s")
+        print(f"{'/ask/batch':<12} {batch:7.2f} s  débit={args.batch / batch:7.1f} questions/s  "
+              f"(x{sequential / batch:.1f}, erreurs={errors})")
+        return
+    embed_calls = stub.state.calls["embeddings"]
+    latencies, elapsed, errors = await bench_async_api(api_url, args.requests, args.concurrency, args.distinct)
+    report("async /ask", latencies, elapsed, errors)
+    embed_calls = stub.state.calls["embeddings"] - embed_calls
+    print(f"{'':<12} appels embeddings : {embed_calls} pour {args.requests} questions "
+          f"({args.requests / max(embed_calls, 1):.1f} questions par appel)")
+    if args.stream:
+        latencies, elapsed, errors, ttfb = await bench_stream_api(api_url, args.requests, args.concurrency)
+        report("stream total", latencies, elapsed, errors)
+        print(f"{'stream TTFB':<12} p50={percentile(ttfb, 50) * 1000:7.1f} ms  p95={percentile(ttfb, 95) * 1000:7.1f} ms")
+    if args.compare_sync:
+        latencies, elapsed, errors = await bench_sync_path(args.requests, args.concurrency)
+        report("sync (40 th)", latencies, elapsed, errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--chat-latency", type=float, default=0.8)
+    parser.add_argument("--compare-sync", action="store_true")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--batch", type=int, default=0, help="taille du lot comparé à N appels /ask successifs")
+    parser.add_argument("--distinct", action="store_true", help="questions toutes différentes")
+    args = parser.parse_args()
+
+    stub = create_app(args.embed_latency, args.chat_latency)
+    url, server = serve_in_thread(stub)
+    store_root = Path(tempfile.mkdtemp(prefix="bench_ask_"))
+    os.environ.update({
+        "MISTRAL_SERVER_URL": url,
+        "MISTRAL_API_KEY": "stub",
+        "FAISS_STORE_PATH": str(store_root),
+        "EMBED_CACHE": "0",
+    })
+    build_synthetic_store(store_root, args.events)
+
+    print(f"Bouchon Mistral : {url} (embed {args.embed_latency * 1000:.0f} ms, chat {args.chat_latency * 1000:.0f} ms)")
+    if args.batch:
+        print(f"Lot de {args.batch} questions, index de {args.events} chunks\n")
+    else:
+        print(f"{args.requests} requêtes, {args.concurrency} simultanées, index de {args.events} chunks\n")
+
+    from api.main import app
+    api_url, api_server = serve_in_thread(app)
+
+    asyncio.run(run_all(args, api_url, stub))
+    api_server.should_exit = True
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# scripts/bench_build.py
+"""
+Construction de l'index : ancienne construction en mémoire (tous les Documents, tous les chunks,
+tous les vecteurs en listes Python) vs construction en flux (stream_build). L'API d'embeddings
+est simulée (vecteurs de dimension 1024 comme mistral-embed, latence fixe par requête).
+Chaque mesure tourne dans un processus neuf : durée et pic de RSS au-dessus du processus importé.
+
+    python -m scripts.bench_build --events 20000 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from scripts.bench_events_format import rss_kb, synthetic_event
+
+DIM = 1024
+
+
+class SlowEmbeddingsAPI:
+    """Faux endpoint embeddings : vecteurs pseudo-aléatoires, `latency` secondes par requête."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.rng = np.random.default_rng(0)
+
+    def _response(self, inputs):
+        vectors = self.rng.random((len(inputs), DIM), dtype=np.float32)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=v.tolist()) for v in vectors])
+
+    def create(self, model, inputs):
+        time.sleep(self.latency)
+        return self._response(inputs)
+
+    async def create_async(self, model, inputs):
+        await asyncio.sleep(self.latency)
+        return self._response(inputs)
+
+
+def child(mode, path, latency):
+    from rag.embed_scheduler import EmbeddingScheduler
+    from rag.vector_pipe import MistralEmbeddings, _rebuild_in_memory, stream_build
+    from rag.index_store import new_version_dir
+
+    client = SimpleNamespace(embeddings=SlowEmbeddingsAPI(latency))
+    scheduler = EmbeddingScheduler(client, max_in_flight=2, requests_per_second=1000, show_progress=False)
+    embeddings = MistralEmbeddings(client=client, scheduler=scheduler)
+    store = Path(tempfile.mkdtemp(prefix="bench_build_store_"))
+
+    before = peak = rss_kb()
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.wait(0.005):
+            peak = max(peak, rss_kb())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    t0 = time.perf_counter()
+    stages = None
+    if mode == "memory":
+        _rebuild_in_memory(path, store, embeddings, None)
+    else:
+        stages = stream_build(path, new_version_dir(store), embeddings)["stages"]
+    elapsed = time.perf_counter() - t0
+    done.set()
+    sampler.join()
+    peak = max(peak, rss_kb())
+    print(json.dumps({"seconds": elapsed, "peak_mb": (peak - before) / 1024, "stages": stages}))
+
+
+def measure(mode, path, latency):
+    out = subprocess.run([sys.executable, "-m", "scripts.bench_build", "--child", mode, str(path),
+                          "--latency", str(latency)],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.05, help="latence simulée par requête (s)")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"))
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child[0], args.child[1], args.latency)
+
+    from rag.events_dataset import write_events
+
+    rng = random.Random(0)
+    path = Path(tempfile.mkdtemp(prefix="bench_build_")) / "events_clean.parquet"
+    write_events((synthetic_event(i, rng) for i in range(args.events)), path)
+
+    print(f"{args.events} événements, latence simulée {args.latency * 1000:.0f} ms / requête")
+    for mode in ("memory", "stream"):
+        result = measure(mode, path, args.latency)
+        print(f"{mode:<7} {result['seconds']:7.1f} s  pic RSS +{result['peak_mb']:7.1f} Mo")
+        for name, stage in (result["stages"] or {}).items():
+            print(f"        {name:<6} {stage['items']:>7} éléments  {stage['per_second'] or '-':>9} /s "
+                  f"(occupé {stage['busy_seconds']} s)")
+
+
+if __name__ == "__main__":
+    main()
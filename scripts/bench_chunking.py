@@ -0,0 +1,99 @@
+# scripts/bench_chunking.py
+"""
+Découpage des événements : ancien RecursiveCharacterTextSplitter(500, 50) vs découpage par
+événement (rag/chunking : événements courts entiers, coupes aux phrases, en-tête titre/dates/lieu
+sur le premier chunk, titre seul sur les suivants).
+
+Les événements sont reconstitués depuis les chunks d'un index au format pickle (--store ;
+les chevauchements de 50 caractères sont retirés). Mesures : nombre de vecteurs, volume à
+embedder (tokens estimés) et, avec une recherche BM25 sur les questions d'eval/eval_data.json
+(sans appel API), nombre d'événements distincts dans les k premiers résultats.
+
+    python -m scripts.bench_chunking --store data/faiss_store --k 10
+"""
+import argparse
+import json
+import pickle
+import statistics
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+from rag.bm25 import BM25Index, document_text
+from rag.chunking import chunk_documents
+from rag.index_store import current_store_path
+from rag.retrieval import collapse_by_event
+from rag.text_utils import estimate_tokens
+
+
+def merge(parts):
+    """Recolle des chunks consécutifs en retirant leur chevauchement."""
+    text = parts[0]
+    for part in parts[1:]:
+        overlap = next((n for n in range(min(len(text), len(part), 60), 0, -1) if text.endswith(part[:n])), 0)
+        text += ("" if overlap else " ") + part[overlap:]
+    return text
+
+
+def store_events(store):
+    with open(current_store_path(Path(store)) / "index.pkl", "rb") as f:
+        docstore, index_to_id = pickle.load(f)
+    by_event = {}
+    for row in range(len(index_to_id)):
+        doc = docstore._dict[index_to_id[row]]
+        by_event.setdefault(doc.metadata.get("id"), []).append(doc)
+    return [Document(page_content=merge([c.page_content for c in chunks]), metadata=chunks[0].metadata)
+            for chunks in by_event.values()]
+
+
+def recursive_chunks(docs):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    return splitter.split_documents(docs)
+
+
+def distinct_events(chunks, questions, k, collapse):
+    bm25 = BM25Index.build([document_text(c.metadata, c.page_content) for c in chunks])
+    counts = []
+    for question in questions:
+        rows = bm25.search(question, 30 if collapse else k)[0]
+        docs = [chunks[int(row)] for row in rows]
+        docs = collapse_by_event(docs, k) if collapse else docs[:k]
+        counts.append(len({d.metadata.get("id") for d in docs}))
+    return statistics.mean(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=str(ROOT / "data" / "faiss_store"))
+    parser.add_argument("--eval", default=str(ROOT / "eval" / "eval_data.json"))
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    docs = store_events(args.store)
+    questions = [c["question"] for c in json.loads(Path(args.eval).read_text(encoding="utf-8"))]
+    print(f"{len(docs)} événements, {len(questions)} questions, k={args.k}\n")
+
+    variants = {"recursive": recursive_chunks(docs), "event": chunk_documents(docs)[0]}
+    for name, chunks in variants.items():
+        tokens = sum(estimate_tokens(c.page_content) for c in chunks)
+        single = sum(1 for n in _chunks_per_event(chunks).values() if n == 1) / len(docs)
+        line = (f"{name:<10} {len(chunks):6d} vecteurs  {tokens:8d} tokens estimés  "
+                f"événements en un chunk {single:.0%}  "
+                f"distincts@{args.k} {distinct_events(chunks, questions, args.k, False):.1f}")
+        print(line + f"  (regroupés : {distinct_events(chunks, questions, args.k, True):.1f})")
+
+
+def _chunks_per_event(chunks):
+    counts = {}
+    for c in chunks:
+        counts[c.metadata.get("id")] = counts.get(c.metadata.get("id"), 0) + 1
+    return counts
+
+
+if __name__ == "__main__":
+    main()
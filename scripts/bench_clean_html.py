@@ -0,0 +1,117 @@
+# scripts/bench_clean_html.py
+"""
+Nettoyage HTML des descriptions longues : BeautifulSoup seul vs chemin rapide de clean_html
+(découpage par expressions régulières, repli BeautifulSoup sur les cas douteux).
+Vérifie l'égalité des textes produits sur chaque description, puis mesure le nettoyage
+de pages complètes dans les threads et dans un pool de processus.
+
+- --from-api N : N descriptions longdescription_fr réelles (réseau requis)
+- sinon : textes réels des chunks d'un index au format pickle (--store) remis en forme HTML comme sur
+  OpenAgenda (paragraphes, gras, liens, listes, entités)
+
+    python -m scripts.bench_clean_html --store data/faiss_store --processes 4
+"""
+import argparse
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from rag.ingest_openagenda import _fast_html_text, clean_html, clean_html_bs4, clean_page, fetch_events
+
+ENTITIES = {"é": "&eacute;", "è": "&egrave;", "à": "&agrave;", "'": "&#39;", "&": "&amp;", "’": "&rsquo;"}
+
+
+def htmlize(text, rng):
+    """Met un texte brut en forme HTML (structure typique des descriptions OpenAgenda)."""
+    sentences = [s.strip() for s in text.replace("\n", " ").split(". ") if s.strip()]
+    blocks = []
+    for i in range(0, len(sentences), 3):
+        words = ". ".join(sentences[i:i + 3]).split(" ")
+        if len(words) > 4:
+            j = rng.randrange(len(words) - 2)
+            words[j] = f"<strong>{words[j]}</strong>"
+        paragraph = " ".join(words)
+        if rng.random() < 0.3:
+            paragraph = "".join(ENTITIES.get(c, c) if rng.random() < 0.5 else c for c in paragraph)
+        blocks.append(f"<p>{paragraph}.</p>")
+    if rng.random() < 0.4:
+        blocks.append('<ul><li>Tarif&nbsp;: 10&#8364;</li><li>Réservation <a href="https://openagenda.com/'
+                      '?a=1&amp;b=2" target="_blank">en ligne</a></li></ul>')
+    if rng.random() < 0.2:
+        blocks.append("<p>Accès<br />Métro ligne 1<br>Bus 72</p>")
+    return "\n".join(blocks)
+
+
+def store_payloads(store, n):
+    """Textes des chunks (docstore pickle : seul index.pkl est nécessaire)."""
+    import pickle
+    from rag.index_store import current_store_path
+
+    with open(current_store_path(Path(store)) / "index.pkl", "rb") as f:
+        docstore, _ = pickle.load(f)
+    rng = random.Random(0)
+    return [htmlize(doc.page_content, rng) for doc in list(docstore._dict.values())[:n]]
+
+
+def api_payloads(n):
+    payloads, offset = [], 0
+    while len(payloads) < n:
+        results = fetch_events(limit=100, offset=offset).get("results", [])
+        if not results:
+            break
+        payloads += [r["longdescription_fr"] for r in results if r.get("longdescription_fr")]
+        offset += 100
+    return payloads[:n]
+
+
+def timed(fn, payloads, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for html in payloads:
+            fn(html)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=str(ROOT / "data" / "faiss_store"))
+    parser.add_argument("--from-api", type=int, default=0)
+    parser.add_argument("--payloads", type=int, default=5000)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    payloads = api_payloads(args.from_api) if args.from_api else store_payloads(args.store, args.payloads)
+    mismatches = sum(clean_html(h) != clean_html_bs4(h) for h in payloads)
+    fast_rate = sum(_fast_html_text(h) is not None for h in payloads) / len(payloads)
+    size = sum(len(h) for h in payloads) / len(payloads)
+    print(f"{len(payloads)} descriptions ({size:.0f} caractères en moyenne), "
+          f"chemin rapide {fast_rate:.1%}, différences avec BeautifulSoup : {mismatches}")
+
+    slow = timed(clean_html_bs4, payloads)
+    fast = timed(clean_html, payloads)
+    print(f"BeautifulSoup  {slow / len(payloads) * 1e6:8.1f} µs / description")
+    print(f"clean_html     {fast / len(payloads) * 1e6:8.1f} µs / description  (x{slow / fast:.1f})")
+
+    pages = [[{"uid": str(i), "longdescription_fr": h, "firstdate_begin": "2025-05-01T10:00:00+00:00"}
+              for i, h in enumerate(payloads[j:j + 100], j)] for j in range(0, len(payloads), 100)]
+    t0 = time.perf_counter()
+    inline = [clean_page(page) for page in pages]
+    inline_s = time.perf_counter() - t0
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        list(pool.map(clean_page, pages[:args.processes]))  # démarrage des processus
+        t0 = time.perf_counter()
+        pooled = list(pool.map(clean_page, pages))
+        pooled_s = time.perf_counter() - t0
+    assert pooled == inline
+    print(f"pages (clean_page) : threads {inline_s:.2f} s, {args.processes} processus {pooled_s:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
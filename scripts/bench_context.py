@@ -0,0 +1,73 @@
+# scripts/bench_context.py
+"""
+Contexte envoyé au LLM : ancien prompt "stuff" (10 chunks bruts, k de la requête ignoré) vs
+assemblage du contexte (un chunk par événement, k événements, budget de k chunks pleins, ou CONTEXT_TOKEN_BUDGET).
+
+Sans appel API : événements reconstitués depuis l'index pickle (cf. bench_chunking), recherche
+BM25 sur les questions d'eval/eval_data.json. Mesures : tokens estimés du prompt, événements
+distincts, et questions dont un événement pertinent (titre présent dans la réponse attendue,
+cf. bench_hybrid) figure dans le contexte.
+
+    python -m scripts.bench_context --store data/faiss_store --k 5
+"""
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from rag.bm25 import BM25Index, document_text
+from rag.chatbot import prompt
+from rag.chunking import chunk_documents
+from rag.context import format_context, pack_context
+from rag.retrieval import collapse_by_event
+from rag.text_utils import estimate_tokens
+from scripts.bench_chunking import recursive_chunks, store_events
+from scripts.bench_hybrid import is_relevant
+
+
+def measure(chunks, cases, select):
+    bm25 = BM25Index.build([document_text(c.metadata, c.page_content) for c in chunks])
+    tokens, events, hits = [], [], []
+    for case in cases:
+        ranked = [chunks[int(row)] for row in bm25.search(case["question"], 30)[0]]
+        docs, context = select(ranked)
+        tokens.append(estimate_tokens(prompt.format(question=case["question"], context=context)))
+        events.append(len({d.metadata.get("id") for d in docs}))
+        hits.append(any(is_relevant(d, case["ground_truth"]) for d in docs))
+    return statistics.mean(tokens), max(tokens), statistics.mean(events), sum(hits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=str(ROOT / "data" / "faiss_store"))
+    parser.add_argument("--eval", default=str(ROOT / "eval" / "eval_data.json"))
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = store_events(args.store)
+    cases = json.loads(Path(args.eval).read_text(encoding="utf-8"))
+    print(f"{len(docs)} événements, {len(cases)} questions\n")
+
+    def stuff(ranked):
+        return ranked[:10], format_context(ranked[:10])
+
+    def packed(ranked):
+        context = pack_context(collapse_by_event(ranked, args.k), args.k)
+        return context.docs, context.text
+
+    variants = {
+        "stuff k=10 (ancien)": (recursive_chunks(docs), stuff),
+        f"assemblé k={args.k}": (chunk_documents(docs)[0], packed),
+    }
+    for name, (chunks, select) in variants.items():
+        mean_tokens, max_tokens, events, hits = measure(chunks, cases, select)
+        print(f"{name:<20} prompt {mean_tokens:6.0f} tokens (max {max_tokens})  "
+              f"{events:4.1f} événements  pertinent présent {hits}/{len(cases)}")
+
+
+if __name__ == "__main__":
+    main()
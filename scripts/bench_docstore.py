@@ -0,0 +1,75 @@
+# scripts/bench_docstore.py
+"""
+Chargement de l'index : docstore pickle (index.pkl) vs SQLite (docstore.sqlite).
+
+Construit deux versions d'un même index synthétique puis, pour chaque format et
+dans un processus neuf, mesure le temps de chargement, la mémoire résidente
+ajoutée (RSS) et la latence d'une recherche k=10.
+
+    python -m scripts.bench_docstore --events 100000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+PROBE = r"""
+import json, sys, time
+import numpy as np
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * 4096 / 2**20
+
+from rag.docstore import load_faiss
+from rag.vector_pipe import MistralEmbeddings
+from scripts.mistral_stub import stub_vector
+
+before = rss_mb()
+t0 = time.perf_counter()
+db = load_faiss(sys.argv[1], MistralEmbeddings())
+load_s = time.perf_counter() - t0
+loaded = rss_mb()
+queries = [stub_vector(f"requête {i}") for i in range(50)]
+t0 = time.perf_counter()
+for q in queries:
+    db.similarity_search_with_score_by_vector(q, k=10)
+search_ms = (time.perf_counter() - t0) / len(queries) * 1000
+print(json.dumps({"load_s": load_s, "rss_mb": loaded - before, "search_ms": search_ms}))
+"""
+
+
+def probe(path):
+    out = subprocess.run([sys.executable, "-c", PROBE, str(path)], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100000)
+    args = parser.parse_args()
+
+    import rag.vector_pipe as vector_pipe
+    from scripts.bench_ask import build_synthetic_store
+
+    os.environ.setdefault("MISTRAL_API_KEY", "stub")
+    tmp = Path(tempfile.mkdtemp(prefix="bench_docstore_"))
+    results = {}
+    for backend in ("pickle", "sqlite"):
+        vector_pipe.DOCSTORE_BACKEND = backend
+        build_synthetic_store(tmp / backend, args.events)
+        path = vector_pipe.current_store_path(tmp / backend)
+        results[backend] = probe(path)
+        r = results[backend]
+        print(f"{backend:<7} chargement={r['load_s']:.2f}s  RSS+={r['rss_mb']:.0f} Mo  recherche k=10={r['search_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# scripts/bench_events_format.py
+"""
+Chargement des événements pour la construction de l'index : events_clean.json (JSONLoader + jq,
+fichier indenté) vs events_clean.parquet (lots de colonnes utiles). Chaque mesure tourne dans
+un processus neuf : durée de load_documents et pic de RSS au-dessus du processus déjà importé
+(Linux : RSS lu dans /proc/self/statm).
+
+    python -m scripts.bench_events_format --events 50000
+"""
+import argparse
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+WORDS = ("concert atelier exposition musique théâtre danse famille gratuit jardin patrimoine visite "
+         "spectacle cinéma conférence lecture enfants quartier festival scène artistes").split()
+
+
+def synthetic_event(i, rng):
+    long_description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(80, 400)))
+    title = f"Événement {i} " + " ".join(rng.choice(WORDS) for _ in range(3))
+    return {
+        "id": str(100000 + i),
+        "title": title,
+        "description": " ".join(rng.choice(WORDS) for _ in range(25)),
+        "long_description": long_description,
+        "keywords": rng.sample(WORDS, 3),
+        "city": "Paris",
+        "region": "Île-de-France",
+        "country": "FR",
+        "address": f"{i} rue de Rivoli 75001 Paris",
+        "coordinates": {"lon": 2.35, "lat": 48.85},
+        "date_start": f"2025-{i % 12 + 1:02d}-10T18:00:00+00:00",
+        "date_end": f"2025-{i % 12 + 1:02d}-10T20:00:00+00:00",
+        "url": f"https://openagenda.com/e/{100000 + i}",
+        "text_to_embed": f"{title}. {long_description}",
+    }
+
+
+def rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() // 1024
+
+
+def child(path):
+    """
+    Mesure exécutée dans un processus neuf : imports d'abord, puis chargement seul.
+    Pic échantillonné toutes les 5 ms (ru_maxrss est hérité du processus parent sous Linux).
+    """
+    from rag.vector_pipe import load_documents
+
+    before = peak = rss_kb()
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.wait(0.005):
+            peak = max(peak, rss_kb())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    t0 = time.perf_counter()
+    docs = load_documents(path)
+    elapsed = time.perf_counter() - t0
+    done.set()
+    sampler.join()
+    peak = max(peak, rss_kb())
+    print(json.dumps({"docs": len(docs), "seconds": elapsed, "peak_mb": (peak - before) / 1024}))
+
+
+def measure(path):
+    out = subprocess.run([sys.executable, "-m", "scripts.bench_events_format", "--child", str(path)],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--child")
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child)
+
+    from rag.events_dataset import write_events
+
+    rng = random.Random(0)
+    records = [synthetic_event(i, rng) for i in range(args.events)]
+    tmp = Path(tempfile.mkdtemp(prefix="bench_events_"))
+    json_path, parquet_path = tmp / "events_clean.json", tmp / "events_clean.parquet"
+    json_path.write_text(json.dumps(records, ensure_ascii=False, indent=2), encoding="utf-8")
+    write_events(records, parquet_path)
+    del records
+
+    print(f"{args.events} événements")
+    for name, path in (("json", json_path), ("parquet", parquet_path)):
+        result = measure(path)
+        print(f"{name:<8} fichier {path.stat().st_size / 1e6:7.1f} Mo  chargement {result['seconds']:6.2f} s  "
+              f"pic RSS +{result['peak_mb']:7.1f} Mo  ({result['docs']} documents)")
+
+
+if __name__ == "__main__":
+    main()
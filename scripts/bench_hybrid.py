@@ -0,0 +1,136 @@
+# scripts/bench_hybrid.py
+"""
+Recherche dense seule vs hybride (dense + BM25, fusion RRF).
+
+- Avec --store (index réel, MISTRAL_API_KEY requis pour embedder les questions) :
+  latence de la recherche (hors embedding) et métriques sur eval/eval_data.json :
+  hit@k, MRR et précision du contexte. Un chunk est jugé pertinent si au moins 60 %
+  des mots de son titre (2 mots minimum) figurent dans la réponse attendue.
+- Sans --store : corpus synthétique de --chunks chunks, latence seule.
+
+    python -m scripts.bench_hybrid --store data/faiss_store
+    python -m scripts.bench_hybrid --chunks 100000
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from rag.bm25 import BM25Index, tokenize
+from rag.docstore import load_faiss
+from rag.filters import MetadataIndex
+from rag.index_store import current_store_path
+from rag.retrieval import FilteredRetriever, documents_for_rows
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(p / 100 * (len(values) - 1)))]
+
+
+def is_relevant(doc, ground_truth):
+    title = set(tokenize(doc.metadata.get("title") or ""))
+    return len(title) >= 2 and len(title & set(tokenize(ground_truth))) >= 0.6 * len(title)
+
+
+def run(retriever, questions, vectors, k):
+    latencies, rankings = [], []
+    for question, vector in zip(questions, vectors):
+        t0 = time.perf_counter()
+        rows = retriever.ranked_rows(question, vector, k)
+        latencies.append(time.perf_counter() - t0)
+        rankings.append(rows)
+    return latencies, rankings
+
+
+def quality(db, rankings, ground_truths, k):
+    hits, reciprocal, precision = [], [], []
+    for rows, truth in zip(rankings, ground_truths):
+        relevant = [is_relevant(doc, truth) for doc in documents_for_rows(db, rows[:k]) if doc is not None]
+        first = relevant.index(True) + 1 if True in relevant else None
+        hits.append(first is not None)
+        reciprocal.append(1 / first if first else 0.0)
+        precision.append(sum(relevant) / k)
+    return statistics.mean(hits), statistics.mean(reciprocal), statistics.mean(precision)
+
+
+def synthetic_store(n_chunks):
+    """Index synthétique : textes tirés d'un vocabulaire, vecteurs du bouchon Mistral."""
+    from langchain_community.vectorstores import FAISS
+    from rag.vector_pipe import MistralEmbeddings, save_version
+    from scripts.mistral_stub import stub_vector
+
+    rng = np.random.default_rng(0)
+    vocab = [f"mot{i}" for i in range(20000)]
+    texts = [" ".join(rng.choice(vocab, 60)) for _ in range(n_chunks)]
+    root = Path(tempfile.mkdtemp(prefix="bench_hybrid_"))
+    db = FAISS.from_embeddings(
+        [(t, stub_vector(t)) for t in texts], MistralEmbeddings(),
+        metadatas=[{"id": str(i), "title": t[:30], "city": "Paris"} for i, t in enumerate(texts)],
+        ids=[f"{i}:0" for i in range(n_chunks)],
+    )
+    save_version(db, root)
+    questions = [" ".join(rng.choice(vocab, 6)) for _ in range(200)]
+    return current_store_path(root), questions, [stub_vector(q) for q in questions], None
+
+
+def real_store(store, eval_path):
+    from rag.vector_pipe import MistralEmbeddings
+
+    cases = json.loads(Path(eval_path).read_text(encoding="utf-8"))
+    questions = [c["question"] for c in cases]
+    vectors = MistralEmbeddings().embed_documents(questions)
+    return current_store_path(Path(store)), questions, vectors, [c["ground_truth"] for c in cases]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store")
+    parser.add_argument("--eval", default=str(ROOT / "eval" / "eval_data.json"))
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.store:
+        path, questions, vectors, truths = real_store(args.store, args.eval)
+    else:
+        import os
+        os.environ.setdefault("MISTRAL_API_KEY", "stub")
+        path, questions, vectors, truths = synthetic_store(args.chunks)
+
+    db = load_faiss(path, None)
+    meta, sparse = MetadataIndex.load(path), BM25Index.load(path)
+    if sparse is None:
+        sys.exit(f"Pas d'index BM25 dans {path} : reconstruire l'index (scripts/build_index.py)")
+    print(f"{db.index.ntotal} chunks, {len(questions)} questions, k={args.k}\n")
+
+    variants = {
+        "dense": FilteredRetriever(db=db, metadata_index=meta, k=args.k),
+        "hybride": FilteredRetriever(db=db, metadata_index=meta, sparse_index=sparse, k=args.k),
+    }
+    t0 = time.perf_counter()
+    for q in questions:
+        sparse.search(q, 30)
+    sparse_ms = (time.perf_counter() - t0) / len(questions) * 1000
+    for name, retriever in variants.items():
+        run(retriever, questions[:5], vectors[:5], args.k)  # chauffe
+        latencies, rankings = run(retriever, questions, vectors, args.k)
+        line = (f"{name:<8} p50={percentile(latencies, 50) * 1000:6.2f} ms  "
+                f"p95={percentile(latencies, 95) * 1000:6.2f} ms")
+        if truths:
+            hit, mrr, precision = quality(db, rankings, truths, args.k)
+            line += f"  hit@{args.k}={hit:.2f}  MRR={mrr:.3f}  précision contexte={precision:.3f}"
+        print(line)
+    print(f"\nrecherche BM25 seule : {sparse_ms:.2f} ms / requête")
+
+
+if __name__ == "__main__":
+    main()
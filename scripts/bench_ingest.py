@@ -0,0 +1,69 @@
+# scripts/bench_ingest.py
+"""
+Ingestion OpenAgenda contre le bouchon local (scripts/openagenda_stub.py) :
+boucle séquentielle d'origine (requests.get par page, tout en mémoire) vs pipeline
+parallèle en flux (session partagée, parts JSONL). Mesure la durée et le pic mémoire Python.
+
+    python -m scripts.bench_ingest --events 9000 --latency 0.05 --workers 8
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from rag.ingest_openagenda import export_events, extract_records, fetch_events, get_total, ingest
+from scripts.openagenda_stub import create_app, raw_event, serve_in_thread
+
+
+def sequential(url, page_size):
+    """Ancienne boucle du script : pages une par une, tous les enregistrements en mémoire."""
+    total = get_total(base_url=url)
+    records = []
+    for offset in range(0, total, page_size):
+        records.extend(extract_records(fetch_events(limit=page_size, offset=offset, base_url=url)))
+    return len(records)
+
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    app = create_app([raw_event(i) for i in range(args.events)], latency=args.latency)
+    url, _ = serve_in_thread(app)
+    url += "/records"
+    out = Path(tempfile.mkdtemp(prefix="bench_ingest_"))
+    try:
+        count, elapsed, peak = measure(lambda: sequential(url, args.page_size))
+        print(f"séquentiel        {count:>7} événements  {elapsed:6.2f} s  pic mémoire {peak:6.1f} Mo")
+        for workers in sorted({1, args.workers}):
+            shutil.rmtree(out / "parts", ignore_errors=True)
+            run = lambda: (ingest(out / "parts", page_size=args.page_size, workers=workers, base_url=url),
+                           export_events(out / "parts", out / "events_clean.json", out / "events_clean.csv"))[1]
+            count, elapsed, peak = measure(run)
+            print(f"flux {workers} worker(s) {count:>7} événements  {elapsed:6.2f} s  pic mémoire {peak:6.1f} Mo")
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# scripts/bench_local_embed.py
+"""
+Embeddings de questions en local (EMBED_BACKEND=local) : latence d'une question seule
+(p50/p95) puis débit de N questions simultanées, avec et sans regroupement par le
+thread d'inférence (BatchingEncoder).
+
+Avec sentence-transformers installé, le modèle LOCAL_EMBED_MODEL (LOCAL_EMBED_RUNTIME,
+LOCAL_EMBED_THREADS) est chargé. --simulate FIXE,PAR_TEXTE (ms) remplace le modèle par un
+coût d'inférence simulé (coût fixe par appel + coût par texte), pour mesurer le seul
+effet du regroupement.
+
+    python -m scripts.bench_local_embed --concurrency 64
+    python -m scripts.bench_local_embed --simulate 6,0.4 --concurrency 64
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from rag.local_embeddings import BatchingEncoder, LocalEmbeddings
+from scripts.bench_hybrid import percentile
+
+
+class SimulatedModel:
+    def __init__(self, fixed_ms, per_text_ms, dim=384):
+        self.fixed = fixed_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self.dim = dim
+
+    def encode(self, texts, **kwargs):
+        time.sleep(self.fixed + self.per_text * len(texts))
+        return np.zeros((len(texts), self.dim), dtype=np.float32)
+
+
+def concurrent_run(embed_one, questions, concurrency):
+    """Temps pour embedder `questions` avec `concurrency` threads clients."""
+    todo = list(questions)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not todo:
+                    return
+                question = todo.pop()
+            embed_one(question)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eval", default=str(ROOT / "eval" / "eval_data.json"))
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--simulate")
+    args = parser.parse_args()
+
+    model = None
+    if args.simulate:
+        fixed, per_text = (float(x) for x in args.simulate.split(","))
+        model = SimulatedModel(fixed, per_text)
+    embeddings = LocalEmbeddings(model=model)
+    base = [c["question"] for c in json.loads(Path(args.eval).read_text(encoding="utf-8"))]
+    questions = [f"{base[i % len(base)]} ({i})" for i in range(args.requests)]  # textes distincts
+
+    embeddings.embed_query(questions[0])  # chargement du modèle
+    latencies = []
+    for question in questions[:100]:
+        t0 = time.perf_counter()
+        embeddings.embed_query(question)
+        latencies.append(time.perf_counter() - t0)
+    print(f"{embeddings.model} ({'simulé' if model else embeddings.runtime})")
+    print(f"question seule : p50={percentile(latencies, 50) * 1000:.2f} ms  "
+          f"p95={percentile(latencies, 95) * 1000:.2f} ms  moyenne={statistics.mean(latencies) * 1000:.2f} ms\n")
+
+    lock = threading.Lock()
+
+    def unbatched(question):  # un appel au modèle par question (sans regroupement)
+        with lock:
+            embeddings._encode([question])
+
+    variants = {"sans regroupement": unbatched, "regroupé": embeddings.embed_query}
+    for name, embed_one in variants.items():
+        embeddings.engine = BatchingEncoder(embeddings._encode)
+        elapsed = concurrent_run(embed_one, questions, args.concurrency)
+        line = f"{name:<18} {len(questions) / elapsed:8.1f} questions/s"
+        if embeddings.engine.batches:
+            line += f"  (lots moyens de {embeddings.engine.stats()['mean_batch']})"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
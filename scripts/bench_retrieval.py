@@ -0,0 +1,210 @@
+# scripts/bench_retrieval.py
+"""
+Banc d'essai de la recherche seule (sans LLM, sans réseau) sur eval/eval_data.json.
+
+Les embeddings des questions sont lus dans un fichier enregistré une fois
+(--record, MISTRAL_API_KEY requis) : eval/query_embeddings.json. Pour chaque configuration
+du retriever (dense / hybride, avec ou sans filtres, avec ou sans regroupement par événement) :
+recall@k, MRR, événements distincts dans les k premiers et latence de la recherche
+(embedding exclu, lecture du docstore incluse) p50/p95/p99.
+
+Un événement est pertinent si son titre correspond à la réponse attendue (cf. bench_hybrid) ;
+les questions sans aucun événement pertinent dans l'index sont exclues de recall et MRR.
+Les résultats sont écrits en JSON (--out) ; --compare affiche l'écart avec un résultat précédent.
+
+    python -m scripts.bench_retrieval --record
+    python -m scripts.bench_retrieval --out eval/retrieval_bench.json --compare eval/retrieval_bench.prev.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from rag.bm25 import BM25Index
+from rag.docstore import iter_store_documents, load_faiss
+from rag.filters import MetadataIndex
+from rag.index_store import resolve_current
+from rag.retrieval import FilteredRetriever
+from scripts.bench_hybrid import is_relevant, percentile
+
+FIXTURE = ROOT / "eval" / "query_embeddings.json"
+METRICS = ("recall", "mrr", "distinct_events", "p50_ms", "p95_ms", "p99_ms")
+
+
+# --- Embeddings des questions (fichier enregistré) ---
+def record_fixture(questions, path=FIXTURE, embeddings=None):
+    """
+    Embedde les questions par le chemin des requêtes (aembed_queries, un appel groupé ;
+    sinon embed_query) et les écrit avec le modèle utilisé.
+    """
+    if embeddings is None:
+        from rag.vector_pipe import make_embeddings
+        embeddings = make_embeddings()
+    if hasattr(embeddings, "aembed_queries"):
+        vectors = asyncio.run(embeddings.aembed_queries(questions))
+    else:
+        vectors = [embeddings.embed_query(q) for q in questions]
+    payload = {"model": getattr(embeddings, "model", None), "vectors": dict(zip(questions, vectors))}
+    Path(path).write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    return payload
+
+
+def load_fixture(questions, path=FIXTURE):
+    """Vecteurs des questions, dans l'ordre ; erreur explicite si une question n'a pas été enregistrée."""
+    path = Path(path)
+    if not path.exists():
+        sys.exit(f"{path} absent : lancer d'abord python -m scripts.bench_retrieval --record")
+    vectors = json.loads(path.read_text(encoding="utf-8"))["vectors"]
+    missing = [q for q in questions if q not in vectors]
+    if missing:
+        sys.exit(f"{len(missing)} question(s) absente(s) de {path} (ex. {missing[0]!r}) : relancer --record")
+    return [vectors[q] for q in questions]
+
+
+# --- Mesures ---
+def relevant_events(db, ground_truths):
+    """Ensemble des événements pertinents de l'index pour chaque réponse attendue."""
+    events = {}
+    for doc in iter_store_documents(db):
+        if doc is not None:
+            events.setdefault(doc.metadata.get("id"), doc)
+    return [{event_id for event_id, doc in events.items() if is_relevant(doc, truth)} for truth in ground_truths]
+
+
+def event_ranking(docs):
+    """Identifiants d'événements dans l'ordre du classement (premier chunk de chacun)."""
+    seen = []
+    for doc in docs:
+        event_id = doc.metadata.get("id")
+        if event_id not in seen:
+            seen.append(event_id)
+    return seen
+
+
+def evaluate(retriever, questions, vectors, relevant, k, repeat=3):
+    """Métriques d'une configuration ; la latence est celle de retriever.search (répétée `repeat` fois)."""
+    for question, vector in zip(questions[:3], vectors[:3]):
+        retriever.search(question, vector, k)  # chauffe
+    latencies, rankings = [], []
+    for question, vector in zip(questions, vectors):
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            docs = retriever.search(question, vector, k)
+            latencies.append(time.perf_counter() - t0)
+        rankings.append(docs[:k])
+
+    recalls, reciprocal, per_question = [], [], []
+    for question, docs, expected in zip(questions, rankings, relevant):
+        events = event_ranking(docs)
+        found = [event_id in expected for event_id in events]
+        row = {"question": question, "events": events, "relevant": len(expected)}
+        if expected:
+            row["recall"] = sum(found) / len(expected)
+            row["rr"] = 1 / (found.index(True) + 1) if True in found else 0.0
+            recalls.append(row["recall"])
+            reciprocal.append(row["rr"])
+        per_question.append(row)
+
+    def mean(values):
+        return round(statistics.mean(values), 4) if values else None
+
+    return {
+        "recall": mean(recalls),
+        "mrr": mean(reciprocal),
+        "distinct_events": mean([len(row["events"]) for row in per_question]),
+        "labelled": len(recalls),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "questions": per_question,
+    }
+
+
+def configurations(db, meta, sparse, k):
+    """Configurations comparées ; "hybride+filtres" est celle du service."""
+    def retriever(sparse_index, use_filters, collapse=True):
+        return FilteredRetriever(db=db, metadata_index=meta, sparse_index=sparse_index,
+                                 use_filters=use_filters, collapse=collapse, k=k)
+
+    configs = {"dense": retriever(None, False), "dense+filtres": retriever(None, True)}
+    if sparse is not None:
+        configs.update({
+            "hybride": retriever(sparse, False),
+            "hybride+filtres": retriever(sparse, True),
+            "hybride+filtres sans regroupement": retriever(sparse, True, collapse=False),
+        })
+    return configs
+
+
+def run_suite(store, cases, vectors, k=5, repeat=3):
+    """Toutes les configurations sur l'index servi dans `store` ; résultat sérialisable en JSON."""
+    version, path = resolve_current(Path(store))
+    db = load_faiss(path, None)
+    meta, sparse = MetadataIndex.load(path), BM25Index.load(path)
+    questions = [c["question"] for c in cases]
+    relevant = relevant_events(db, [c["ground_truth"] for c in cases])
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "index_version": version,
+        "chunks": db.index.ntotal,
+        "k": k,
+        "questions": len(questions),
+        "configs": {name: evaluate(retriever, questions, vectors, relevant, k, repeat)
+                    for name, retriever in configurations(db, meta, sparse, k).items()},
+    }
+
+
+def compare(current, previous):
+    """Écart (courant - précédent) par configuration et métrique communes."""
+    deltas = {}
+    for name, metrics in current["configs"].items():
+        before = previous.get("configs", {}).get(name)
+        if before is None:
+            continue
+        deltas[name] = {m: round(metrics[m] - before[m], 4) for m in METRICS
+                        if metrics.get(m) is not None and before.get(m) is not None}
+    return deltas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=str(ROOT / "data" / "faiss_store"))
+    parser.add_argument("--eval", default=str(ROOT / "eval" / "eval_data.json"))
+    parser.add_argument("--fixture", default=str(FIXTURE))
+    parser.add_argument("--record", action="store_true", help="embedder les questions et écrire --fixture")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out")
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+
+    cases = json.loads(Path(args.eval).read_text(encoding="utf-8"))
+    questions = [c["question"] for c in cases]
+    if args.record:
+        record_fixture(questions, args.fixture)
+        print(f"✅ {len(questions)} embeddings de questions écrits dans {args.fixture}")
+        return
+
+    result = run_suite(args.store, cases, load_fixture(questions, args.fixture), args.k, args.repeat)
+    print(f"{result['chunks']} chunks (index {result['index_version']}), {result['questions']} questions, k={args.k}\n")
+    for name, m in result["configs"].items():
+        print(f"{name:<34} recall@{args.k}={m['recall']}  MRR={m['mrr']}  événements={m['distinct_events']}  "
+              f"p50={m['p50_ms']:.2f} ms  p95={m['p95_ms']:.2f} ms  p99={m['p99_ms']:.2f} ms")
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(f"\nÉcart avec {args.compare} ({previous.get('timestamp')}) :")
+        for name, delta in compare(result, previous).items():
+            print(f"{name:<34} " + "  ".join(f"{m}={v:+}" for m, v in delta.items()))
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# scripts/bench_startup.py
+"""
+Mesure du démarrage à froid de l'API.
+
+Lance `uvicorn api.main:app` dans un processus neuf, sur un index synthétique
+et un bouchon Mistral local, puis chronomètre :
+- l'import de api.main (processus Python séparé) ;
+- le délai avant la première réponse de /health (serveur joignable) ;
+- le délai avant que /ready renvoie 200 (index chargé, prêt à répondre).
+
+    python -m scripts.bench_startup --events 20000 --runs 3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from scripts.mistral_stub import create_app, free_port, serve_in_thread
+from scripts.bench_ask import build_synthetic_store
+
+
+def time_import(env):
+    code = "import time; t0 = time.perf_counter(); import api.main; print(time.perf_counter() - t0)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def time_server(env, timeout=120):
+    """Renvoie (secondes avant /health, secondes avant /ready=200)."""
+    import httpx
+
+    port = free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    health = ready = None
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                if health is None and httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                    health = time.perf_counter() - t0
+                if health is not None and httpx.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                    ready = time.perf_counter() - t0
+                    break
+            except httpx.TransportError:
+                pass
+            time.sleep(0.02)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return health, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    url, server = serve_in_thread(create_app())
+    store_root = Path(tempfile.mkdtemp(prefix="bench_startup_"))
+    env = dict(os.environ, MISTRAL_SERVER_URL=url, MISTRAL_API_KEY="stub",
+               FAISS_STORE_PATH=str(store_root), EMBED_CACHE="0")
+    os.environ.update(env)
+    build_synthetic_store(store_root, args.events)
+    print(f"Index synthétique de {args.events} chunks, {args.runs} démarrages\n")
+
+    imports, healths, readies = [], [], []
+    for _ in range(args.runs):
+        imports.append(time_import(env))
+        health, ready = time_server(env)
+        healths.append(health)
+        readies.append(ready)
+        print(f"import={imports[-1]:.2f}s  /health={health:.2f}s  /ready={ready:.2f}s")
+
+    print(
+        f"\nmédianes : import api.main {statistics.median(imports):.2f}s, "
+        f"/health {statistics.median(healths):.2f}s, /ready {statistics.median(readies):.2f}s"
+    )
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,25 @@
 # scripts/build_index.py
 import sys
+import argparse
 from pathlib import Path
 
 # Ajouter la racine du projet au PYTHONPATH
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(ROOT))
 
-from rag.vector_pipe import rebuild_faiss
+from rag.vector_pipe import rebuild_faiss, sync_faiss
 
 if __name__ == "__main__":
-    print("🔄 Lancement de la reconstruction de l’index FAISS...")
-    store_path = rebuild_faiss()
-    print(f"✅ Index FAISS reconstruit et sauvegardé dans {store_path}")
+    parser = argparse.ArgumentParser(description="Construit ou met à jour l’index FAISS")
+    parser.add_argument("--incremental", action="store_true",
+                        help="n’embedder que les événements nouveaux ou modifiés")
+    args = parser.parse_args()
+
+    if args.incremental:
+        print("🔄 Synchronisation incrémentale de l’index FAISS...")
+        sync_faiss()
+    else:
+        print("🔄 Lancement de la reconstruction de l’index FAISS...")
+        store_path = rebuild_faiss()
+        print(f"✅ Index FAISS reconstruit et sauvegardé dans {store_path}")
 
@@ -0,0 +1,124 @@
+# scripts/mistral_stub.py
+"""
+Bouchon local des endpoints Mistral utilisés par le RAG (embeddings + chat),
+avec une latence configurable. Sert aux benchmarks sans consommer de quota :
+
+    MISTRAL_SERVER_URL=http://127.0.0.1:<port> MISTRAL_API_KEY=stub ...
+"""
+import asyncio
+import hashlib
+import json
+import socket
+import threading
+import time
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+DIM = 1024  # dimension de mistral-embed
+
+
+def stub_vector(text, dim=DIM):
+    """Vecteur pseudo-aléatoire déterministe (normalisé) pour un texte."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+ANSWER = "Réponse simulée par le bouchon."
+
+
+def create_app(embed_latency=0.05, chat_latency=0.8, dim=DIM, first_token_latency=0.15):
+    app = FastAPI(title="Mistral stub")
+    app.state.calls = {"embeddings": 0, "chat": 0}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        app.state.calls["embeddings"] += 1
+        await asyncio.sleep(embed_latency)
+        inputs = body.get("input", body.get("inputs"))
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        return {
+            "id": "stub-emb",
+            "object": "list",
+            "model": body.get("model", "mistral-embed"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": stub_vector(t, dim)}
+                for i, t in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        app.state.calls["chat"] += 1
+        if body.get("stream"):
+            return StreamingResponse(stream_chat(body), media_type="text/event-stream")
+        await asyncio.sleep(chat_latency)
+        return {
+            "id": "stub-chat",
+            "object": "chat.completion",
+            "model": body.get("model", "stub"),
+            "created": int(time.time()),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": ANSWER},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 5, "total_tokens": 6},
+        }
+
+    async def stream_chat(body):
+        """Premier token après `first_token_latency`, le reste étalé jusqu'à `chat_latency`."""
+        tokens = [w + " " for w in ANSWER.split()]
+        await asyncio.sleep(first_token_latency)
+        step = max(0.0, chat_latency - first_token_latency) / len(tokens)
+        for i, token in enumerate(tokens):
+            chunk = {
+                "id": "stub-chat",
+                "object": "chat.completion.chunk",
+                "model": body.get("model", "stub"),
+                "created": int(time.time()),
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": token},
+                             "finish_reason": "stop" if i == len(tokens) - 1 else None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(step)
+        yield "data: [DONE]\n\n"
+
+    return app
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_thread(app, port=None):
+    """Démarre `app` avec uvicorn dans un thread ; renvoie (url, server)."""
+    import uvicorn
+
+    port = port or free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Bouchon local de l'API Mistral")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--chat-latency", type=float, default=0.8)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.embed_latency, args.chat_latency), host="127.0.0.1", port=args.port)
@@ -0,0 +1,116 @@
+# scripts/openagenda_stub.py
+"""
+Bouchon local de l'endpoint `records` de l'API OpenAgenda (explore v2.1), pour tester
+et mesurer l'ingestion sans réseau : pagination limit/offset, plafond offset + limit,
+latence et pannes (503) configurables par page.
+
+    python -m scripts.openagenda_stub --events 20000 --port 8901
+"""
+import asyncio
+import re
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+try:
+    from mistral_stub import serve_in_thread  # noqa: F401 (réexport pour les tests et benchmarks)
+except ImportError:
+    from scripts.mistral_stub import serve_in_thread  # noqa: F401
+
+MAX_WINDOW = 10_000  # l'API refuse offset + limit au-delà
+MAX_LIMIT = 100
+
+
+def raw_event(i, city="Paris", year="2025", region="Île-de-France"):
+    """
+    Enregistrement brut au format de l'API (champs *_fr, HTML dans la description longue) ;
+    dates de mise à jour réparties sur l'année.
+    """
+    month = i % 12 + 1
+    updated = datetime(int(year), 1, 1) + timedelta(minutes=(i * 7919) % (365 * 24 * 60))
+    return {
+        "uid": str(100000 + i),
+        "title_fr": f"Événement {i}",
+        "description_fr": f"Description courte {i} !",
+        "longdescription_fr": f"<p>Programme <b>détaillé</b> {i}</p><ul><li>atelier</li><li>concert</li></ul>",
+        "keywords_fr": ["concert", "atelier"] if i % 2 else None,
+        "location_city": city,
+        "location_region": region if i % 3 else None,
+        "location_countrycode": "FR",
+        "location_address": f"{i} rue de Rivoli",
+        "location_coordinates": {"lon": 2.35, "lat": 48.85},
+        "firstdate_begin": f"{year}-{month:02d}-10T18:00:00+00:00" if i % 10 else "2024-12-31T18:00:00+00:00",
+        "lastdate_end": f"{year}-{month:02d}-10T20:00:00+00:00",
+        "canonicalurl": f"https://openagenda.com/e/{100000 + i}",
+        "updatedat": updated.isoformat() + "+00:00",
+    }
+
+
+_WHERE_RE = re.compile(r"updatedat >= date'([^']+)' AND updatedat < date'([^']+)'", re.IGNORECASE)
+
+
+def _refine_value(refine, field):
+    for clause in refine:
+        m = re.fullmatch(rf'{field}:"(.*)"', clause)
+        if m:
+            return m.group(1)
+    return None
+
+
+def _matches(event, refine, where):
+    for field in ("location_city", "location_region"):
+        value = _refine_value(refine, field)
+        if value is not None and event.get(field) != value:
+            return False
+    updated = (event.get("updatedat") or "")[:19]
+    year = _refine_value(refine, "updatedat")
+    if year is not None and not updated.startswith(year):
+        return False
+    if where:
+        m = _WHERE_RE.fullmatch(where.strip())
+        if not m or not (m.group(1) <= updated < m.group(2)):
+            return False
+    return True
+
+
+def create_app(events=None, latency=0.0, failures=None, max_window=MAX_WINDOW):
+    """
+    `events` : enregistrements bruts servis, filtrés par ville, région (refine)
+    et fenêtre updatedat (where).
+    `failures` : {offset: nombre de réponses 503 avant succès} (-1 : toujours en échec).
+    `max_window` : plafond offset + limit (10 000 sur l'API réelle).
+    """
+    app = FastAPI(title="OpenAgenda stub")
+    app.state.events = list(events if events is not None else (raw_event(i) for i in range(250)))
+    app.state.failures = dict(failures or {})
+    app.state.calls = []
+
+    @app.get("/records")
+    async def records(limit: int = 10, offset: int = 0, refine: list[str] = Query(default=[]), where: str = ""):
+        app.state.calls.append(offset)
+        if latency:
+            await asyncio.sleep(latency)
+        if limit > MAX_LIMIT or offset + limit > max_window:
+            return JSONResponse({"error_code": "InvalidRESTParameterError"}, status_code=400)
+        remaining = app.state.failures.get(offset, 0) if limit else 0
+        if remaining:
+            app.state.failures[offset] = remaining - 1 if remaining > 0 else remaining
+            return JSONResponse({"error_code": "ServiceUnavailable"}, status_code=503)
+        matching = [e for e in app.state.events if _matches(e, refine, where)]
+        return {"total_count": len(matching), "results": matching[offset:offset + limit]}
+
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Bouchon local de l'API OpenAgenda")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    app = create_app([raw_event(i) for i in range(args.events)], latency=args.latency)
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -0,0 +1,111 @@
+import hashlib
+import json
+from types import SimpleNamespace
+
+import pytest
+
+
+class HashEmbeddingsAPI:
+    """Faux endpoint embeddings déterministe : vecteur dérivé du hash du texte."""
+
+    dim = 8
+
+    def __init__(self):
+        self.calls = []
+
+    @classmethod
+    def vector(cls, text):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [b / 255.0 for b in digest[:cls.dim]]
+
+    def create(self, model, inputs):
+        self.calls.append(list(inputs))
+        data = [SimpleNamespace(embedding=self.vector(t)) for t in inputs]
+        return SimpleNamespace(data=data)
+
+    async def create_async(self, model, inputs):
+        return self.create(model, inputs)
+
+
+class FakeChatAPI:
+    """Faux endpoint chat : réponse fixe, en un bloc ou token par token."""
+
+    answer = "Réponse de test."
+
+    def __init__(self):
+        self.calls = 0
+
+    def _response(self):
+        self.calls += 1
+        message = SimpleNamespace(content=self.answer)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def complete(self, model, messages):
+        return self._response()
+
+    async def complete_async(self, model, messages):
+        return self._response()
+
+    async def stream_async(self, model, messages):
+        self.calls += 1
+
+        async def events():
+            for word in self.answer.split():
+                delta = SimpleNamespace(content=word + " ")
+                yield SimpleNamespace(data=SimpleNamespace(choices=[SimpleNamespace(delta=delta)]))
+
+        return events()
+
+
+def make_event(event_id, title, description="", **extra):
+    record = {
+        "id": event_id,
+        "title": title,
+        "url": f"https://openagenda.com/e/{event_id}",
+        "date_start": "2025-04-06T15:30:00+00:00",
+        "date_end": "2025-04-06T17:00:00+00:00",
+        "city": "Paris",
+        "region": "Île-de-France",
+        "keywords": ["concert"],
+        "text_to_embed": f"{title}. {description}".strip(),
+    }
+    record.update(extra)
+    return record
+
+
+def chunk_text(record, n=0):
+    """Texte indexé du n-ième chunk d'un événement (requête exacte pour les faux embeddings)."""
+    from langchain_core.documents import Document
+    from rag.chunking import chunk_event
+    from rag.vector_pipe import metadata_extractor
+
+    doc = Document(page_content=record["text_to_embed"], metadata=metadata_extractor(record, {}))
+    return chunk_event(doc)[n]
+
+
+@pytest.fixture
+def hash_embeddings():
+    """MistralEmbeddings branché sur le faux client (sans cache, sans quota)."""
+    from rag.embed_scheduler import EmbeddingScheduler
+    from rag.vector_pipe import MistralEmbeddings
+
+    client = SimpleNamespace(embeddings=HashEmbeddingsAPI())
+    scheduler = EmbeddingScheduler(client, requests_per_second=1000, show_progress=False)
+    return MistralEmbeddings(client=client, scheduler=scheduler)
+
+
+@pytest.fixture
+def fake_chat_client():
+    return SimpleNamespace(chat=FakeChatAPI())
+
+
+@pytest.fixture
+def events_file(tmp_path):
+    """Écrit une liste d'événements au format events_clean.json et renvoie son chemin."""
+    path = tmp_path / "events_clean.json"
+
+    def write(records):
+        path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+        return path
+
+    return write
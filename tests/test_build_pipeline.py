@@ -0,0 +1,115 @@
+import json
+import threading
+from itertools import count
+
+import numpy as np
+import pytest
+
+import rag.docstore
+import rag.vector_pipe
+from rag.bm25 import BM25Index
+from rag.build_pipeline import run_pipeline
+from rag.docstore import SQLiteDocstore, load_faiss
+from rag.events_dataset import write_events
+from rag.filters import MetadataIndex
+from rag.index_store import current_store_path
+from rag.vector_pipe import load_documents, rebuild_faiss, split_documents
+from conftest import HashEmbeddingsAPI, chunk_text, make_event
+
+LONG = "Un très long programme de concerts et d'ateliers. " * 40  # plusieurs chunks
+
+
+def test_pipeline_ordre_et_debits():
+    seen = []
+    stats, _ = run_pipeline(range(10), [("double", lambda b: [x * 2 for x in b])], seen.extend,
+                            batch_size=3, queue_depth=1)
+    assert seen == [x * 2 for x in range(10)]
+    assert stats["load"]["batches"] == 4 and stats["index"]["items"] == 10
+
+
+def test_pipeline_erreur_arrete_tous_les_etages():
+    def boom(batch):
+        if batch[0] >= 4:
+            raise ValueError("échec embedding")
+        return batch
+
+    with pytest.raises(ValueError, match="échec embedding"):
+        # source infinie : le chargement doit s'arrêter avec le reste du pipeline
+        run_pipeline(count(), [("embed", boom)], lambda b: None, batch_size=2, queue_depth=1)
+    run_pipeline(range(0), [("embed", boom)], lambda b: None)
+    assert not [t for t in threading.enumerate() if t.name.startswith("build-")]
+
+
+def test_reconstruction_en_flux_identique(tmp_path, hash_embeddings):
+    records = [make_event(str(i), f"Événement {i}", LONG if i % 3 == 0 else "court") for i in range(20)]
+    records.append(make_event("5", "Événement 5 modifié"))  # doublon : la dernière version l'emporte
+    path = tmp_path / "events_clean.parquet"
+    write_events(records, path, batch_rows=4)
+
+    store = tmp_path / "faiss_store"
+    version = rebuild_faiss(path, store, hash_embeddings)
+    chunks, ids = split_documents(load_documents(path))
+
+    db = load_faiss(current_store_path(store), hash_embeddings)
+    # mêmes chunks et mêmes vecteurs que l'ancienne construction en mémoire (l'ordre des rangs
+    # peut différer : un événement dédupliqué est indexé à sa dernière occurrence)
+    stored = [db.index_to_docstore_id[row] for row in range(db.index.ntotal)]
+    assert sorted(stored) == sorted(ids)
+    expected = {i: HashEmbeddingsAPI.vector(c.page_content) for i, c in zip(ids, chunks)}
+    vectors = db.index.reconstruct_n(0, db.index.ntotal)
+    assert np.allclose(vectors, np.array([expected[i] for i in stored], dtype=np.float32))
+    assert db.similarity_search(chunk_text(records[-1]), k=1)[0].metadata["id"] == "5"
+
+    stats = json.loads((version / "build_stats.json").read_text(encoding="utf-8"))
+    assert stats["events"] == 20 and stats["stages"]["index"]["items"] == len(ids)
+
+
+def test_reconstruction_en_flux_echec_sans_version(tmp_path, hash_embeddings, monkeypatch):
+    path = tmp_path / "events_clean.parquet"
+    write_events([make_event(str(i), f"Événement {i}") for i in range(5)], path)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("API indisponible")
+
+    monkeypatch.setattr(hash_embeddings, "embed_documents", fail)
+    store = tmp_path / "faiss_store"
+    with pytest.raises(RuntimeError, match="API indisponible"):
+        rebuild_faiss(path, store, hash_embeddings)
+    assert not any(store.glob("*/*"))  # dossier de version retiré
+
+
+def test_reconstruction_en_flux_ne_materialise_pas_le_corpus(tmp_path, hash_embeddings, monkeypatch):
+    records = [make_event(str(i), f"Concert gratuit {i}", LONG if i % 4 == 0 else "en famille",
+                          keywords=["jazz"]) for i in range(30)]
+    path = tmp_path / "events_clean.parquet"
+    write_events(records, path, batch_rows=4)
+
+    def forbidden(*args, **kwargs):
+        raise AssertionError("corpus entier chargé en mémoire")
+
+    # ni chargement complet des événements, ni relecture complète du docstore pour les index annexes
+    monkeypatch.setattr(rag.vector_pipe, "load_documents", forbidden)
+    monkeypatch.setattr(rag.docstore, "iter_store_documents", forbidden)
+    monkeypatch.setattr(SQLiteDocstore, "iter_documents", forbidden)
+    monkeypatch.setattr(SQLiteDocstore, "to_memory", forbidden)
+    pipeline = rag.vector_pipe.run_pipeline
+    monkeypatch.setattr(rag.vector_pipe, "run_pipeline",
+                        lambda *args, **kwargs: pipeline(*args, **{**kwargs, "batch_size": 4}))
+    seen = []
+    sink = rag.vector_pipe.DocstoreWriter.add
+    monkeypatch.setattr(rag.vector_pipe.DocstoreWriter, "add",
+                        lambda self, ids, chunks: (seen.append(len(chunks)), sink(self, ids, chunks)))
+    store = tmp_path / "faiss_store"
+    rebuild_faiss(path, store, hash_embeddings)
+    monkeypatch.undo()
+    assert len(seen) > 1 and max(seen) < sum(seen)  # écrit lot par lot
+
+    # index annexes identiques à ceux reconstruits depuis le docstore
+    version = current_store_path(store)
+    db = load_faiss(version, hash_embeddings)
+    meta, expected_meta = MetadataIndex.load(version), MetadataIndex.from_store(db)
+    assert np.array_equal(meta.start, expected_meta.start) and np.array_equal(meta.free, expected_meta.free)
+    assert list(meta.keywords) == expected_meta.keywords
+    assert np.array_equal(meta.keyword_rows, expected_meta.keyword_rows)
+    sparse, expected_sparse = BM25Index.load(version), BM25Index.from_store(db)
+    assert list(sparse.vocab) == expected_sparse.vocab and np.allclose(sparse.weights, expected_sparse.weights)
@@ -0,0 +1,68 @@
+from langchain_core.documents import Document
+
+from rag.chunking import chunk_event, event_header
+from rag.docstore import load_faiss
+from rag.index_store import current_store_path
+from rag.retrieval import FilteredRetriever
+from rag.vector_pipe import metadata_extractor, rebuild_faiss, sync_faiss
+from conftest import chunk_text, make_event
+
+SENTENCES = [f"Phrase numéro {i} du programme, avec quelques détails sur la soirée." for i in range(60)]
+
+
+def document(record):
+    return Document(page_content=record["text_to_embed"], metadata=metadata_extractor(record, {}))
+
+
+def test_evenement_court_garde_entier_avec_en_tete():
+    record = make_event("a", "Hommage à Beethoven", "Récital de piano.", date_start=1743955200000)
+    assert event_header(document(record).metadata) == "Hommage à Beethoven — 6 avril 2025 — Paris"
+    assert chunk_event(document(record)) == [
+        "Hommage à Beethoven — 6 avril 2025 — Paris\nRécital de piano."
+    ]
+    multi_day = make_event("b", "Festival", date_end="2025-04-08T17:00:00+00:00")
+    assert "du 6 au 8 avril 2025" in chunk_event(document(multi_day))[0]
+    long_run = make_event("c", "Exposition", date_end="2026-01-04T17:00:00+00:00")
+    assert "du 6 avril 2025 au 4 janvier 2026" in chunk_event(document(long_run))[0]
+
+
+def test_description_longue_coupee_aux_phrases():
+    record = make_event("a", "Concert de l'Ensemble Marani", " ".join(SENTENCES))
+    chunks = chunk_event(document(record), max_chars=500)
+    header = event_header(document(record).metadata)
+    title = "Concert de l'Ensemble Marani"
+
+    assert len(chunks) > 1 and all(len(c) <= 500 for c in chunks)
+    # en-tête complet sur le premier chunk, titre seul ensuite (dates et lieu non répétés)
+    assert chunks[0].startswith(header + "\n")
+    assert all(c.startswith(title + "\n") for c in chunks[1:])
+    bodies = [chunks[0][len(header) + 1:]] + [c[len(title) + 1:] for c in chunks[1:]]
+    assert all(b.startswith("Phrase") and b.endswith("soirée.") for b in bodies)
+    assert " ".join(bodies) == " ".join(SENTENCES)  # ni perte ni recouvrement
+
+
+def test_resultats_regroupes_par_evenement(tmp_path, events_file, hash_embeddings):
+    long_event = make_event("long", "Concert de l'Ensemble Marani", " ".join(SENTENCES))
+    events = [long_event] + [make_event(str(i), f"Atelier {i}") for i in range(5)]
+    store = tmp_path / "faiss_store"
+    rebuild_faiss(events_file(events), store, hash_embeddings)
+    db = load_faiss(current_store_path(store), hash_embeddings)
+    assert db.index.ntotal > len(events)
+
+    vector = hash_embeddings.embed_query(chunk_text(long_event))
+    docs = FilteredRetriever(db=db, k=4).search("Marani", vector)
+    assert docs[0].metadata["id"] == "long"
+    assert len(docs) == 4 and len({d.metadata["id"] for d in docs}) == 4
+    raw = FilteredRetriever(db=db, k=4, collapse=False).search("Marani", vector)
+    assert len(raw) == 4
+
+
+def test_sync_reconstruit_si_le_decoupage_change(tmp_path, events_file, hash_embeddings, monkeypatch):
+    import rag.vector_pipe as vector_pipe
+
+    store = tmp_path / "faiss_store"
+    path = events_file([make_event("a", "Concert")])
+    rebuild_faiss(path, store, hash_embeddings)
+    assert sync_faiss(path, store, hash_embeddings)["mode"] == "incremental"
+    monkeypatch.setattr(vector_pipe, "CHUNKER_VERSION", "event-2")
+    assert sync_faiss(path, store, hash_embeddings)["mode"] == "full"
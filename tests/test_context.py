@@ -0,0 +1,54 @@
+from langchain_core.documents import Document
+
+from rag.chatbot import RagService
+from rag.context import pack_context, truncate_to_tokens
+from rag.text_utils import estimate_tokens
+from rag.vector_pipe import rebuild_faiss
+from conftest import make_event
+
+
+def doc(event_id, text):
+    return Document(page_content=text, metadata={"id": event_id})
+
+
+def test_un_chunk_par_evenement_dans_l_ordre_et_k_respecte():
+    docs = [doc("a", "A1"), doc("a", "A2"), doc("b", "B1"), doc("c", "C1"), doc("d", "D1")]
+    packed = pack_context(docs, k=3, budget=1000)
+    assert [d.page_content for d in packed.docs] == ["A1", "B1", "C1"]
+    assert packed.text == "A1\n\nB1\n\nC1"
+    assert packed.stats()["kept"] == 3 and packed.tokens <= 1000
+
+
+def test_budget_tronque_a_une_fin_de_phrase():
+    long_text = "Première phrase du programme. " * 40
+    docs = [doc("a", "Court."), doc("b", long_text), doc("c", "Jamais envoyé.")]
+    packed = pack_context(docs, k=5, budget=200, min_tokens=20)
+    assert [d.metadata["id"] for d in packed.docs] == ["a", "b"]
+    assert packed.texts[1].endswith("programme. …") and packed.truncated == 1
+    assert estimate_tokens(packed.text) <= 200
+
+    # reste trop petit : l'extrait est écarté, mais le premier document est toujours gardé
+    assert [d.metadata["id"] for d in pack_context(docs, k=5, budget=30, min_tokens=60).docs] == ["a"]
+    first = pack_context([doc("b", long_text)], k=5, budget=50, min_tokens=60)
+    assert len(first.docs) == 1 and estimate_tokens(first.text) <= 60
+    assert truncate_to_tokens("court", 10) == "court"
+
+
+def test_service_respecte_k(tmp_path, events_file, hash_embeddings, fake_chat_client):
+    store = tmp_path / "faiss_store"
+    events = [make_event(str(i), f"Concert {i}") for i in range(4)]
+    rebuild_faiss(events_file(events), store, hash_embeddings)
+    service = RagService(store, embeddings=hash_embeddings, chat_client=fake_chat_client)
+    assert len(service.answer("Concert", k=1)[1]) == 1
+    assert len(service.answer("Concert", k=3)[1]) == 3
+
+
+def test_budget_par_defaut_loge_k_chunks_pleins():
+    """k=5 chunks de CHUNK_MAX_CHARS caractères : aucun n'est écarté ni tronqué par le budget par défaut"""
+    from rag.chunking import CHUNK_MAX_CHARS
+
+    docs = [doc(str(i), ("Phrase du programme. " * 100)[:CHUNK_MAX_CHARS - 1] + ".") for i in range(6)]
+    assert all(len(d.page_content) == CHUNK_MAX_CHARS for d in docs)
+    packed = pack_context(docs, k=5)
+    assert len(packed.docs) == 5 and packed.truncated == 0
+    assert len(pack_context(docs, k=2).docs) == 2  # le budget suit k
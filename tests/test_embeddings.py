@@ -0,0 +1,283 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from rag.embed_scheduler import EmbeddingScheduler, make_batches
+from rag.rate_limit import TokenBucket
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class FakeEmbeddingsAPI:
+    """Faux endpoint embeddings : vecteur = [longueur du texte, position dans le batch]."""
+
+    def __init__(self, fail_first=0, latency=0.0):
+        self.calls = []
+        self.fail_first = fail_first
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, inputs):
+        with self._lock:
+            self.calls.append(list(inputs))
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                raise RateLimited("Status 429: capacity exceeded")
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        data = [SimpleNamespace(embedding=[float(len(t)), float(i)]) for i, t in enumerate(inputs)]
+        return SimpleNamespace(data=data)
+
+
+def fake_client(**kwargs):
+    return SimpleNamespace(embeddings=FakeEmbeddingsAPI(**kwargs))
+
+
+def test_make_batches_respecte_budget_tokens():
+    """Les batches respectent le budget de tokens et couvrent tous les textes"""
+    texts = ["x" * 300] * 10  # ~101 tokens chacun
+    batches = make_batches(texts, max_batch_tokens=250, max_batch_size=100)
+    assert [len(b[1]) for b in batches] == [2, 2, 2, 2, 2]
+    assert [b[0] for b in batches] == [0, 2, 4, 6, 8]
+
+
+def test_scheduler_ordre_et_parallelisme():
+    """Les résultats reviennent dans l'ordre d'entrée malgré l'exécution parallèle"""
+    client = fake_client(latency=0.02)
+    scheduler = EmbeddingScheduler(
+        client, max_in_flight=4, requests_per_second=1000,
+        max_batch_size=3, show_progress=False,
+    )
+    texts = ["a" * n for n in range(1, 31)]
+    vectors = scheduler.embed(texts)
+    assert [v[0] for v in vectors] == [float(n) for n in range(1, 31)]
+    assert len(client.embeddings.calls) == 10
+    assert client.embeddings.max_in_flight > 1
+
+
+def test_scheduler_retry_sur_429():
+    """Un 429 est retenté avec backoff puis le batch aboutit"""
+    client = fake_client(fail_first=2)
+    sleeps = []
+    scheduler = EmbeddingScheduler(
+        client, max_in_flight=1, requests_per_second=1000,
+        base_backoff=0.001, sleep=lambda s: sleeps.append(s), show_progress=False,
+    )
+    vectors = scheduler.embed(["bonjour", "paris"])
+    assert len(vectors) == 2
+    assert scheduler.retries == 2
+
+
+def test_scheduler_erreur_non_retentee():
+    """Une erreur autre qu'un 429 est propagée immédiatement"""
+    client = SimpleNamespace(embeddings=SimpleNamespace(create=lambda **kw: 1 / 0))
+    scheduler = EmbeddingScheduler(client, requests_per_second=1000, show_progress=False)
+    with pytest.raises(ZeroDivisionError):
+        scheduler.embed(["a"])
+
+
+def test_token_bucket_limite_le_debit():
+    """Le token bucket impose le débit configuré"""
+    now = [0.0]
+    bucket = TokenBucket(rate=2, capacity=1, clock=lambda: now[0],
+                         sleep=lambda s: now.__setitem__(0, now[0] + s))
+    for _ in range(5):
+        bucket.acquire()
+    assert now[0] == pytest.approx(2.0)
+
+
+def test_cache_embeddings_evite_les_appels(tmp_path):
+    """Un second passage sans changement ne fait aucun appel ; seul le texte modifié est recalculé"""
+    from rag.embed_cache import EmbeddingCache
+    from rag.vector_pipe import MistralEmbeddings
+
+    client = fake_client()
+    scheduler = EmbeddingScheduler(client, requests_per_second=1000, show_progress=False)
+    emb = MistralEmbeddings(client=client, scheduler=scheduler,
+                            cache=EmbeddingCache(tmp_path / "cache.sqlite"))
+
+    texts = ["Concert jazz", "Expo  photo", "Atelier BD"]
+    first = emb.embed_documents(texts)
+    n_calls = len(client.embeddings.calls)
+
+    # Même contenu (espaces normalisés) -> aucun appel
+    again = emb.embed_documents(["Concert jazz", "Expo photo ", "Atelier BD"])
+    assert len(client.embeddings.calls) == n_calls
+    assert again == first
+
+    # Un seul texte modifié -> un seul texte envoyé
+    emb.embed_documents(["Concert jazz", "Expo photo", "Atelier manga"])
+    assert client.embeddings.calls[-1] == ["Atelier manga"]
+
+    # Le cache survit à la réouverture
+    reopened = EmbeddingCache(tmp_path / "cache.sqlite")
+    assert len(reopened) == 4
+
+
+def test_upstream_limiter_borne_la_concurrence_et_timeout():
+    """Le limiteur async borne les appels simultanés et lève TimeoutError"""
+    import asyncio
+    from rag.rate_limit import UpstreamLimiter
+
+    limiter = UpstreamLimiter("stub", max_concurrency=3, timeout=0.2)
+    peak = {"now": 0, "max": 0}
+
+    async def call(delay):
+        peak["now"] += 1
+        peak["max"] = max(peak["max"], peak["now"])
+        await asyncio.sleep(delay)
+        peak["now"] -= 1
+        return delay
+
+    async def scenario():
+        results = await asyncio.gather(*(limiter.run(call, 0.01) for _ in range(10)))
+        assert results == [0.01] * 10
+        with pytest.raises(TimeoutError):
+            await limiter.run(call, 1.0)
+
+    asyncio.run(scenario())
+    assert peak["max"] == 3
+    assert limiter.timeouts == 1
+
+
+def test_cache_embeddings_questions():
+    """Les questions identiques après normalisation ne refont pas d'appel réseau"""
+    from rag.query_cache import LRUCache
+    from rag.vector_pipe import MistralEmbeddings
+
+    client = fake_client()
+    cache = LRUCache(maxsize=2, ttl=60)
+    emb = MistralEmbeddings(client=client, query_cache=cache)
+
+    emb.embed_query("Concerts jazz mai 2025 ?")
+    emb.embed_query("concerts  jazz mai 2025")
+    assert len(client.embeddings.calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    # Éviction LRU au-delà de maxsize
+    emb.embed_query("expo photo")
+    emb.embed_query("atelier bd")
+    emb.embed_query("concerts jazz mai 2025")
+    assert len(client.embeddings.calls) == 4
+
+
+def test_lru_ttl_expire():
+    """Une entrée expirée est recalculée"""
+    from rag.query_cache import LRUCache
+
+    now = [0.0]
+    cache = LRUCache(maxsize=10, ttl=5, clock=lambda: now[0])
+    cache.put("q", [1.0])
+    assert cache.get("q") == [1.0]
+    now[0] = 6.0
+    assert cache.get("q") is None
+
+
+def test_cache_semantique_seuil_et_version():
+    """Le cache sémantique sert une question proche tant que l'index n'a pas changé"""
+    from rag.query_cache import SemanticAnswerCache
+
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store([1.0, 0.0, 0.1], ("réponse", []), version="v1")
+    assert cache.lookup([1.0, 0.0, 0.12], version="v1") == ("réponse", [])
+    assert cache.lookup([0.0, 1.0, 0.0], version="v1") is None    # trop éloignée
+    assert cache.lookup([1.0, 0.0, 0.1], version="v2") is None     # index reconstruit
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_cache_semantique_emplacements_reutilises():
+    from rag.query_cache import SemanticAnswerCache
+
+    cache = SemanticAnswerCache(threshold=0.99, maxsize=3)
+    vectors = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0], [1.0, 1.0, 0.0]]
+    for i, vector in enumerate(vectors[:3]):
+        cache.store(vector, f"r{i}", version="v1")
+    assert cache.lookup(vectors[0], version="v1") == "r0"  # r0 redevient la plus récente
+    cache.store(vectors[3], "r3", version="v1")              # prend l'emplacement de r1
+    assert cache._matrix.shape == (3, 3) and cache.stats()["size"] == 3
+    assert cache.lookup(vectors[1], version="v1") is None
+    assert [cache.lookup(vectors[i], version="v1") for i in (0, 2, 3)] == ["r0", "r2", "r3"]
+    cache.clear()
+    assert cache.lookup(vectors[0], version="v1") is None and cache.stats()["size"] == 0
+
+
+def test_questions_simultanees_regroupees_en_un_appel(hash_embeddings):
+    """/ask simultanés : un seul embeddings.create pour toutes les questions de la fenêtre"""
+    import asyncio
+    from conftest import HashEmbeddingsAPI
+
+    api = hash_embeddings.client.embeddings
+    questions = [f"question {i}" for i in range(30)] + ["Question 0 ?"]
+
+    async def scenario():
+        return await asyncio.gather(*(hash_embeddings.aembed_query(q) for q in questions))
+
+    vectors = asyncio.run(scenario())
+    assert len(api.calls) == 1 and len(api.calls[0]) == 30  # "Question 0 ?" == "question 0"
+    assert vectors[:30] == [HashEmbeddingsAPI.vector(q) for q in questions[:30]]
+    assert vectors[30] == vectors[0]
+
+
+def test_coalesceur_taille_max_et_erreurs():
+    import asyncio
+    from rag.embed_coalescer import QueryCoalescer
+
+    calls = []
+
+    async def embed_many(texts):
+        calls.append(list(texts))
+        if "panne" in texts:
+            raise RuntimeError("embedding impossible")
+        return [[float(len(t))] for t in texts]
+
+    coalescer = QueryCoalescer(embed_many, window=0.05, max_batch=4)
+
+    async def scenario():
+        vectors = await asyncio.gather(*(coalescer.embed("x" * i) for i in range(1, 11)))
+        assert vectors == [[float(i)] for i in range(1, 11)]
+        results = await asyncio.gather(coalescer.embed("panne"), coalescer.embed("ok"), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    asyncio.run(scenario())
+    assert [len(c) for c in calls] == [4, 4, 2, 2]
+    assert coalescer.stats()["calls"] == 4
+
+
+def test_coalesceur_reponse_incomplete_et_taches_referencees():
+    """Moins de vecteurs que de questions : erreur pour tout le lot (aucun appelant bloqué) ;
+    la tâche d'envoi reste référencée pendant l'appel"""
+    import asyncio
+    import gc
+    from rag.embed_coalescer import QueryCoalescer
+
+    release = None
+    in_flight = []
+
+    async def embed_many(texts):
+        in_flight.append(len(coalescer._tasks))
+        await release.wait()
+        return [[1.0]] * (len(texts) - 1)  # un vecteur manquant
+
+    coalescer = QueryCoalescer(embed_many, window=0.01, max_batch=8)
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        pending = asyncio.gather(*(coalescer.embed(f"q{i}") for i in range(3)), return_exceptions=True)
+        await asyncio.sleep(0.05)
+        gc.collect()
+        release.set()
+        return await asyncio.wait_for(pending, timeout=2)
+
+    results = asyncio.run(scenario())
+    assert in_flight == [1] and not coalescer._tasks
+    assert all(isinstance(r, RuntimeError) and "2 vecteurs reçus pour 3" in str(r) for r in results)
@@ -0,0 +1,90 @@
+import asyncio
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+
+import rag.chatbot
+from rag.chatbot import RagService
+from rag.eval_runner import EvalCache, EvalRunner, Judge, parse_verdict
+from rag.vector_pipe import rebuild_faiss
+from conftest import FakeChatAPI, make_event
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def setup_runner(tmp_path, events_file, hash_embeddings, fake_chat_client):
+    store = tmp_path / "faiss_store"
+    events = [make_event(str(i), f"Concert {i}") for i in range(4)]
+    rebuild_faiss(events_file(events), store, hash_embeddings)
+    service = RagService(store, embeddings=hash_embeddings, chat_client=fake_chat_client)
+    judge_client = SimpleNamespace(chat=FakeChatAPI())
+    judge_client.chat.answer = 'Verdict : {"faithfulness": 0.9, "correctness": 1.5, "reason": "ok"}'
+    cases = [{"question": f"Concert {i}", "ground_truth": f"Concert {i} à Paris"} for i in range(3)]
+
+    def runner(encoder=None):
+        cache = EvalCache(tmp_path / "eval_cache.sqlite")
+        return EvalRunner(service, cache=cache, judge=Judge(judge_client), encoder=encoder,
+                          k=2, concurrency=2, rps=1000)
+
+    return runner, cases, judge_client.chat
+
+
+def test_relance_entierement_servie_par_le_cache(tmp_path, events_file, hash_embeddings, fake_chat_client):
+    runner, cases, judge_api = setup_runner(tmp_path, events_file, hash_embeddings, fake_chat_client)
+    embed_api = hash_embeddings.client.embeddings
+    encoder = CountingEncoder()
+
+    first = runner(encoder).run(cases)
+    assert first["summary"]["errors"] == 0 and fake_chat_client.chat.calls == 3 and judge_api.calls == 3
+    assert first["items"][0]["verdict"]["correctness"] == 1.0  # note bornée à [0, 1]
+    assert len(encoder.calls) == 1 and len(encoder.calls[0]) == 6  # attendues + produites, un seul lot
+
+    before = len(embed_api.calls)
+    second = runner().run(cases)
+    assert fake_chat_client.chat.calls == 3 and judge_api.calls == 3 and len(embed_api.calls) == before
+    assert second["cache"]["prediction"] == {"hits": 3, "misses": 0}
+    assert [i["answer"] for i in second["items"]] == [i["answer"] for i in first["items"]]
+
+
+def test_changement_de_prompt_ne_regenere_que_les_reponses(
+    tmp_path, events_file, hash_embeddings, fake_chat_client, monkeypatch
+):
+    runner, cases, judge_api = setup_runner(tmp_path, events_file, hash_embeddings, fake_chat_client)
+    runner().run(cases)
+    before = len(hash_embeddings.client.embeddings.calls)
+
+    template = rag.chatbot.prompt.template + "\nRéponds en une phrase."
+    monkeypatch.setattr(rag.chatbot, "prompt", PromptTemplate.from_template(template))
+    report = runner().run(cases)
+    assert report["cache"]["retrieval"] == {"hits": 3, "misses": 0}
+    assert report["cache"]["prediction"] == {"hits": 0, "misses": 3}
+    assert fake_chat_client.chat.calls == 6 and len(hash_embeddings.client.embeddings.calls) == before
+    # réponse identique (faux LLM) : verdicts du juge relus du cache
+    assert judge_api.calls == 3
+
+
+def test_verdict_illisible():
+    assert parse_verdict("pas de JSON") == {"reason": "", "faithfulness": None, "correctness": None}
+    assert parse_verdict('{"faithfulness": "0.5", "correctness": -1}')["correctness"] == 0.0
+
+
+def test_contexte_different_pas_de_reponse_perimee(tmp_path, events_file, hash_embeddings, fake_chat_client):
+    runner, cases, _ = setup_runner(tmp_path, events_file, hash_embeddings, fake_chat_client)
+    runner().run(cases)
+    assert fake_chat_client.chat.calls == 3
+
+    # mêmes question, version et prompt, mais contexte retrouvé différent (réglages de recherche,
+    # index legacy modifié en place) : la réponse en cache ne doit pas être resservie
+    runner_ = runner()
+    state = runner_.service.warmup()
+    other = [Document(page_content="Autre contexte", metadata={"id": "x"})]
+    prediction = asyncio.run(runner_._predict(asyncio.Semaphore(1), state, cases[0]["question"], other))
+    assert fake_chat_client.chat.calls == 4 and prediction["sources"] == ["x"]
@@ -0,0 +1,66 @@
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from rag.docstore import load_faiss
+from rag.events_dataset import INDEX_COLUMNS, convert_json, iter_events, write_events
+from rag.index_store import current_store_path
+from rag.vector_pipe import load_documents, rebuild_faiss, sync_faiss
+from conftest import chunk_text, make_event
+
+LONG = "Un très long programme. " * 60  # plusieurs chunks
+
+
+def events():
+    return [
+        make_event("a", "Concert de l'Ensemble Marani", LONG, keywords=["concert", "jazz"],
+                   coordinates={"lon": 2.35, "lat": 48.85}, long_description=LONG),
+        make_event("b", "Hommage à Beethoven", date_start=1743955200000, keywords="[]"),
+        make_event("c", "Atelier BD manga", keywords=None),
+    ]
+
+
+def test_parquet_types_et_projection(tmp_path):
+    path = tmp_path / "events.parquet"
+    assert write_events(events(), path, batch_rows=2) == 3
+
+    schema = pq.read_schema(path)
+    assert pa.types.is_list(schema.field("keywords").type)
+    assert pq.ParquetFile(path).metadata.num_row_groups == 2
+    rows = list(iter_events(path))
+    assert set(rows[0]) == set(INDEX_COLUMNS)  # description longue, adresse... non lues
+    assert [r["keywords"] for r in rows] == [["concert", "jazz"], [], []]
+    assert rows[1]["date_start"] == "1743955200000"
+
+
+def test_index_identique_depuis_parquet_ou_json(tmp_path, events_file, hash_embeddings):
+    json_path = events_file(events())
+    parquet_path, _ = convert_json(json_path)
+
+    from_json = {d.metadata["id"]: d for d in load_documents(json_path)}
+    from_parquet = {d.metadata["id"]: d for d in load_documents(parquet_path)}
+    assert from_json.keys() == from_parquet.keys()
+    for event_id, doc in from_json.items():
+        assert from_parquet[event_id].page_content == doc.page_content
+        assert from_parquet[event_id].metadata["content_hash"] == doc.metadata["content_hash"]
+
+    store = tmp_path / "faiss_store"
+    rebuild_faiss(json_path, store, hash_embeddings)
+    api = hash_embeddings.client.embeddings
+    calls = len(api.calls)
+    # même contenu relu depuis Parquet : empreintes identiques, rien à réembedder
+    summary = sync_faiss(parquet_path, store, hash_embeddings)
+    assert (summary["added"], summary["changed"], summary["deleted"]) == (0, 0, 0)
+    assert len(api.calls) == calls
+
+    db = load_faiss(current_store_path(store), hash_embeddings)
+    assert db.similarity_search(chunk_text(events()[2]), k=1)[0].metadata["id"] == "c"
+
+
+def test_conversion_json_vers_parquet(tmp_path):
+    json_path = tmp_path / "events_clean.json"
+    json_path.write_text(json.dumps(events(), ensure_ascii=False), encoding="utf-8")
+    parquet_path, count = convert_json(json_path)
+    assert parquet_path == tmp_path / "events_clean.parquet" and count == 3
+    assert [r["id"] for r in iter_events(parquet_path, columns=["id"])] == ["a", "b", "c"]
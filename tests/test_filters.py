@@ -0,0 +1,150 @@
+from datetime import date
+
+import pytest
+
+import rag.retrieval as retrieval
+from rag.filters import MetadataIndex, parse_filters
+from rag.retrieval import FilteredRetriever
+from rag.vector_pipe import rebuild_faiss
+from rag.docstore import load_faiss
+from rag.index_store import current_store_path
+from conftest import make_event
+
+TODAY = date(2025, 3, 15)
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Quels concerts de musique classique en avril 2025 à Paris ?", (date(2025, 4, 1), date(2025, 4, 30))),
+    ("Y a-t-il un hommage à Beethoven en 2025 ?", (date(2025, 1, 1), date(2025, 12, 31))),
+    ("Un spectacle le 1er juin 2025", (date(2025, 6, 1), date(2025, 6, 1))),
+    ("Des expos du 3 au 10 mai ?", (date(2025, 5, 3), date(2025, 5, 10))),
+    ("Entre avril et juin 2025", (date(2025, 4, 1), date(2025, 6, 30))),
+    ("Un concert le 14/07/2025", (date(2025, 7, 14), date(2025, 7, 14))),
+    ("Quoi faire ce week-end ?", (date(2025, 3, 15), date(2025, 3, 16))),
+    ("Quels matchs de basket ball de la ligue Pro A ?", (None, None)),
+])
+def test_parse_dates(question, expected):
+    filters = parse_filters(question, today=TODAY)
+    assert (filters["date_from"], filters["date_to"]) == expected
+
+
+def test_parse_ville_gratuit_famille():
+    filters = parse_filters("Sorties gratuites en famille à Saint-Étienne", cities=["paris", "saint-etienne"])
+    assert filters["city"] == "saint-etienne" and filters["free"] and filters["family"]
+    assert parse_filters("Un concert à Paris", cities=["paris"])["free"] is False
+
+
+def test_ville_reperee_parmi_des_milliers():
+    """Les villes de l'index sont découpées une fois ; la plus longue citée l'emporte"""
+    from rag.filters import CityMatcher
+
+    matcher = CityMatcher([f"ville {i}" for i in range(5000)] + ["saint-etienne", "saint", "paris"])
+    assert parse_filters("Concerts à Saint-Étienne en mai", matcher)["city"] == "saint-etienne"
+    assert parse_filters("Un concert à saint etienne", matcher)["city"] == "saint-etienne"
+    assert parse_filters("Sortie à Paris ou à Saint-Étienne ?", matcher)["city"] == "saint-etienne"
+    assert parse_filters("Un concert à ville 4999", matcher)["city"] == "ville 4999"
+    assert parse_filters("Un concert à Parisis", matcher)["city"] is None
+
+
+def events():
+    return [
+        # date_start en millisecondes, comme dans events_clean.json (DataFrame.to_json)
+        make_event("avril", "Concert de musique classique",
+                   date_start=1743953400000, date_end="2025-04-06T17:00:00+00:00"),
+        make_event("mai", "Concert de musique classique !",
+                   date_start="2025-05-06T15:30:00+00:00", date_end="2025-05-06T17:00:00+00:00"),
+        make_event("expo", "Exposition longue durée", "Entrée libre, idéal en famille.",
+                   date_start="2025-03-01T10:00:00+00:00", date_end="2025-06-30T18:00:00+00:00",
+                   keywords=["exposition", "gratuit"]),
+        make_event("lyon", "Concert de musique classique à Lyon", city="Lyon",
+                   date_start="2025-04-10T20:00:00+00:00", date_end="2025-04-10T22:00:00+00:00"),
+    ]
+
+
+@pytest.fixture
+def store(tmp_path, events_file, hash_embeddings):
+    root = tmp_path / "faiss_store"
+    rebuild_faiss(events_file(events()), root, hash_embeddings)
+    path = current_store_path(root)
+    return load_faiss(path, hash_embeddings), MetadataIndex.load(path)
+
+
+def ids(docs):
+    return {d.metadata["id"] for d in docs}
+
+
+def test_index_de_metadonnees_construit_a_l_ingestion(store):
+    db, meta = store
+    assert len(meta) == db.index.ntotal
+    rows = meta.candidate_rows(parse_filters("en avril 2025 à Paris", meta.city_matcher))
+    assert ids(db.docstore.by_rows(rows)) == {"avril", "expo"}  # l'expo chevauche avril
+    rows = meta.candidate_rows(parse_filters("gratuit en famille", meta.city_matcher))
+    assert ids(db.docstore.by_rows(rows)) == {"expo"}
+    assert set(db.docstore.by_rows(meta.rows_with_keyword("Gratuit"))[0].metadata["keywords"]) >= {"gratuit"}
+    assert meta.candidate_rows(parse_filters("un concert", meta.city_matcher)) is None
+
+
+@pytest.mark.parametrize("exact_max", [4096, 0])
+def test_retriever_filtre_avant_la_recherche(store, monkeypatch, exact_max):
+    """Le même texte en mai ou à Lyon n'est jamais renvoyé pour une question sur avril à Paris"""
+    monkeypatch.setattr(retrieval, "EXACT_SUBSET_MAX", exact_max)  # 0 : IDSelector dans FAISS
+    db, meta = store
+    retriever = FilteredRetriever(db=db, metadata_index=meta, k=10)
+    docs = retriever.invoke("Concert de musique classique en avril 2025 à Paris")
+    assert ids(docs) == {"avril", "expo"}
+    # aucun événement en décembre : recherche sans la période plutôt qu'un contexte vide
+    assert ids(retriever.invoke("Concert de musique classique en décembre 2025")) == {"avril", "mai", "expo", "lyon"}
+    assert ids(retriever.invoke("Concert de musique classique en décembre 2025 à Lyon")) == {"lyon"}
+
+    unfiltered = FilteredRetriever(db=db, metadata_index=None, k=10)
+    assert ids(unfiltered.invoke("Concert de musique classique en avril 2025")) == {"avril", "mai", "expo", "lyon"}
+
+
+def test_annee_par_defaut_tiree_de_l_index(store):
+    """Question sans année posée après la période de l'index : l'année de l'index, pas l'année en cours"""
+    db, meta = store
+    assert meta.year_range() == (2025, 2025)
+    assert meta.default_year(date(2026, 10, 18)) == 2025 and meta.default_year(date(2024, 1, 1)) == 2025
+    filters = parse_filters("Un concert en avril à Paris ?", meta.city_matcher, default_year=meta.default_year())
+    assert filters["date_from"] == date(2025, 4, 1)
+
+    retriever = FilteredRetriever(db=db, metadata_index=meta, k=10)
+    assert ids(retriever.invoke("Un concert de musique classique en avril à Paris ?")) == {"avril", "expo"}
+    # date relative hors de l'index ("ce week-end" en 2026) : repli sur la recherche sans période
+    assert ids(retriever.invoke("Un concert ce week-end ?")) == {"avril", "mai", "expo", "lyon"}
+
+
+def test_recherche_filtree_concurrente_sur_index_ivf(tmp_path, events_file, hash_embeddings, monkeypatch):
+    """IVF chargé : table de reconstruction prête avant la première recherche, threads concurrents sans erreur"""
+    import threading
+
+    import faiss
+    import numpy as np
+    import rag.ann_index as ann_index
+
+    monkeypatch.setattr(ann_index, "INDEX_TYPE", "ivf_flat")
+    monkeypatch.setattr(ann_index, "NLIST", 4)
+    root = tmp_path / "faiss_store"
+    rebuild_faiss(events_file([make_event(f"e{i}", f"Concert numéro {i}") for i in range(40)]), root, hash_embeddings)
+    db = load_faiss(current_store_path(root), hash_embeddings)
+    assert ann_index.index_kind(db.index) == "ivf_flat"
+    assert faiss.downcast_index(db.index).direct_map.type  # construite au chargement, pas à la volée
+
+    rows = np.arange(0, db.index.ntotal, 2)
+    query = hash_embeddings.embed_query("Concert numéro 7")
+    expected = retrieval.search_rows(db.index, query, 5, rows)[0].tolist()
+    errors, results = [], []
+
+    def search():
+        try:
+            for _ in range(20):
+                results.append(retrieval.search_rows(db.index, query, 5, rows)[0].tolist())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=search) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and all(r == expected for r in results)
@@ -0,0 +1,48 @@
+import numpy as np
+
+from rag.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from rag.docstore import load_faiss
+from rag.filters import MetadataIndex
+from rag.index_store import current_store_path
+from rag.retrieval import FilteredRetriever
+from rag.vector_pipe import rebuild_faiss
+from conftest import make_event
+
+
+def test_tokenize_francais():
+    assert tokenize("L’Ensemble Marani joue des Concerts à l'Église") == ["ensemble", "marani", "joue", "concert", "eglise"]
+
+
+def test_bm25_classe_le_nom_propre_en_tete():
+    index = BM25Index.build([
+        "Concert de musique classique à Paris",
+        "Concert de l'Ensemble Marani, musique géorgienne",
+        "Hommage à Beethoven : concert symphonique",
+    ])
+    rows, scores = index.search("Ensemble Marani en concert", k=3)
+    assert rows[0] == 1 and list(scores) == sorted(scores, reverse=True)
+    assert list(index.search("Ensemble Marani", k=3, rows=np.array([0, 2]))[0]) == []
+    assert len(index.search("mot absent", k=3)[0]) == 0
+
+
+def test_reciprocal_rank_fusion():
+    # 7 est 2e dans les deux listes : devant 1 et 9, premiers d'une seule liste
+    assert reciprocal_rank_fusion([[1, 7, 3], [9, 7, 4]], k=3) == [7, 1, 9]
+
+
+def test_retriever_hybride_persiste_avec_l_index(tmp_path, events_file, hash_embeddings):
+    """L'index BM25 est écrit avec la version et remonte le chunk qui contient le nom cherché"""
+    events = [make_event(f"e{i}", f"Atelier numéro {i}", "Activité créative pour tous.", keywords=["atelier"])
+              for i in range(30)]
+    events.append(make_event("marani", "Concert de l'Ensemble Marani", "Polyphonies géorgiennes."))
+    root = tmp_path / "faiss_store"
+    rebuild_faiss(events_file(events), root, hash_embeddings)
+    path = current_store_path(root)
+    db = load_faiss(path, hash_embeddings)
+    sparse = BM25Index.load(path)
+    assert sparse is not None and len(sparse) == db.index.ntotal
+
+    question = "Un concert de l'ensemble Marani ?"
+    # embeddings de test aléatoires : seul le classement BM25 départage les chunks
+    hybrid = FilteredRetriever(db=db, metadata_index=MetadataIndex.load(path), sparse_index=sparse, k=3, fetch_k=50)
+    assert hybrid.invoke(question)[0].metadata["id"] == "marani"
@@ -0,0 +1,155 @@
+import csv
+import json
+
+import pytest
+
+from rag.ingest_openagenda import (
+    IngestCheckpoint, _fast_html_text, clean_html, clean_html_bs4, export_events, finalize_record, ingest, make_session,
+    plan_slices,
+)
+from rag.events_dataset import iter_events
+from scripts.openagenda_stub import create_app, raw_event, serve_in_thread
+
+
+@pytest.fixture
+def openagenda_server():
+    """Démarre un bouchon OpenAgenda ; renvoie une fonction (événements, pannes) -> (url, app)."""
+    servers = []
+
+    def start(events, failures=None, max_window=10_000):
+        app = create_app(events, failures=failures, max_window=max_window)
+        url, server = serve_in_thread(app)
+        servers.append(server)
+        return f"{url}/records", app
+
+    yield start
+    for server in servers:
+        server.should_exit = True
+
+
+def read_parts(parts_dir):
+    return [json.loads(line) for path in sorted(parts_dir.glob("part-*.jsonl")) for line in open(path, encoding="utf-8")]
+
+
+@pytest.mark.parametrize("html, fast", [
+    ("<p>Concert <b>gratuit</b></p>\n<ul><li>18h</li><li>20h</li></ul>", True),
+    ("<p>Tarif&nbsp;: 5&#8364; &amp; plus &eacute;t&eacute; R&amp;D Tom & Jerry</p>", True),
+    ('<a href="https://x.fr/?a=1&amp;b=2" title="a>b">lien</a><br/>suite', True),
+    ("<P CLASS=intro>Texte</P ><o:p></o:p>", True),
+    ("<p>avant<!-- commentaire -->après</p>", False),
+    ("<p>a<script>var x = '<b>';</script>b</p>", False),
+    ("a < b &foo; &#0; <![CDATA[x]]>", False),
+    ("<b'>mal formé", False),
+])
+def test_clean_html_matches_beautifulsoup(html, fast):
+    assert (_fast_html_text(html) is not None) == fast
+    assert clean_html(html) == clean_html_bs4(html)
+
+
+def test_finalize_record_rules():
+    base = {"id": "1", "title": "Concert", "description": "Court", "long_description": None,
+            "keywords": None, "region": None, "date_start": "2025-05-01T18:00:00+00:00"}
+    record = finalize_record(base)
+    assert record["long_description"] == "Court"
+    assert record["region"] == "Île-de-France"
+    assert record["keywords"] == []
+    assert record["text_to_embed"] == "Concert. Court"
+    assert finalize_record({**base, "date_start": "2024-12-31T18:00:00+00:00"}) is None
+    assert finalize_record({**base, "date_start": None}) is None
+
+
+def test_ingest_streams_pages_and_retries(tmp_path, openagenda_server):
+    events = [raw_event(i) for i in range(250)]
+    url, app = openagenda_server(events, failures={100: 2})  # deux 503 puis succès
+    summary = ingest(tmp_path / "parts", page_size=50, workers=3, base_url=url,
+                     session=make_session(3, retries=3, backoff=0))
+
+    assert summary["pages"] == 5 and summary["failed"] == []
+    assert app.state.calls.count(100) == 3
+    records = read_parts(tmp_path / "parts")
+    expected = [raw_event(i)["uid"] for i in range(250) if i % 10]  # date_start 2024 exclue
+    assert [r["id"] for r in records] == expected
+    assert records[0]["long_description"] == "Programme détaillé 1 atelier concert"
+    assert records[0]["description"] == "Description courte 1 !"
+
+
+def test_ingest_resumes_from_checkpoint(tmp_path, openagenda_server):
+    events = [raw_event(i) for i in range(250)]
+    parts = tmp_path / "parts"
+    url, app = openagenda_server(events, failures={150: -1})  # page toujours en échec
+    session = make_session(2, retries=1, backoff=0)
+    with pytest.raises(RuntimeError, match="150"):
+        ingest(parts, page_size=50, workers=2, base_url=url, session=session)
+    checkpoint = json.loads((parts / "checkpoint.json").read_text())
+    assert IngestCheckpoint(parts, checkpoint["query"]).done == {"0:0", "0:50", "0:100", "0:200"}
+    # une page par ligne ajoutée au journal ; ligne interrompue (sans fin de ligne) ignorée
+    with open(parts / "done.log", "a", encoding="utf-8") as f:
+        f.write("0:15")
+    assert "0:15" not in IngestCheckpoint(parts, checkpoint["query"]).done
+
+    app.state.failures.clear()
+    app.state.calls.clear()
+    summary = ingest(parts, page_size=50, workers=2, base_url=url, session=session)
+    assert app.state.calls == [150]  # ni total ni pages déjà écrites redemandés
+    assert summary["fetched"] == 1 and summary["pages"] == 5
+    assert len(read_parts(parts)) == 225
+
+
+def test_export_events_dedupes_and_writes_json_csv(tmp_path, openagenda_server):
+    events = [raw_event(i) for i in range(120)] + [raw_event(5)]  # doublon d'uid
+    url, _ = openagenda_server(events)
+    ingest(tmp_path / "parts", page_size=40, workers=2, base_url=url)
+
+    count = export_events(tmp_path / "parts", tmp_path / "events_clean.json", tmp_path / "events_clean.csv",
+                          tmp_path / "events_clean.parquet")
+    data = json.loads((tmp_path / "events_clean.json").read_text(encoding="utf-8"))
+    assert count == len(data) == 108
+    parquet = list(iter_events(tmp_path / "events_clean.parquet", columns=None))
+    assert [r["id"] for r in parquet] == [r["id"] for r in data]
+    assert parquet[1]["coordinates"] == data[1]["coordinates"]
+    assert len({r["id"] for r in data}) == count
+    with open(tmp_path / "events_clean.csv", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == count
+    assert rows[0]["text_to_embed"] == data[0]["text_to_embed"]
+    assert {"title", "description", "keywords", "city", "url", "text_to_embed"} <= set(rows[0])
+
+
+def test_plan_slices_splits_under_cap(openagenda_server):
+    events = [raw_event(i) for i in range(900)] + [raw_event(1000 + i, city="Lyon") for i in range(30)]
+    url, _ = openagenda_server(events, max_window=100)
+    slices = plan_slices(["Paris", "Lyon"], years="2025", base_url=url, cap=100)
+
+    assert all(sl["total"] <= 100 and not sl["truncated"] for sl in slices)
+    assert sum(sl["total"] for sl in slices if sl["city"] == "Paris") == 900
+    assert [sl for sl in slices if sl["city"] == "Lyon"][0]["start"] == "2025-01-01T00:00:00"
+    assert len([sl for sl in slices if sl["city"] == "Lyon"]) == 1
+
+
+def test_plan_slices_flags_truncated_window(openagenda_server):
+    events = [{**raw_event(i), "updatedat": "2025-03-01T10:00:00+00:00"} for i in range(30)]
+    url, _ = openagenda_server(events, max_window=20)
+    slices = plan_slices("Paris", years="2025", base_url=url, cap=20)
+    assert len(slices) == 1 and slices[0]["truncated"] and slices[0]["total"] == 20
+
+
+def test_ingest_multi_city_region_dedupes_by_uid(tmp_path, openagenda_server):
+    paris = [raw_event(i) for i in range(500)]
+    lyon = [raw_event(1000 + i, city="Lyon", region="Auvergne-Rhône-Alpes") for i in range(120)]
+    url, _ = openagenda_server(paris + lyon, max_window=150)
+    summary = ingest(tmp_path / "parts", cities=["Paris", "Lyon"], regions=["Île-de-France"],
+                     years=["2025"], page_size=40, workers=4, base_url=url, cap=150)
+    assert summary["slices"] > 3 and summary["failed"] == []
+
+    count = export_events(tmp_path / "parts", tmp_path / "events_clean.json")
+    data = json.loads((tmp_path / "events_clean.json").read_text(encoding="utf-8"))
+    expected = {e["uid"] for e in paris + lyon if not e["firstdate_begin"].startswith("2024")}
+    assert count == len(expected)
+    assert {r["id"] for r in data} == expected
+
+
+def test_ingest_with_process_pool_matches_inline(tmp_path, openagenda_server):
+    url, _ = openagenda_server([raw_event(i) for i in range(120)])
+    ingest(tmp_path / "inline", page_size=50, workers=2, base_url=url)
+    ingest(tmp_path / "pool", page_size=50, workers=2, base_url=url, processes=2)
+    assert read_parts(tmp_path / "pool") == read_parts(tmp_path / "inline")
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from rag.chatbot import RagNotReady, RagService
+from rag.index_store import MODEL_FILE, current_store_path
+from rag.local_embeddings import BatchingEncoder, LocalEmbeddings
+from rag.vector_pipe import rebuild_faiss, sync_faiss
+from conftest import HashEmbeddingsAPI, make_event
+
+
+class FakeSentenceModel:
+    """Encodeur local factice (interface SentenceTransformer.encode) ; compte les appels."""
+
+    def __init__(self, delay=0.0):
+        self.calls = []
+        self.delay = delay
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, convert_to_numpy=True,
+               show_progress_bar=False):
+        self.calls.append(list(texts))
+        time.sleep(self.delay)
+        vectors = np.array([HashEmbeddingsAPI.vector(t) for t in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_questions_concurrentes_regroupees():
+    model = FakeSentenceModel(delay=0.02)
+    engine = BatchingEncoder(lambda texts: model.encode(texts).tolist(), max_batch=8, max_wait=0.005)
+    results = {}
+
+    def ask(i):
+        results[i] = engine.submit([f"question {i}"]).result()[0]
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(model.calls) < 20 and max(len(c) for c in model.calls) <= 8
+    assert all(np.allclose(results[i], model.encode([f"question {i}"])[0]) for i in range(20))
+
+    failing = BatchingEncoder(lambda texts: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        failing.submit(["x"]).result(timeout=5)
+
+
+def test_backend_local_et_modele_enregistre_avec_l_index(tmp_path, events_file, fake_chat_client):
+    embeddings = LocalEmbeddings("modele-test", model=FakeSentenceModel())
+    store = tmp_path / "faiss_store"
+    event = make_event("a", "Hommage à Beethoven")
+    rebuild_faiss(events_file([event]), store, embeddings)
+    identity = json.loads((current_store_path(store) / MODEL_FILE).read_text(encoding="utf-8"))
+    assert identity["backend"] == "local" and identity["model"] == "modele-test" and identity["dim"] == 8
+
+    service = RagService(store, embeddings=embeddings, chat_client=fake_chat_client)
+    answer, sources = service.answer("Hommage à Beethoven", k=1)
+    assert answer == "Réponse de test." and sources[0].metadata["id"] == "a"
+    vectors = asyncio.run(embeddings.aembed_queries(["Hommage à Beethoven", "Concert"]))
+    assert np.allclose(vectors[0], embeddings.embed_query("Hommage à Beethoven"))
+
+
+def test_index_d_un_autre_modele_refuse(tmp_path, events_file, hash_embeddings, fake_chat_client):
+    store = tmp_path / "faiss_store"
+    path = events_file([make_event("a", "Hommage à Beethoven")])
+    rebuild_faiss(path, store, hash_embeddings)  # mistral-embed
+    local = LocalEmbeddings("modele-test", model=FakeSentenceModel())
+
+    service = RagService(store, embeddings=local, chat_client=fake_chat_client)
+    with pytest.raises(RagNotReady, match="autre modèle d'embedding"):
+        service.warmup()
+
+    # synchronisation avec l'autre modèle : reconstruction complète plutôt qu'un index mélangé
+    assert sync_faiss(path, store, local)["mode"] == "full"
+    assert RagService(store, embeddings=local, chat_client=fake_chat_client).warmup().db.index.ntotal == 1
@@ -0,0 +1,60 @@
+from fastapi.testclient import TestClient
+
+import api.main as api_main
+from rag import metrics
+from rag.chatbot import RagService
+from rag.metrics import Registry
+from rag.vector_pipe import rebuild_faiss
+from conftest import make_event
+
+
+def test_export_prometheus_et_registre_desactive():
+    registry = Registry(enabled=True)
+    registry.describe("rag_stage_seconds", "histogram", "Durées", buckets=(0.1, 1.0))
+    registry.describe("rag_cache_hit_ratio", "gauge", "Taux")
+    with registry.stage("search"):
+        pass
+    registry.observe("rag_stage_seconds", 0.5, stage="search")
+    registry.set("rag_cache_hit_ratio", 0.25, cache='questions "api"')
+    text = registry.render()
+    assert "# TYPE rag_stage_seconds histogram" in text
+    assert 'rag_stage_seconds_bucket{stage="search",le="0.1"} 1' in text
+    assert 'rag_stage_seconds_bucket{stage="search",le="1.0"} 2' in text
+    assert 'rag_stage_seconds_bucket{stage="search",le="+Inf"} 2' in text
+    assert 'rag_stage_seconds_count{stage="search"} 2' in text
+    assert 'rag_cache_hit_ratio{cache="questions \\"api\\""} 0.25' in text
+
+    off = Registry(enabled=False)
+    with off.stage("search"):
+        off.inc("rag_prompt_tokens_total", 10)
+    assert off.value("rag_stage_seconds", stage="search") is None
+    assert off.value("rag_prompt_tokens_total") is None
+
+
+def test_metrics_par_etape_et_identifiant_de_trace(monkeypatch, tmp_path, events_file, hash_embeddings,
+                                                  fake_chat_client):
+    root = tmp_path / "faiss_store"
+    rebuild_faiss(events_file([make_event("a", "Hommage à Beethoven")]), root, hash_embeddings)
+    service = RagService(root, embeddings=hash_embeddings, chat_client=fake_chat_client)
+    monkeypatch.setattr(api_main, "service", service)
+    monkeypatch.setenv("RAG_WARMUP", "0")
+    registry = metrics.registry
+
+    def count(stage):
+        histogram = registry.value("rag_stage_seconds", stage=stage)
+        return histogram.count if histogram else 0
+
+    before = {stage: count(stage) for stage in ("embed", "search", "pack", "generate", "total")}
+    tokens = registry.value("rag_prompt_tokens_total") or 0
+    with TestClient(api_main.app) as client:
+        r = client.post("/ask", json={"question": "Hommage à Beethoven"}, headers={"X-Request-ID": "req-42"})
+        assert r.status_code == 200 and r.headers["X-Request-ID"] == "req-42"
+        assert len(client.post("/ask", json={"question": "Concert"}).headers["X-Request-ID"]) == 16
+
+        text = client.get("/metrics").text
+    assert all(count(stage) == before[stage] + 2 for stage in before)
+    assert registry.value("rag_prompt_tokens_total") > tokens
+    assert f'rag_index_info{{version="{service.index_version()}"}} 1' in text
+    assert "rag_index_chunks 1" in text
+    assert 'rag_cache_misses_total{cache="query_embeddings"} 2' in text
+    assert 'rag_requests_total{route="/ask",status="200"}' in text
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as api_main
+from rag.chatbot import RagService, RagNotReady
+from rag.index_store import current_version, held_versions
+from rag.rebuild_jobs import RebuildJobs
+from rag.vector_pipe import rebuild_faiss
+from conftest import make_event
+
+
+@pytest.fixture
+def store(tmp_path, events_file, hash_embeddings):
+    root = tmp_path / "faiss_store"
+    events = [
+        make_event("a", "Concert de l'Ensemble Marani"),
+        make_event("b", "Hommage à Beethoven"),
+    ]
+    rebuild_faiss(events_file(events), root, hash_embeddings)
+    return root
+
+
+def test_rien_n_est_charge_avant_warmup(store, hash_embeddings, fake_chat_client):
+    """Le service se construit sans toucher à l'index ; warmup le charge une seule fois"""
+    service = RagService(store, embeddings=hash_embeddings, chat_client=fake_chat_client)
+    assert not service.ready
+    assert service.status()["index_version"] is None
+
+    state = service.warmup()
+    assert service.ready and service.warmup() is state
+    status = service.status()
+    assert status["index_size"] == 2 and status["error"] is None
+
+
+def test_index_absent_renvoie_non_pret(tmp_path, hash_embeddings, fake_chat_client):
+    """Sans index, warmup lève RagNotReady et l'erreur est exposée par status()"""
+    service = RagService(tmp_path / "vide", embeddings=hash_embeddings, chat_client=fake_chat_client)
+    with pytest.raises(RagNotReady):
+        service.warmup()
+    status = service.status()
+    assert not status["ready"] and "FileNotFoundError" in status["error"]
+
+
+def test_reponses_sync_async_et_streaming(store, hash_embeddings, fake_chat_client):
+    """La première question déclenche le chargement, quel que soit le chemin"""
+    service = RagService(store, embeddings=hash_embeddings, chat_client=fake_chat_client)
+    answer, sources = service.answer("Concert de l'Ensemble Marani")
+    assert answer == "Réponse de test." and sources
+
+    async def run():
+        lazy = RagService(store, embeddings=hash_embeddings, chat_client=fake_chat_client)
+        answer, _ = await lazy.aanswer("Hommage à Beethoven")
+        events = [e async for e in lazy.astream("Hommage à Beethoven")]
+        return answer, events
+
+    answer, events = asyncio.run(run())
+    assert answer == "Réponse de test."
+    assert events[0]["type"] == "sources"
+    assert "".join(e["text"] for e in events[1:]).strip() == "Réponse de test."
+
+
+def test_ready_distinct_de_health(monkeypatch, store, hash_embeddings, fake_chat_client):
+    """/health répond toujours ; /ready passe de 503 à 200 une fois l'index chargé"""
+    service = RagService(store, embeddings=hash_embeddings, chat_client=fake_chat_client)
+    monkeypatch.setattr(api_main, "service", service)
+    monkeypatch.setenv("RAG_WARMUP", "0")
+    with TestClient(api_main.app) as client:
+        assert client.get("/health").status_code == 200
+        assert client.get("/ready").status_code == 503
+
+        r = client.post("/ask", json={"question": "Hommage à Beethoven"})
+        assert r.status_code == 200 and r.json()["answer"] == "Réponse de test."
+        ready = client.get("/ready")
+        assert ready.status_code == 200 and ready.json()["index_size"] == 2
+
+
+def test_ask_renvoie_503_si_service_indisponible(monkeypatch, tmp_path, hash_embeddings, fake_chat_client):
+    service = RagService(tmp_path / "vide", embeddings=hash_embeddings, chat_client=fake_chat_client)
+    monkeypatch.setattr(api_main, "service", service)
+    monkeypatch.setenv("RAG_WARMUP", "0")
+    with TestClient(api_main.app) as client:
+        assert client.post("/ask", json={"question": "Concert"}).status_code == 503
+        assert client.post("/ask/stream", json={"question": "Concert"}).status_code == 503
+
+
+def test_ask_batch_un_embedding_et_erreurs_par_question(monkeypatch, store, hash_embeddings, fake_chat_client):
+    """/ask/batch : un seul appel d'embedding, un résultat par question, erreurs isolées"""
+    chat = fake_chat_client.chat
+    complete_async = chat.complete_async
+
+    async def flaky(model, messages):
+        if "panne" in messages[-1]["content"]:
+            raise RuntimeError("génération impossible")
+        return await complete_async(model, messages)
+
+    chat.complete_async = flaky
+    service = RagService(store, embeddings=hash_embeddings, chat_client=fake_chat_client)
+    monkeypatch.setattr(api_main, "service", service)
+    monkeypatch.setenv("RAG_WARMUP", "0")
+    api = hash_embeddings.client.embeddings
+    before = len(api.calls)
+    questions = ["Concert de l'Ensemble Marani", "  ", "Hommage à Beethoven", "panne", "Hommage à Beethoven"]
+    with TestClient(api_main.app) as client:
+        r = client.post("/ask/batch", json={"questions": questions, "k": 1})
+        assert r.status_code == 200
+        results = r.json()["results"]
+        assert [res["question"] for res in results] == questions
+        calls = api.calls[before:]
+        assert len(calls) == 1 and len(calls[0]) == 3  # questions distinctes, un seul appel
+        assert results[0]["answer"] == "Réponse de test." and len(results[0]["sources"]) == 1
+        assert "error" in results[1] and "RuntimeError" in results[3]["error"]
+        assert results[2]["answer"] == results[4]["answer"]
+        assert client.post("/ask/batch", json={"questions": []}).status_code == 422
+
+
+def test_recherche_groupee_identique_a_la_recherche_unitaire(store, hash_embeddings, fake_chat_client):
+    service = RagService(store, embeddings=hash_embeddings, chat_client=fake_chat_client)
+    retriever = service.warmup().retriever
+    questions = ["Concert de l'Ensemble Marani", "Hommage à Beethoven en avril 2025", "Atelier"]
+    vectors = [hash_embeddings.embed_query(q) for q in questions]
+    batch = retriever.search_batch(questions, vectors, k=2)
+    for question, vector, docs in zip(questions, vectors, batch):
+        assert [d.id for d in docs] == [d.id for d in retriever.search(question, vector, k=2)]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_les_autres_workers_rechargent_la_version_publiee(store, events_file, hash_embeddings, fake_chat_client):
+    """Deux workers sur le même dossier : celui qui n'a pas reconstruit voit CURRENT changer et recharge"""
+    workers = [RagService(store, embeddings=hash_embeddings, chat_client=fake_chat_client, watch_interval=0.01)
+               for _ in range(2)]
+    old = workers[0].warmup().version
+    assert workers[1].warmup().version == old
+
+    new = rebuild_faiss(events_file([make_event("c", "Exposition Brian Maguire")]), store, hash_embeddings).name
+    workers[0].reload()  # le worker qui a lancé le job
+    time.sleep(0.02)
+    workers[1].answer("Exposition Brian Maguire")  # sert encore l'ancienne version, lance le rechargement
+    assert wait_for(lambda: workers[1].index_version() == new)
+    assert workers[1].answer("Exposition Brian Maguire")[1][0].metadata["id"] == "c"
+    # version précédente encore déclarée (requêtes en cours) : jamais supprimée par le nettoyage
+    assert old in held_versions(store)
+
+
+def test_rebuild_en_arriere_plan_via_l_api(monkeypatch, store, events_file, hash_embeddings, fake_chat_client):
+    """POST /rebuild -> 202 puis GET /rebuild/{id} jusqu'à la fin du job ; id inconnu -> 404"""
+    service = RagService(store, embeddings=hash_embeddings, chat_client=fake_chat_client)
+    path = events_file([make_event("c", "Exposition Brian Maguire")])
+    monkeypatch.setattr(api_main, "service", service)
+    monkeypatch.setattr(api_main, "rebuild_jobs", RebuildJobs(
+        lambda mode, progress: api_main.run_rebuild(mode, progress),
+        on_success=lambda result: service.reload(),
+    ))
+    monkeypatch.setattr(api_main, "rebuild_faiss", lambda progress: rebuild_faiss(path, store, hash_embeddings, progress))
+    monkeypatch.setattr(api_main, "sync_faiss", lambda progress: 1 / 0)
+    monkeypatch.setenv("RAG_WARMUP", "0")
+    with TestClient(api_main.app) as client:
+        for mode, status in [("full", "succeeded"), ("incremental", "failed")]:
+            r = client.post("/rebuild", params={"mode": mode})
+            assert r.status_code == 202 and r.json()["created"]
+            job_url = r.json()["status_url"]
+            assert wait_for(lambda: client.get(job_url).json()["status"] in {"succeeded", "failed"})
+            job = client.get(job_url).json()
+            assert job["status"] == status
+        assert job["error"] == "division by zero"
+        assert service.index_version() == current_version(store)
+        assert client.get("/rebuild/inconnu").status_code == 404
+        assert client.post("/rebuild", params={"mode": "autre"}).status_code == 400
+
+
+def sse_events(body):
+    """[(événement, données)] d'un flux Server-Sent Events."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_ask_stream_sources_puis_tokens_puis_fin(monkeypatch, store, hash_embeddings, fake_chat_client):
+    """/ask/stream : sources d'abord, puis les tokens, puis done ; erreur de génération -> event error"""
+    service = RagService(store, embeddings=hash_embeddings, chat_client=fake_chat_client)
+    monkeypatch.setattr(api_main, "service", service)
+    monkeypatch.setenv("RAG_WARMUP", "0")
+    with TestClient(api_main.app) as client:
+        r = client.post("/ask/stream", json={"question": "Hommage à Beethoven", "k": 1})
+        assert r.status_code == 200 and r.headers["content-type"].startswith("text/event-stream")
+        events = sse_events(r.text)
+        names = [name for name, _ in events]
+        assert names[0] == "sources" and names[-1] == "done"
+        assert set(names[1:-1]) == {"token"} and len(names) >= 3
+        assert events[0][1][0]["title"] == "Hommage à Beethoven"
+        assert "".join(data["text"] for name, data in events if name == "token").strip() == "Réponse de test."
+
+        async def broken(model, messages):
+            raise RuntimeError("génération impossible")
+
+        fake_chat_client.chat.stream_async = broken
+        events = sse_events(client.post("/ask/stream", json={"question": "Hommage à Beethoven"}).text)
+        assert events[0][0] == "sources" and events[-1] == ("error", {"detail": "génération impossible"})
+
+        assert client.post("/ask/stream", json={"question": "   "}).status_code == 400
+
+
+def test_lot_erreurs_isolees_par_etape(store, hash_embeddings, fake_chat_client, monkeypatch):
+    """aanswer_batch : génération, recherche groupée ou embedding en échec -> erreurs par question, jamais d'exception"""
+    chat = fake_chat_client.chat
+    complete_async = chat.complete_async
+
+    async def flaky(model, messages):
+        if "panne" in messages[-1]["content"]:
+            raise RuntimeError("génération impossible")
+        return await complete_async(model, messages)
+
+    chat.complete_async = flaky
+    service = RagService(store, embeddings=hash_embeddings, chat_client=fake_chat_client)
+    retriever = service.warmup().retriever
+    questions = ["Hommage à Beethoven", "panne", "Concert de l'Ensemble Marani"]
+
+    results = asyncio.run(service.aanswer_batch(questions, k=1))
+    assert [r.get("answer") for r in results] == ["Réponse de test.", None, "Réponse de test."]
+    assert "RuntimeError: génération impossible" == results[1]["error"]
+
+    # recherche groupée en échec : reprise question par question, seule la question fautive échoue
+    search_batch = type(retriever).search_batch
+
+    def failing_batch(self, queries, vectors, k=None):
+        if len(queries) > 1:
+            raise ZeroDivisionError("lot")
+        if "Marani" in queries[0]:
+            raise ValueError("recherche impossible")
+        return search_batch(self, queries, vectors, k)
+
+    monkeypatch.setattr(type(retriever), "search_batch", failing_batch)
+    results = asyncio.run(service.aanswer_batch(questions, k=1))
+    assert results[0]["answer"] == "Réponse de test." and "génération" in results[1]["error"]
+    assert results[2] == {"error": "ValueError: recherche impossible"}
+
+    async def down(*args, **kwargs):
+        raise ConnectionError("API indisponible")
+
+    monkeypatch.setattr(hash_embeddings, "aembed_queries", down)
+    results = asyncio.run(service.aanswer_batch(["Exposition", "Atelier"], k=1))
+    assert results == [{"error": "ConnectionError: API indisponible"}] * 2
@@ -0,0 +1,33 @@
+import json
+
+from rag.vector_pipe import rebuild_faiss
+from scripts.bench_retrieval import compare, load_fixture, record_fixture, run_suite
+from conftest import chunk_text, make_event
+
+
+def test_suite_hors_reseau_sur_embeddings_enregistres(tmp_path, events_file, hash_embeddings, monkeypatch):
+    events = [make_event(f"e{i}", f"Atelier numéro {i}", "Activité créative.") for i in range(10)]
+    events.append(make_event("marani", "Concert Ensemble Marani", "Polyphonies géorgiennes."))
+    store = tmp_path / "faiss_store"
+    rebuild_faiss(events_file(events), store, hash_embeddings)
+    # question = texte exact du chunk : le plus proche voisin dense est l'événement attendu
+    cases = [{"question": chunk_text(events[-1]), "ground_truth": "Concert de l'Ensemble Marani à Paris"},
+             {"question": "Quoi de neuf ?", "ground_truth": "Rien"}]
+    fixture = tmp_path / "query_embeddings.json"
+    monkeypatch.setattr(hash_embeddings, "embed_documents", None)  # chemin des requêtes uniquement
+    record_fixture([c["question"] for c in cases], fixture, hash_embeddings)
+
+    embed_calls = len(hash_embeddings.client.embeddings.calls)
+    vectors = load_fixture([c["question"] for c in cases], fixture)
+    result = run_suite(store, cases, vectors, k=3, repeat=2)
+    assert len(hash_embeddings.client.embeddings.calls) == embed_calls  # aucun appel d'embedding
+
+    dense = result["configs"]["dense"]
+    assert dense["recall"] == 1.0 and dense["mrr"] == 1.0 and dense["labelled"] == 1
+    assert dense["distinct_events"] == 3.0
+    assert dense["p50_ms"] <= dense["p95_ms"] <= dense["p99_ms"]
+    assert {"hybride+filtres", "hybride+filtres sans regroupement"} <= set(result["configs"])
+
+    previous = json.loads(json.dumps(result))
+    previous["configs"]["dense"]["recall"] = 0.5
+    assert compare(result, previous)["dense"]["recall"] == 0.5
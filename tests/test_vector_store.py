@@ -0,0 +1,180 @@
+import pytest
+
+from rag.docstore import load_faiss, docstore_size
+from rag.vector_pipe import rebuild_faiss, sync_faiss, check_store, indexed_events
+from rag.index_store import current_store_path, current_version
+from conftest import chunk_text, make_event
+
+LONG = "Un très long programme. " * 60  # plusieurs chunks
+
+
+def load(store, embeddings):
+    return load_faiss(current_store_path(store), embeddings)
+
+
+def test_sync_incremental_n_embedde_que_les_changements(tmp_path, events_file, hash_embeddings):
+    """La synchronisation ne recalcule que les événements ajoutés/modifiés et reste cohérente"""
+    store = tmp_path / "faiss_store"
+    events = [
+        make_event("a", "Concert de l'Ensemble Marani", LONG),
+        make_event("b", "Hommage à Beethoven"),
+        make_event("c", "Atelier BD manga"),
+    ]
+    rebuild_faiss(events_file(events), store, hash_embeddings)
+    api = hash_embeddings.client.embeddings
+    calls_before = len(api.calls)
+
+    # Aucun changement -> aucun embedding
+    summary = sync_faiss(events_file(events), store, hash_embeddings)
+    assert summary["chunks_added"] == 0 and summary["chunks_removed"] == 0
+    assert len(api.calls) == calls_before
+
+    # b modifié, c supprimé, d ajouté
+    events = [
+        events[0],
+        make_event("b", "Hommage à Beethoven", "Nouvel horaire : 20h"),
+        make_event("d", "Exposition Brian Maguire"),
+    ]
+    summary = sync_faiss(events_file(events), store, hash_embeddings)
+    assert (summary["added"], summary["changed"], summary["deleted"]) == (1, 1, 1)
+    embedded = [t for call in api.calls[calls_before:] for t in call]
+    assert len(embedded) == 2
+    assert not any("Marani" in t for t in embedded)
+
+    db = load(store, hash_embeddings)
+    check_store(db)
+    assert db.index.ntotal == docstore_size(db.docstore)
+    assert set(indexed_events(db)) == {"a", "b", "d"}
+    hit = db.similarity_search(chunk_text(events[2]), k=1)[0]
+    assert hit.metadata["id"] == "d"
+
+
+def test_nouvelle_version_publiee_sans_toucher_l_ancienne(tmp_path, events_file, hash_embeddings):
+    """Chaque construction écrit un nouveau dossier puis bascule le pointeur CURRENT"""
+    store = tmp_path / "faiss_store"
+    first = rebuild_faiss(events_file([make_event("a", "Concert")]), store, hash_embeddings)
+    old_db = load(store, hash_embeddings)
+
+    summary = sync_faiss(events_file([make_event("b", "Exposition")]), store, hash_embeddings)
+    assert current_version(store) == summary["version"] != first.name
+    # L'ancienne version reste lisible par les requêtes en cours
+    assert (first / "index.faiss").exists()
+    assert old_db.similarity_search("Concert.", k=1)[0].metadata["id"] == "a"
+    assert load(store, hash_embeddings).similarity_search("Exposition.", k=1)[0].metadata["id"] == "b"
+
+
+def test_job_rebuild_en_arriere_plan():
+    """Le job tourne en arrière-plan, publie sa progression et appelle on_success"""
+    import threading
+    from rag.rebuild_jobs import RebuildJobs
+
+    release = threading.Event()
+    reloaded = []
+
+    def run(mode, progress):
+        progress("embed", 1, 2)
+        release.wait(5)
+        progress("save")
+        return {"mode": mode, "version": "v2"}
+
+    jobs = RebuildJobs(run, on_success=reloaded.append)
+    job, created = jobs.submit("incremental")
+    assert created and job["status"] == "queued"
+    # Un second appel pendant l'exécution renvoie le même job
+    again, created = jobs.submit("full")
+    assert not created and again["id"] == job["id"]
+
+    release.set()
+    jobs._executor.shutdown(wait=True)
+    done = jobs.get(job["id"])
+    assert done["status"] == "succeeded" and done["progress"] == 1.0
+    assert reloaded == [{"mode": "incremental", "version": "v2"}]
+
+
+def test_docstore_sqlite_equivalent_au_pickle(tmp_path, events_file, hash_embeddings, monkeypatch):
+    """Le docstore SQLite renvoie les mêmes résultats que l'ancien index.pkl, qui reste lisible"""
+    import rag.vector_pipe as vector_pipe
+    from rag.docstore import SQLiteDocstore
+
+    events = events_file([
+        make_event("a", "Concert de l'Ensemble Marani", LONG),
+        make_event("b", "Hommage à Beethoven"),
+        make_event("c", "Atelier BD manga"),
+    ])
+    sqlite_version = rebuild_faiss(events, tmp_path / "sqlite", hash_embeddings)
+    monkeypatch.setattr(vector_pipe, "DOCSTORE_BACKEND", "pickle")
+    pickle_version = rebuild_faiss(events, tmp_path / "pickle", hash_embeddings)
+    assert (sqlite_version / "docstore.sqlite").exists() and not (sqlite_version / "index.pkl").exists()
+    assert (pickle_version / "index.pkl").exists()
+
+    served = load(tmp_path / "sqlite", hash_embeddings)
+    legacy = load(tmp_path / "pickle", hash_embeddings)
+    assert isinstance(served.docstore, SQLiteDocstore)
+    for query in ["Hommage à Beethoven.", "Atelier BD manga.", "Un très long programme."]:
+        got = served.similarity_search_with_score(query, k=4)
+        expected = legacy.similarity_search_with_score(query, k=4)
+        assert [(d.id, d.page_content, d.metadata, s) for d, s in got] == \
+            [(d.id, d.page_content, d.metadata, s) for d, s in expected]
+
+    # Accès direct par rang FAISS : seuls les rangs demandés sont lus
+    docs = served.docstore.by_rows([2, 0, 999])
+    assert docs[0].id == served.index_to_docstore_id[2] and docs[2] is None
+    with pytest.raises(NotImplementedError):
+        served.delete([docs[1].id])
+
+
+def test_index_hnsw_publie_et_synchronise(tmp_path, events_file, hash_embeddings, monkeypatch):
+    """Avec FAISS_INDEX_TYPE=hnsw, la version écrite est un HNSW et reste synchronisable"""
+    import rag.ann_index as ann_index
+
+    monkeypatch.setattr(ann_index, "INDEX_TYPE", "hnsw")
+    store = tmp_path / "faiss_store"
+    events = [make_event("a", "Concert de l'Ensemble Marani", LONG), make_event("b", "Hommage à Beethoven")]
+    rebuild_faiss(events_file(events), store, hash_embeddings)
+    db = load(store, hash_embeddings)
+    assert ann_index.index_kind(db.index) == "hnsw"
+    assert db.similarity_search(chunk_text(events[1]), k=1)[0].metadata["id"] == "b"
+
+    summary = sync_faiss(events_file(events[:1] + [make_event("c", "Atelier BD manga")]), store, hash_embeddings)
+    assert summary["mode"] == "incremental" and summary["deleted"] == 1
+    db = load(store, hash_embeddings)
+    assert ann_index.index_kind(db.index) == "hnsw"
+    assert set(indexed_events(db)) == {"a", "c"}
+
+
+@pytest.mark.parametrize("kind", ["ivf_flat", "hnsw", "ivf_pq"])
+def test_build_index_rappel_proche_du_flat(kind):
+    """Les index approchés retrouvent l'essentiel des plus proches voisins exacts"""
+    import numpy as np
+    from rag.ann_index import build_index, set_search_params, index_kind
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((20, 32)).astype("float32")
+    vectors = (centers[rng.integers(0, 20, 4000)] + 0.3 * rng.standard_normal((4000, 32))).astype("float32")
+    queries = vectors[:50] + 0.05
+    exact = build_index(vectors, "flat").search(queries, 10)[1]
+
+    index = build_index(vectors, kind, nlist=32, pq_m=8, pq_nbits=6)
+    assert index_kind(index) == kind
+    set_search_params(index, nprobe=8, ef_search=64)
+    found = index.search(queries, 10)[1]
+    recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(found, exact)])
+    assert recall > (0.5 if kind == "ivf_pq" else 0.9)
+
+
+def test_nettoyage_epargne_les_versions_chargees(tmp_path, monkeypatch):
+    """Une version chargée par un processus vivant survit au nettoyage ; le bail d'un processus mort est ignoré"""
+    from rag import index_store
+
+    root = tmp_path / "faiss_store"
+    versions = sorted(index_store.new_version_dir(root).name for _ in range(4))
+    index_store.hold_versions(root, [versions[0]], "worker")
+    dead = root / index_store.LEASES_DIR / "999999999-mort.json"
+    dead.write_text(f'["{versions[1]}"]', encoding="utf-8")
+    monkeypatch.setattr(index_store, "_pid_alive", lambda pid: pid != 999999999)
+
+    index_store.publish_version(root / index_store.VERSIONS_DIR / versions[3])
+    index_store.prune_versions(root, keep=1)
+    remaining = sorted(p.name for p in (root / index_store.VERSIONS_DIR).iterdir())
+    assert remaining == [versions[0], versions[3]]  # version chargée + version courante
+    assert not dead.exists()